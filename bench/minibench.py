@@ -1,117 +1,453 @@
 # coding: utf-8
+"""
+Micro-benchmarks of the scheduler hot kernels.
+
+Kernels run against an in-memory SQLite database, each repetition starting
+from an empty database (ephemeral session). Results are written as JSON and
+can be compared between revisions::
+
+    python bench/minibench.py run -o base.json
+    git checkout my-branch
+    python bench/minibench.py run -o new.json
+    python bench/minibench.py compare base.json new.json
+
+``compare`` exits with status 1 when a kernel is slower than ``--threshold``
+times its reference (minimum times are compared).
+"""
+import fnmatch
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
 import time
 
-from oar.kao.job import JobPseudo, set_jobs_cache_keys
-from oar.kao.scheduling import schedule_id_jobs_ct
-from oar.kao.slot import Slot, SlotSet
-
-
-class Timer(object):
-
-    """
-    From http://www.huyng.com/posts/python-performance-analysis/
-    """
-
-    def __init__(self, verbose=False):
-        self.verbose = verbose
-
-    def __enter__(self):
-        self.start = time.time()
-        return self
-
-    def __exit__(self, *args):
-        self.end = time.time()
-        self.secs = self.end - self.start
-        self.msecs = self.secs * 1000  # millisecs
-        if self.verbose:
-            print("elapsed time: %f ms" % self.msecs)
+import click
+from procset import ProcSet
+
+import oar.lib.tools as tools
+from oar.kao.meta_sched import meta_schedule
+from oar.kao.platform import Platform
+from oar.kao.quotas import Quotas
+from oar.kao.scheduling import find_first_suitable_contiguous_slots
+from oar.kao.slot import ArraySlotSet, SlotSet
+from oar.lib import Resource, config, create_logger, db
+from oar.lib.hierarchy import Hierarchy, find_resource_hierarchies_scattered
+from oar.lib.job_handling import JobPseudo, get_data_jobs, insert_job, save_assigns
+from oar.lib.resource import ResourceSet
+
+BENCH_CONFIG = {
+    "DB_TYPE": "sqlite",
+    "DB_BASE_FILE": ":memory:",
+    "LOG_LEVEL": 1,
+    "LOG_FILE": ":stderr:",
+    "HIERARCHY_LABELS": "resource_id,network_address",
+    "SCHEDULER_RESOURCE_ORDER": "resource_id ASC",
+    "SCHEDULER_JOB_SECURITY_TIME": 60,
+    "SCHEDULER_GANTT_HOLE_MINIMUM_TIME": 300,
+    "SCHEDULER_AVAILABLE_SUSPENDED_RESOURCE_TYPE": "default",
+    "SCHEDULER_PRIORITY_HIERARCHY_ORDER": "network_address/resource_id",
+    "SCHEDULER_NB_PROCESSES": 1,
+    "SCHEDULER_TIMEOUT": 30,
+    "SERVER_HOSTNAME": "server",
+    "SERVER_PORT": 6666,
+    "OAR_RUNTIME_DIRECTORY": "/var/lib/oar",
+    "OARSUB_DEFAULT_RESOURCES": "/resource_id=1",
+    "OARSUB_NODES_RESOURCES": "network_address",
+    "OARSUB_FORCE_JOB_KEY": "no",
+    "ENERGY_SAVING_INTERNAL": "no",
+    "QUOTAS": "no",
+}
+
+# (name, params, quick params, setup): setup(**params) prepares the data of
+# one repetition and returns the function to time
+KERNELS = []
+
+
+def kernel(name, quick=None, **params):
+    def decorator(setup):
+        KERNELS.append((name, params, quick or params, setup))
+        return setup
+
+    return decorator
+
+
+def kernel_id(name, params):
+    return "%s[%s]" % (
+        name,
+        ",".join("%s=%s" % (k, v) for k, v in sorted(params.items())),
+    )
 
 
-def create_simple_job(i, res_rqt, ctnts_res):
-    return JobPseudo(
-        id=i,
-        state="Waiting",
+def random_jobs(nb_jobs, nb_res, horizon, max_size=8, seed=0):
+    rng = random.Random(seed)
+    jobs = []
+    for i in range(1, nb_jobs + 1):
+        first = rng.randint(1, nb_res - max_size)
+        jobs.append(
+            JobPseudo(
+                id=i,
+                start_time=rng.randint(0, horizon),
+                walltime=rng.randint(60, horizon // 10),
+                res_set=ProcSet((first, first + rng.randint(0, max_size - 1))),
+                ts=False,
+                ph=0,
+            )
+        )
+    jobs.sort(key=lambda j: j.start_time)
+    return jobs
+
+
+def create_resources(nb_nodes, nb_cores):
+    db.session.execute(
+        Resource.__table__.insert(),
+        [
+            {"network_address": "node%d" % i}
+            for i in range(nb_nodes)
+            for _ in range(nb_cores)
+        ],
+    )
+    db.commit()
+
+
+@kernel(
+    "split_slots",
+    quick=dict(slot_set="dict", nb_jobs=200),
+    slot_set="dict",
+    nb_jobs=500,
+)
+@kernel(
+    "split_slots",
+    quick=dict(slot_set="array", nb_jobs=200),
+    slot_set="array",
+    nb_jobs=500,
+)
+def split_slots(slot_set, nb_jobs):
+    cls = SlotSet if slot_set == "dict" else ArraySlotSet
+    jobs = random_jobs(nb_jobs, 1024, 100000)
+
+    def run():
+        cls((ProcSet((1, 1024)), 0)).split_slots_jobs(jobs)
+
+    return run
+
+
+@kernel("find_first_suitable_contiguous_slots", quick=dict(nb_jobs=200), nb_jobs=500)
+def find_first_suitable_slots(nb_jobs):
+    res = ProcSet((1, 1024))
+    slots_set = SlotSet((res, 0))
+    slots_set.split_slots_jobs(random_jobs(nb_jobs, 1024, 100000))
+    hy = Hierarchy(
+        hy={
+            "node": [ProcSet((i, i + 7)) for i in range(1, 1024, 8)],
+            "resource_id": [ProcSet(i) for i in range(1, 1025)],
+        }
+    ).hy
+    job = JobPseudo(
+        id=0,
         types={},
-        mld_res_rqts=[(i, 60, [([("node", res_rqt)], list(ctnts_res))])],
         deps=[],
         key_cache={},
+        mld_res_rqts=[(1, 3600, [([("node", 64), ("resource_id", 4)], res)])],
         ts=False,
         ph=0,
+        find=False,
+        no_quotas=True,
     )
 
-
-def init_data_structure(nb_res):
-    res = [(1, nb_res + 1)]
-    ss = SlotSet(Slot(1, 0, 0, list(res), 0, 2**31))
-    all_ss = {"default": ss}
-
-    h0_res_itvs = [[(i, i)] for i in range(1, nb_res + 1)]
-    # print h0_res_itvs
-    hy = {"node": h0_res_itvs}
-
-    return (res, hy, all_ss)
-
-
-def simple_same_jobs_nb_res(nb_job, nb_rqt_res, ctnts_res):
+    def run():
+        find_first_suitable_contiguous_slots(
+            slots_set, job, job.mld_res_rqts[0], hy, -1
+        )
+
+    return run
+
+
+@kernel(
+    "find_resource_hierarchies_scattered",
+    quick=dict(nb_nodes=256, nb_requests=20),
+    nb_nodes=2048,
+    nb_requests=100,
+)
+def hierarchies_scattered(nb_nodes, nb_requests):
+    nb_cores = 8
+    nb_res = nb_nodes * nb_cores
+    hy = Hierarchy(
+        hy={
+            "switch": [
+                ProcSet((i, i + 32 * nb_cores - 1))
+                for i in range(1, nb_res, 32 * nb_cores)
+            ],
+            "node": [
+                ProcSet((i, i + nb_cores - 1)) for i in range(1, nb_res, nb_cores)
+            ],
+            "core": [ProcSet(i) for i in range(1, nb_res + 1)],
+        }
+    ).hy
+    levels = [hy["switch"], hy["node"], hy["core"]]
+    rng = random.Random(0)
+    # some cores of a quarter of the nodes are busy
+    busy = ProcSet(
+        *[
+            (first, first + rng.randint(0, nb_cores - 1))
+            for first in range(1, nb_res, 4 * nb_cores)
+        ]
+    )
+    free = ProcSet((1, nb_res)) - busy
+
+    def run():
+        for i in range(nb_requests):
+            find_resource_hierarchies_scattered(free, levels, [2, 8, 4])
+
+    return run
+
+
+@kernel(
+    "quotas_check", quick=dict(nb_rules=20, nb_jobs=200), nb_rules=100, nb_jobs=2000
+)
+def quotas_check(nb_rules, nb_jobs):
+    rng = random.Random(0)
+    queues = ["*", "/", "default", "admin"]
+    projects = ["*", "/", "p1", "p2"]
+    types = ["*", "besteffort", "deploy"]
+    users = ["*", "/"] + ["u%d" % i for i in range(20)]
+    Quotas.job_types = types
+    ResourceSet.default_itvs = ProcSet((1, 1024))
+
+    rules = {
+        (
+            rng.choice(queues),
+            rng.choice(projects),
+            rng.choice(types),
+            rng.choice(users),
+        ): [rng.randint(100, 1000), rng.randint(10, 100), -1]
+        for i in range(nb_rules)
+    }
+
+    def random_job():
+        return JobPseudo(
+            queue_name=rng.choice(queues[2:]),
+            project=rng.choice(projects[2:]),
+            user=rng.choice(users[2:]),
+            types={t: "" for t in rng.sample(types[1:], rng.randint(0, 1))},
+            res_set=ProcSet((1, rng.randint(1, 32))),
+            walltime=rng.randint(60, 3600),
+        )
+
+    quotas = Quotas()
+    quotas.rules = rules
+    for i in range(100):
+        quotas.update(random_job())
+    jobs = [random_job() for i in range(nb_jobs)]
+
+    def run():
+        for job in jobs:
+            quotas.check(job)
+
+    return run
+
+
+@kernel("get_data_jobs", quick=dict(nb_jobs=50), nb_jobs=500)
+def data_jobs(nb_jobs):
+    db["Queue"].create(
+        name="default", priority=3, scheduler_policy="kamelot", state="Active"
+    )
+    create_resources(64, 16)
+    for i in range(nb_jobs):
+        insert_job(
+            res=[(3600, [("network_address=%d/resource_id=4" % (1 + i % 4), "")])],
+            properties="",
+        )
+    plt = Platform()
+    resource_set = plt.resource_set()
+    jobs, jids, _ = plt.get_waiting_jobs("default")
+
+    def run():
+        get_data_jobs(jobs, jids, resource_set, 60)
+
+    return run
+
+
+@kernel(
+    "save_assigns", quick=dict(mode="default", nb_jobs=50), mode="default", nb_jobs=500
+)
+@kernel("save_assigns", quick=dict(mode="bulk", nb_jobs=50), mode="bulk", nb_jobs=500)
+def assigns(mode, nb_jobs):
+    config["SCHEDULER_SAVE_ASSIGNS"] = mode
+    db["Queue"].create(
+        name="default", priority=3, scheduler_policy="kamelot", state="Active"
+    )
+    create_resources(64, 16)
+    resource_set = ResourceSet()
     jobs = {}
-
-    for i in range(1, nb_job + 1):
-        jobs[i] = create_simple_job(i, nb_rqt_res, ctnts_res)
-
-    return (range(1, nb_job + 1), jobs)
-
-
-def eva_sched_foo(all_ss, jobs, hy, j_ids):
-    schedule_id_jobs_ct(all_ss, jobs, hy, j_ids, 10)
-
-
-def simple_bench_1(job_key_cache=False):
-    nb_res = 10
-
-    x = []
-    y = []
-    for k in range(1, 12):
-        i = 2**k
-        print("nb_jobs", i)
-        (res, hy, all_ss) = init_data_structure(nb_res)
-        (j_ids, jobs) = simple_same_jobs_nb_res(i, 10, res)
-
-        if job_key_cache:
-            set_jobs_cache_keys(jobs)
-
-        # for k,job in jobs.items():
-        #    print job.key_cache
-
-        with Timer() as t:
-            eva_sched_foo(all_ss, jobs, hy, j_ids)
-        print("=> nb_job:", i, " time: %s s" % t.secs)
-
-        x.append(i)
-        y.append(t.secs)
-
-    print(x)
-    print(y)
-
-
-def simple_bench_0():
-    nb_res = 10
-    i = 1024
-    print("nb_jobs", i)
-    (res, hy, all_ss) = init_data_structure(nb_res)
-    (j_ids, jobs) = simple_same_jobs_nb_res(i, 10, res)
-
-    eva_sched_foo(all_ss, jobs, hy, j_ids)
-
-
-print("simple_bench_1 same job cache enable")
-simple_bench_1(True)
-print("simple_bench_1 same job cache disable")
-simple_bench_1(False)
-
-#   res = [(1, 201)]
-# nb_res = 200
-#  [  ( [("node", 10) ], res ) ]
-# j_id: 4
-# (id: 1 p: 0 n: 2 ) b: 0 e: 59 itvs: [(21, 201)]
-# (id: 2 p: 1 n: 3 ) b: 60 e: 59 itvs: [(11, 201)]
-# (id: 3 p: 2 n: 0 ) b: 60 e: 2147483648 itvs: [(1, 201)]
+    for i in range(nb_jobs):
+        job_id = insert_job(res=[(3600, [("resource_id=64", "")])], properties="")
+        first = 1 + (i * 64) % 1024
+        jobs[job_id] = JobPseudo(
+            id=job_id,
+            moldable_id=db["MoldableJobDescription"]
+            .query.filter_by(job_id=job_id)
+            .one()
+            .id,
+            start_time=i * 60,
+            walltime=3600,
+            res_set=ProcSet((first, first + 63)),
+            type="PASSIVE",
+            queue_name="default",
+        )
+
+    def run():
+        save_assigns(jobs, resource_set)
+
+    return run
+
+
+@kernel("meta_schedule", quick=dict(nb_jobs=20), nb_jobs=100)
+def meta_sched(nb_jobs):
+    db["Queue"].create(
+        name="default", priority=3, scheduler_policy="kamelot", state="Active"
+    )
+    create_resources(64, 16)
+    rng = random.Random(0)
+    for i in range(nb_jobs):
+        insert_job(
+            res=[
+                (rng.randint(600, 7200), [("resource_id=%d" % rng.randint(1, 64), "")])
+            ],
+            properties="",
+        )
+
+    def run():
+        meta_schedule("internal", Platform())
+
+    return run
+
+
+def setup_bench():
+    config.update(BENCH_CONFIG)
+    create_logger()
+    os.environ.setdefault("USER", "oar")
+    # no Almighty, nodes or users to notify
+    tools.create_almighty_socket = lambda *args: None
+    tools.notify_almighty = lambda *args: True
+    tools.notify_tcp_socket = lambda addr, port, msg: len(msg)
+    tools.notify_user = lambda job, state, msg: len(state + msg)
+    tools.notify_bipbip_commander = lambda *args: True
+    db.create_all(bind=db.engine)
+    db.reflect()
+
+
+def run_kernel(setup, params, repeat):
+    times = []
+    saved_config = dict(config)
+    for i in range(repeat):
+        with db.session(ephemeral=True):
+            run = setup(**params)
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        config.update(saved_config)
+    return times
+
+
+def revision():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option("-o", "--output", type=click.File("w"), help="JSON results file.")
+@click.option("-r", "--repeat", default=5, help="Repetitions of each kernel.")
+@click.option("-k", "--kernels", default="*", help="Kernels to run (glob pattern).")
+@click.option("--quick", is_flag=True, help="Small sizes, for smoke testing.")
+def run(output, repeat, kernels, quick):
+    """Run the kernels and print their timings."""
+    setup_bench()
+    results = []
+    for name, params, quick_params, setup in KERNELS:
+        if not fnmatch.fnmatch(name, kernels):
+            continue
+        if quick:
+            params = quick_params
+        times = run_kernel(setup, params, repeat)
+        result = {
+            "id": kernel_id(name, params),
+            "name": name,
+            "params": params,
+            "times": times,
+            "min": min(times),
+            "median": statistics.median(times),
+        }
+        results.append(result)
+        click.echo(
+            "%-60s min %10.6fs  median %10.6fs"
+            % (result["id"], result["min"], result["median"])
+        )
+
+    if output:
+        json.dump(
+            {
+                "revision": revision(),
+                "date": int(time.time()),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "repeat": repeat,
+                "results": results,
+            },
+            output,
+            indent=2,
+        )
+
+
+@cli.command()
+@click.argument("reference", type=click.File())
+@click.argument("current", type=click.File())
+@click.option(
+    "-t",
+    "--threshold",
+    default=1.25,
+    help="Slowdown ratio of minimum times reported as a regression.",
+)
+def compare(reference, current, threshold):
+    """Compare two JSON results files."""
+    reference = {r["id"]: r for r in json.load(reference)["results"]}
+    regressions = 0
+    for result in json.load(current)["results"]:
+        if result["id"] not in reference:
+            click.echo("%-60s new" % result["id"])
+            continue
+        ratio = result["min"] / reference[result["id"]]["min"]
+        regression = ratio > threshold
+        regressions += regression
+        click.echo(
+            "%-60s %10.6fs -> %10.6fs  x%.2f%s"
+            % (
+                result["id"],
+                reference[result["id"]]["min"],
+                result["min"],
+                ratio,
+                "  REGRESSION" if regression else "",
+            )
+        )
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    cli()
@@ -24,6 +24,7 @@ from oar.lib import (  # EventLogHostname,; ResourceLog,
     GanttJobsPrediction,
     GanttJobsPredictionsVisu,
     GanttJobsResource,
+    GanttJobsResourcesItvs,
     GanttJobsResourcesVisu,
     Job,
     JobDependencie,
@@ -227,6 +228,7 @@ def delete_resources():
 def delete_gantt_tables():
     db.query(GanttJobsPrediction).delete(synchronize_session=False)
     db.query(GanttJobsResource).delete(synchronize_session=False)
+    db.query(GanttJobsResourcesItvs).delete(synchronize_session=False)
     db.query(GanttJobsPredictionsVisu).delete(synchronize_session=False)
     db.query(GanttJobsResourcesVisu).delete(synchronize_session=False)
     db.commit()
@@ -580,7 +582,7 @@ def oarbench(bench_file, version, result_file):
     return cmd_ret
 
 
-@click.command()
+@click.group(invoke_without_command=True)
 @click.option(
     "-f", "--bench-file", type=click.STRING, help="Benchmark configuration file."
 )
@@ -591,7 +593,8 @@ def oarbench(bench_file, version, result_file):
     help="Result file that should contain the data.",
 )
 @click.option("-V", "--version", is_flag=True, help="Print OAR version.")
-def cli(bench_file, version, result_file):
+@click.pass_context
+def cli(ctx, bench_file, version, result_file):
     """
     Example of config file:
     ```yaml
@@ -606,5 +609,109 @@ def cli(bench_file, version, result_file):
         - { jobs_file: path2, nb_resources: 100 }
     ```
     """
-    cmd_ret = oarbench(bench_file, version, result_file)
-    cmd_ret.exit()
+    if ctx.invoked_subcommand is None:
+        cmd_ret = oarbench(bench_file, version, result_file)
+        cmd_ret.exit()
+
+
+@cli.command()
+@click.option("--nb-clusters", type=int, default=1, show_default=True)
+@click.option("--nb-switches", type=int, default=4, show_default=True)
+@click.option("--nb-hosts", type=int, default=16, help="Hosts per switch.")
+@click.option("--nb-cpus", type=int, default=2, help="Cpus per host.")
+@click.option("--nb-cores", type=int, default=16, help="Cores per cpu.")
+@click.option("--nb-waiting", type=int, default=1000, show_default=True)
+@click.option("--nb-running", type=int, default=0, show_default=True)
+@click.option("--nb-users", type=int, default=50, show_default=True)
+@click.option("--nb-projects", type=int, default=5, show_default=True)
+@click.option("--moldable-ratio", type=float, default=0.2, show_default=True)
+@click.option("--dependency-ratio", type=float, default=0.1, show_default=True)
+@click.option("--nb-containers", type=int, default=0, show_default=True)
+@click.option(
+    "--quotas-file",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write quotas rules to this file and enable quotas.",
+)
+@click.option("--seed", type=int, default=0, show_default=True)
+@click.option(
+    "--memory",
+    is_flag=True,
+    help="Generate in an in-memory SQLite database instead of the configured one.",
+)
+@click.option(
+    "--schedule", is_flag=True, help="Time one kamelot scheduling cycle afterwards."
+)
+def generate(
+    nb_clusters,
+    nb_switches,
+    nb_hosts,
+    nb_cpus,
+    nb_cores,
+    nb_waiting,
+    nb_running,
+    nb_users,
+    nb_projects,
+    moldable_ratio,
+    dependency_ratio,
+    nb_containers,
+    quotas_file,
+    seed,
+    memory,
+    schedule,
+):
+    """
+    Populate the database with a synthetic platform and workload, generated
+    from the given sizes and seed (cluster/switch/host/cpu/core hierarchy).
+    """
+    from oar.kao.platform import Platform
+    from oar.lib.generator import (
+        HIERARCHY_LABELS,
+        add_platform_properties,
+        generate_platform,
+        generate_quotas,
+        generate_workload,
+    )
+
+    if memory:
+        config.update({"DB_TYPE": "sqlite", "DB_BASE_FILE": ":memory:"})
+        db.create_all()
+    add_platform_properties()
+    db.reflect()
+    config["HIERARCHY_LABELS"] = HIERARCHY_LABELS
+    config["RESOURCE_SET_CACHE"] = "yes"
+
+    start = time.time()
+    nb_resources = generate_platform(
+        nb_clusters, nb_switches, nb_hosts, nb_cpus, nb_cores, seed
+    )
+    click.echo(f"# resources: {nb_resources} ({time.time() - start:.2f}s)")
+
+    if quotas_file:
+        generate_quotas(quotas_file, nb_resources, nb_projects)
+        config.update({"QUOTAS": "yes", "QUOTAS_CONF_FILE": quotas_file})
+
+    start = time.time()
+    now = int(time.time())
+    waiting, running = generate_workload(
+        nb_waiting,
+        nb_running,
+        nb_users,
+        nb_projects,
+        moldable_ratio,
+        dependency_ratio,
+        nb_containers,
+        start_time=now,
+        seed=seed,
+    )
+    click.echo(
+        f"# waiting jobs: {len(waiting)}, running jobs: {len(running)}"
+        f" ({time.time() - start:.2f}s)"
+    )
+
+    if schedule:
+        start = time.time()
+        kamelot.schedule_cycle(Platform(), now, ["default"])
+        click.echo(
+            f"# scheduled jobs: {len_gantt_jobs_prediction()}"
+            f" ({time.time() - start:.2f}s)"
+        )
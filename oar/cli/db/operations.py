@@ -34,10 +34,14 @@ def archive_db(ctx):
 
     ignored_tables = [
         "accounting",
+        "accounting_karma",
+        "accounting_karma_windows",
+        "accounting_rollups",
         "gantt_jobs_predictions",
         "gantt_jobs_predictions_log",
         "gantt_jobs_predictions_visu",
         "gantt_jobs_resources",
+        "gantt_jobs_resources_itvs",
         "gantt_jobs_resources_log",
         "gantt_jobs_resources_visu",
     ]
@@ -3,11 +3,12 @@ import click
 
 import oar.lib.tools as tools
 from oar import VERSION
-from oar.lib import config
+from oar.lib import config, db
 from oar.lib.accounting import (
     check_accounting_update,
     delete_accounting_windows_before,
     delete_all_from_accounting,
+    rebuild_accounting_rollups,
 )
 
 from .utils import CommandReturns
@@ -24,8 +25,13 @@ click.disable_unicode_literals_warning = True
     type=int,
     help="Delete every records the number of given seconds ago.",
 )
+@click.option(
+    "--rebuild-rollups",
+    is_flag=True,
+    help="Compute again the daily and monthly sums of the accounting table.",
+)
 @click.option("-V", "--version", is_flag=True, help="Print OAR version number.")
-def cli(reinitialize, delete_before, version):
+def cli(reinitialize, delete_before, rebuild_rollups, version):
     """Feed accounting table to make usage statistics."""
     # Default window size
     window_size = 86400
@@ -49,5 +55,9 @@ def cli(reinitialize, delete_before, version):
         delete_windows_before = tools.get_date() - delete_windows_before
 
         delete_accounting_windows_before(delete_windows_before)
+    elif rebuild_rollups:
+        print("Computing again the accounting rollups...")
+        rebuild_accounting_rollups()
+        db.commit()
     else:
         check_accounting_update(window_size)
@@ -0,0 +1,157 @@
+# coding: utf-8
+"""
+Gantt kept in memory between scheduling rounds.
+
+When the meta scheduler runs as a server (see :mod:`oar.kao.kao`), the
+:class:`SlotSet` filled with the previously scheduled jobs (running jobs and
+advance reservations) is kept from one round to the next. At each round, only
+the differences between the jobs of the previous round and the current ones
+are applied: jobs which disappeared or whose assignment changed are removed,
+new ones are inserted, and slots ending before the current time are dropped.
+
+The gantt is built again from scratch when the resources change, when the
+scheduled jobs use features which cannot be removed from slots (quotas,
+containers, timesharing, placeholders) or every ``rebuild_period`` rounds to
+bound the fragmentation of slots.
+"""
+from oar.kao.quotas import Quotas
+from oar.kao.scheduling import init_slot_sets
+from oar.lib import get_logger
+from oar.lib.job_handling import NO_PLACEHOLDER, JobPseudo
+
+logger = get_logger("oar.kao.incremental_gantt")
+
+NOT_INCREMENTAL_TYPES = ("container", "inner", "timesharing", "placeholder", "allow")
+
+
+def is_incremental_job(job):
+    """Return True if the job's resources can be removed from the slots."""
+    if job.ts or (job.ph != NO_PLACEHOLDER):
+        return False
+    for job_type in NOT_INCREMENTAL_TYPES:
+        if job_type in job.types:
+            return False
+    return True
+
+
+class IncrementalGantt(object):
+    """Maintain the default :class:`SlotSet` across scheduling rounds."""
+
+    rebuild_period = 100
+
+    def __init__(self):
+        self.slot_set = None
+        # moldable_id -> (start_time, walltime, res_set) of jobs inserted in slot_set
+        self.jobs = {}
+        self.signature = None
+        self.nb_updates = 0
+
+    def resources_signature(self, resource_set, job_security_time):
+        nb_resources = resource_set.nb_resources_all
+        return (
+            resource_set.roid_itvs,
+            sorted(resource_set.available_upto.items()),
+            list(resource_set.rid_o2i[:nb_resources]),
+            job_security_time,
+        )
+
+    def pseudo_job(self, assignment, now):
+        """Return a job occupying the assignment's resources from now."""
+        (start_time, walltime, res_set) = assignment
+        start = max(start_time, now)
+        return JobPseudo(
+            id=0,
+            start_time=start,
+            walltime=start_time + walltime - start,
+            res_set=res_set,
+            ts=False,
+            ph=NO_PLACEHOLDER,
+        )
+
+    def rebuild(self, resource_set, scheduled_jobs, job_security_time, now, signature):
+        all_slot_sets = init_slot_sets(
+            resource_set, scheduled_jobs, job_security_time, now
+        )
+        if (len(all_slot_sets) == 1) and not Quotas.enabled:
+            self.slot_set = all_slot_sets["default"].copy()
+            self.signature = signature
+            self.nb_updates = 0
+        else:
+            self.slot_set = None
+        return all_slot_sets
+
+    def slot_sets(self, resource_set, scheduled_jobs, job_security_time, now):
+        """
+        Return the slot sets for the current round, as
+        :func:`oar.kao.scheduling.init_slot_sets` would build them.
+
+        :param ResourceSet resource_set: \\
+            Resources available for scheduling.
+        :param list scheduled_jobs: \\
+            Jobs already scheduled.
+        :param int job_security_time: \\
+            Job security time.
+        :param int now: \\
+            Time from which to schedule.
+        """
+        signature = self.resources_signature(resource_set, job_security_time)
+
+        jobs = {}
+        incremental = not Quotas.enabled
+        for job in scheduled_jobs:
+            if "besteffort" in job.types:
+                continue
+            if not is_incremental_job(job):
+                incremental = False
+                break
+            # jobs which should be already finished do not appear in slots
+            if job.start_time + job.walltime > now:
+                jobs[job.moldable_id] = (job.start_time, job.walltime, job.res_set)
+
+        if (
+            (not incremental)
+            or (self.slot_set is None)
+            or (signature != self.signature)
+            or (now < self.slot_set.begin)
+            or (self.nb_updates >= self.rebuild_period)
+        ):
+            logger.debug("Build the gantt from scratch")
+            self.jobs = jobs
+            return self.rebuild(
+                resource_set, scheduled_jobs, job_security_time, now, signature
+            )
+
+        slot_set = self.slot_set
+        slot_set.drop_slots_before(now)
+
+        to_remove = []
+        for moldable_id, assignment in self.jobs.items():
+            if jobs.get(moldable_id) != assignment:
+                (start_time, walltime, res_set) = assignment
+                if start_time + walltime > now:
+                    to_remove.append(assignment)
+
+        to_insert = []
+        for moldable_id, assignment in jobs.items():
+            if self.jobs.get(moldable_id) != assignment:
+                to_insert.append(assignment)
+
+        logger.debug(
+            "Update the gantt, jobs removed: "
+            + str(len(to_remove))
+            + ", jobs inserted: "
+            + str(len(to_insert))
+        )
+
+        for assignment in sorted(to_remove, key=lambda a: a[0]):
+            j = self.pseudo_job(assignment, now)
+            slot_set.split_slots_jobs([j], False)  # add job's resources
+
+        for assignment in sorted(to_insert, key=lambda a: a[0]):
+            j = self.pseudo_job(assignment, now)
+            slot_set.split_slots_jobs([j])
+
+        self.jobs = jobs
+        self.nb_updates += 1
+
+        return {"default": slot_set.copy()}
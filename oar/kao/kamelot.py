@@ -3,13 +3,18 @@ import sys
 
 import oar.kao.custom_jobs_sorting
 from oar.kao.karma import karma_jobs_sorting
+from oar.kao.metrics import metrics
 from oar.kao.multifactor_priority import multifactor_jobs_sorting
 from oar.kao.platform import Platform
 from oar.kao.quotas import Quotas
-from oar.kao.scheduling import schedule_id_jobs_ct, set_slots_with_prev_scheduled_jobs
-from oar.kao.slot import MAX_TIME, SlotSet
+from oar.kao.scheduling import (
+    placement_budget,
+    schedule_id_jobs_ct,
+    set_slots_with_prev_scheduled_jobs,
+)
+from oar.kao.slot import MAX_TIME, new_slot_set
 from oar.lib import config, get_logger
-from oar.lib.job_handling import NO_PLACEHOLDER, JobPseudo
+from oar.lib.job_handling import NO_PLACEHOLDER, JobPseudo, set_jobs_not_reevaluated
 
 # Constant duration time of a besteffort job *)
 besteffort_duration = 300  # TODO conf ???
@@ -54,16 +59,33 @@ def jobs_sorting(queues, now, waiting_jids, waiting_jobs, plt):
     return waiting_ordered_jids
 
 
-def internal_schedule_cycle(plt, now, all_slot_sets, job_security_time, queues):
+def internal_schedule_cycle(
+    plt, now, all_slot_sets, job_security_time, queues, budget=None
+):
+    """
+    Place the waiting jobs of `queues` in `all_slot_sets` and save their
+    assignments. Return the ids of the jobs not reached within the placement
+    time `budget` (see :func:`oar.kao.scheduling.schedule_id_jobs_ct`).
+    """
 
     resource_set = plt.resource_set()
+    queue = ",".join(queues)
 
     #
     # Retrieve waiting jobs
     #
-    waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(queues)
-
-    if nb_waiting_jobs > 0:
+    with metrics.phase("get_waiting_jobs", queue) as phase:
+        waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(queues)
+        phase.jobs += nb_waiting_jobs
+
+    if (nb_waiting_jobs > 0) and (budget is not None) and budget.exhausted():
+        logger.info(
+            "placement time budget exhausted, queue(s) {} not re-evaluated".format(
+                queue
+            )
+        )
+        return waiting_jids
+    elif nb_waiting_jobs > 0:
         logger.info("nb_waiting_jobs:" + str(nb_waiting_jobs))
         for jid in waiting_jids:
             logger.debug("waiting_jid: " + str(jid))
@@ -71,31 +93,45 @@ def internal_schedule_cycle(plt, now, all_slot_sets, job_security_time, queues):
         #
         # Get  additional waiting jobs' data
         #
-        plt.get_data_jobs(waiting_jobs, waiting_jids, resource_set, job_security_time)
+        with metrics.phase("get_data_jobs", queue) as phase:
+            plt.get_data_jobs(
+                waiting_jobs, waiting_jids, resource_set, job_security_time
+            )
+            phase.jobs += nb_waiting_jobs
 
-        waiting_ordered_jids = jobs_sorting(
-            queues, now, waiting_jids, waiting_jobs, plt
-        )
+        with metrics.phase("sorting", queue) as phase:
+            waiting_ordered_jids = jobs_sorting(
+                queues, now, waiting_jids, waiting_jobs, plt
+            )
+            phase.jobs += nb_waiting_jobs
 
         #
         # Scheduled
         #
-        schedule_id_jobs_ct(
-            all_slot_sets,
-            waiting_jobs,
-            resource_set.hierarchy,
-            waiting_ordered_jids,
-            job_security_time,
-        )
+        with metrics.phase("placement", queue) as phase:
+            not_reevaluated_jids = schedule_id_jobs_ct(
+                all_slot_sets,
+                waiting_jobs,
+                resource_set.hierarchy,
+                waiting_ordered_jids,
+                job_security_time,
+                budget,
+            )
+            phase.jobs += len(waiting_ordered_jids)
+            phase.count_slots(all_slot_sets)
 
         #
         # Save assignement
         #
         logger.info("save assignement")
 
-        plt.save_assigns(waiting_jobs, resource_set)
+        with metrics.phase("save_assigns", queue) as phase:
+            plt.save_assigns(waiting_jobs, resource_set)
+            phase.jobs += nb_waiting_jobs
+        return not_reevaluated_jids
     else:
         logger.info("no waiting jobs")
+        return []
 
 
 def schedule_cycle(plt, now, queues=["default"]):
@@ -105,10 +141,15 @@ def schedule_cycle(plt, now, queues=["default"]):
             now, " ".join([q for q in queues])
         )
     )
+    metrics.reset()
+    queue = ",".join(queues)
+    budget = placement_budget()
     #
     # Retrieve waiting jobs
     #
-    waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(queues)
+    with metrics.phase("get_waiting_jobs", queue) as phase:
+        waiting_jobs, waiting_jids, nb_waiting_jobs = plt.get_waiting_jobs(queues)
+        phase.jobs += nb_waiting_jobs
 
     if nb_waiting_jobs > 0:
         logger.info("nb_waiting_jobs:" + str(nb_waiting_jobs))
@@ -117,76 +158,103 @@ def schedule_cycle(plt, now, queues=["default"]):
 
         job_security_time = int(config["SCHEDULER_JOB_SECURITY_TIME"])
 
-        #
-        # Determine Global Resource Intervals and Initial Slot
-        #
-        resource_set = plt.resource_set()
-        initial_slot_set = SlotSet((resource_set.roid_itvs, now))
+        with metrics.phase("gantt_init") as phase:
+            #
+            # Determine Global Resource Intervals and Initial Slot
+            #
+            resource_set = plt.resource_set()
+            initial_slot_set = new_slot_set((resource_set.roid_itvs, now))
 
-        #
-        #  Resource availabilty (Available_upto field) is integrated through pseudo job
-        #
-        pseudo_jobs = []
-        for t_avail_upto in sorted(resource_set.available_upto.keys()):
-            itvs = resource_set.available_upto[t_avail_upto]
-            j = JobPseudo()
-            # print t_avail_upto, max_time - t_avail_upto, itvs
-            j.start_time = t_avail_upto
-            j.walltime = MAX_TIME - t_avail_upto
-            j.res_set = itvs
-            j.ts = False
-            j.ph = NO_PLACEHOLDER
-
-            pseudo_jobs.append(j)
-
-        if pseudo_jobs != []:
-            initial_slot_set.split_slots_jobs(pseudo_jobs)
+            #
+            #  Resource availabilty (Available_upto field) is integrated through pseudo job
+            #
+            pseudo_jobs = []
+            for t_avail_upto in sorted(resource_set.available_upto.keys()):
+                itvs = resource_set.available_upto[t_avail_upto]
+                j = JobPseudo()
+                # print t_avail_upto, max_time - t_avail_upto, itvs
+                j.start_time = t_avail_upto
+                j.walltime = MAX_TIME - t_avail_upto
+                j.res_set = itvs
+                j.ts = False
+                j.ph = NO_PLACEHOLDER
+
+                pseudo_jobs.append(j)
+
+            if pseudo_jobs != []:
+                initial_slot_set.split_slots_jobs(pseudo_jobs)
 
         #
         # Get  additional waiting jobs' data
         #
-        plt.get_data_jobs(waiting_jobs, waiting_jids, resource_set, job_security_time)
+        with metrics.phase("get_data_jobs", queue) as phase:
+            plt.get_data_jobs(
+                waiting_jobs, waiting_jids, resource_set, job_security_time
+            )
+            phase.jobs += nb_waiting_jobs
 
         # Job sorting (karma and advanced)
-        waiting_ordered_jids = jobs_sorting(
-            queues, now, waiting_jids, waiting_jobs, plt
-        )
-
-        #
-        # Get already scheduled jobs advanced reservations and jobs from more higher priority queues
-        #
-        scheduled_jobs = plt.get_scheduled_jobs(resource_set, job_security_time, now)
-
-        all_slot_sets = {"default": initial_slot_set}
+        with metrics.phase("sorting", queue) as phase:
+            waiting_ordered_jids = jobs_sorting(
+                queues, now, waiting_jids, waiting_jobs, plt
+            )
+            phase.jobs += nb_waiting_jobs
 
-        if scheduled_jobs != []:
-            if (len(queues) == 1) and (queues[0] == "besteffort"):
-                filter_besteffort = False
-            else:
-                filter_besteffort = True
-            set_slots_with_prev_scheduled_jobs(
-                all_slot_sets, scheduled_jobs, job_security_time, now, filter_besteffort
+        with metrics.phase("gantt_init") as phase:
+            #
+            # Get already scheduled jobs advanced reservations and jobs from more higher priority queues
+            #
+            scheduled_jobs = plt.get_scheduled_jobs(
+                resource_set, job_security_time, now
             )
+
+            all_slot_sets = {"default": initial_slot_set}
+
+            if scheduled_jobs != []:
+                if (len(queues) == 1) and (queues[0] == "besteffort"):
+                    filter_besteffort = False
+                else:
+                    filter_besteffort = True
+                set_slots_with_prev_scheduled_jobs(
+                    all_slot_sets,
+                    scheduled_jobs,
+                    job_security_time,
+                    now,
+                    filter_besteffort,
+                )
+            phase.jobs += len(scheduled_jobs)
+            phase.count_slots(all_slot_sets)
         #
         # Scheduled
         #
-        schedule_id_jobs_ct(
-            all_slot_sets,
-            waiting_jobs,
-            resource_set.hierarchy,
-            waiting_ordered_jids,
-            job_security_time,
-        )
+        with metrics.phase("placement", queue) as phase:
+            not_reevaluated_jids = schedule_id_jobs_ct(
+                all_slot_sets,
+                waiting_jobs,
+                resource_set.hierarchy,
+                waiting_ordered_jids,
+                job_security_time,
+                budget,
+            )
+            phase.jobs += len(waiting_ordered_jids)
+            phase.count_slots(all_slot_sets)
 
         #
         # Save assignement
         #
         logger.info("save assignement")
 
-        plt.save_assigns(waiting_jobs, resource_set)
+        with metrics.phase("save_assigns", queue) as phase:
+            plt.save_assigns(waiting_jobs, resource_set)
+            phase.jobs += nb_waiting_jobs
+
+        if budget is not None:
+            set_jobs_not_reevaluated(not_reevaluated_jids, queues)
     else:
         logger.info("no waiting jobs")
 
+    metrics.emit(logger)
+
 
 #
 # Main function
@@ -1,17 +1,101 @@
 #!/usr/bin/env python
 # coding: utf-8
+"""
+Entry points of the Kao meta scheduler.
+
+Kao can either be launched by :mod:`oar.modules.almighty` as a command for
+each scheduling round, or run as a long-lived server (``oar-kao-server``)
+when ``METASCHEDULER_DAEMON="yes"``. In the latter case, Almighty triggers
+the scheduling rounds on a zmq REQ/REP socket, and the database connection,
+the configuration and the :class:`oar.kao.platform.Platform` are kept between
+rounds.
+
+Example of exchanged messages:
+
+.. code-block:: JSON
+
+    {"cmd": "SCHEDULE"}
+    {"exit_code": 0}
+"""
+import socket
+import sys
+
+import zmq
 
 from oar.kao.meta_sched import meta_schedule
-from oar.lib import config, get_logger
+from oar.kao.platform import Platform
+from oar.lib import config, db, get_logger
 
 logger = get_logger("oar.kao")
 
 
+class KaoServer(object):
+    """Server part of the meta scheduler, each request runs a scheduling round."""
+
+    def __init__(self, plt=None):
+        logger.info("Starting Kao Meta Scheduler server")
+
+        self.plt = plt if plt else Platform()
+        self.nb_rounds = 0
+
+        self.context = zmq.Context()
+        # IP addr is required when bind function is used on zmq socket
+        ip_addr_server = socket.gethostbyname(config["METASCHEDULER_SERVER"])
+        self.socket = self.context.socket(zmq.REP)
+        try:
+            self.socket.bind(
+                "tcp://" + ip_addr_server + ":" + str(config["METASCHEDULER_PORT"])
+            )
+        except Exception as e:
+            logger.error(f"Failed to bind Kao endpoint: {e}")
+            sys.exit(1)
+
+    def schedule(self):
+        """Run one scheduling round and return the exit code expected by Almighty."""
+        try:
+            exit_code = meta_schedule(config["METASCHEDULER_MODE"], self.plt)
+            # Ends the transaction, next round will see the new database state
+            db.commit()
+        except Exception as e:
+            logger.exception(f"Scheduling round failed: {e}")
+            db.rollback()
+            # As a crashed kao command, Almighty will ask for a new round
+            exit_code = 1
+
+        self.nb_rounds += 1
+        return exit_code
+
+    def run(self, loop=True):
+        while True:
+            command = self.socket.recv_json()
+            logger.debug("Kao server received: " + str(command))
+
+            if command["cmd"] == "SCHEDULE":
+                exit_code = self.schedule()
+                self.socket.send_json({"exit_code": exit_code})
+            elif command["cmd"] == "STOP":
+                self.socket.send_json({"exit_code": 0})
+                logger.info("Stopping Kao Meta Scheduler server")
+                return 0
+            else:
+                logger.error("Unknown command received: " + str(command["cmd"]))
+                self.socket.send_json({"exit_code": 1})
+
+            if not loop:
+                break
+        return 0
+
+
 def main():
     logger.info("Starting Kao Meta Scheduler")
     meta_schedule(config["METASCHEDULER_MODE"])
 
 
+def server():  # pragma: no cover
+    kao_server = KaoServer()
+    return kao_server.run()
+
+
 if __name__ == "__main__":  # pragma: no cover
     logger = get_logger("oar.kao", forward_stderr=True)
     main()
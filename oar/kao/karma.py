@@ -5,6 +5,7 @@ import re
 from sqlalchemy import func
 
 from oar.lib import Accounting, config, db, get_logger
+from oar.lib.accounting import get_karma_sums
 
 # Log category
 logger = get_logger("oar.kao.karma")
@@ -108,6 +109,23 @@ def get_sum_accounting_by_user(queues, window_start, window_stop):
     return (karma_asked, karma_used)
 
 
+def get_sum_accounting(queues, window_start, window_stop):
+    """
+    Return the results of :func:`get_sum_accounting_window`,
+    :func:`get_sum_accounting_by_project` and
+    :func:`get_sum_accounting_by_user`, from the karma sums kept up to date
+    incrementally when ``SCHEDULER_FAIRSHARING_INCREMENTAL`` is "yes".
+    """
+    if config["SCHEDULER_FAIRSHARING_INCREMENTAL"] == "yes":
+        return get_karma_sums(queues, window_start, window_stop)
+
+    return (
+        get_sum_accounting_window(queues, window_start, window_stop),
+        get_sum_accounting_by_project(queues, window_start, window_stop),
+        get_sum_accounting_by_user(queues, window_start, window_stop),
+    )
+
+
 #
 # Evaluate Karma value for each job
 #
@@ -138,15 +156,11 @@ def evaluate_jobs_karma(queues, now, jids, jobs, plt):
     window_start = now - karma_window_size
     window_stop = now
 
-    karma_sum_time_asked, karma_sum_time_used = plt.get_sum_accounting_window(
-        queues, window_start, window_stop
-    )
-    karma_projects_asked, karma_projects_used = plt.get_sum_accounting_by_project(
-        queues, window_start, window_stop
-    )
-    karma_users_asked, karma_users_used = plt.get_sum_accounting_by_user(
-        queues, window_start, window_stop
-    )
+    (
+        (karma_sum_time_asked, karma_sum_time_used),
+        (karma_projects_asked, karma_projects_used),
+        (karma_users_asked, karma_users_used),
+    ) = plt.get_sum_accounting(queues, window_start, window_stop)
     #
     # Compute actual karma for each job
     #
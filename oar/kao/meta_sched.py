@@ -12,28 +12,24 @@ from procset import ProcSet
 
 import oar.kao.extra_metasched
 import oar.lib.tools as tools
+from oar.kao.incremental_gantt import IncrementalGantt
 from oar.kao.kamelot import internal_schedule_cycle
+from oar.kao.metrics import metrics
 from oar.kao.platform import Platform
 
 # for quotas
 from oar.kao.quotas import Quotas
 from oar.kao.scheduling import (
     find_resource_hierarchies_job,
-    get_encompassing_slots,
+    init_slot_sets,
+    placement_budget,
     set_slots_with_prev_scheduled_jobs,
 )
-from oar.kao.slot import (
-    MAX_TIME,
-    SlotSet,
-    intersec_itvs_slots,
-    intersec_ts_ph_itvs_slots,
-)
+from oar.kao.slot import intersec_ts_ph_itvs_slots
 
 # for walltime change requests
 from oar.kao.walltime_change import process_walltime_change_requests
 from oar.lib import (
-    GanttJobsPredictionsVisu,
-    GanttJobsResourcesVisu,
     config,
     db,
     get_logger,
@@ -41,21 +37,23 @@ from oar.lib import (
 from oar.lib.event import add_new_event, get_job_events
 from oar.lib.job_handling import (
     ALLOW,
-    NO_PLACEHOLDER,
-    JobPseudo,
     add_resource_job_pairs,
     frag_job,
     gantt_flush_tables,
+    gantt_jobs_resources_sql,
     get_after_sched_no_AR_jobs,
     get_cpuset_values,
     get_current_not_waiting_jobs,
     get_gantt_jobs_to_launch,
     get_gantt_waiting_interactive_prediction_date,
+    get_gantt_waiting_jobs_predictions,
+    get_job_types,
     get_jobs_in_multiple_states,
     get_jobs_on_resuming_job_resources,
     get_waiting_moldable_of_reservations_already_scheduled,
     get_waiting_scheduled_AR_jobs,
     is_timesharing_for_two_jobs,
+    keep_gantt_predictions,
     remove_gantt_resource_job,
     resume_job_action,
     save_assigns,
@@ -64,6 +62,7 @@ from oar.lib.job_handling import (
     set_job_resa_state,
     set_job_start_time_assigned_moldable_id,
     set_job_state,
+    set_jobs_not_reevaluated,
     set_moldable_job_max_time,
 )
 from oar.lib.node import (
@@ -100,6 +99,9 @@ to_launch_jobs_already_treated = {}
 
 batsim_sched_proxy = None
 
+# gantt kept in memory between scheduling rounds (see SCHEDULER_INCREMENTAL_GANTT)
+incremental_gantt = None
+
 
 def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
     """
@@ -117,7 +119,6 @@ def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
     # Determine Global Resource Intervals and Initial Slot
     #
     resource_set = plt.resource_set()
-    initial_slot_set = SlotSet((resource_set.roid_itvs, initial_time_sec))
 
     logger.debug("Processing of processing of already handled reservations")
     moldable_ids = get_waiting_moldable_of_reservations_already_scheduled()
@@ -132,24 +133,6 @@ def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
     )
     plt.save_assigns(current_jobs, resource_set)  # TODO to verify
 
-    #
-    #  Resource availabilty (Available_upto field) is integrated through pseudo job
-    #
-    pseudo_jobs = []
-    for t_avail_upto in sorted(resource_set.available_upto.keys()):
-        itvs = resource_set.available_upto[t_avail_upto]
-        j = JobPseudo()
-        j.start_time = t_avail_upto
-        j.walltime = MAX_TIME - t_avail_upto
-        j.res_set = itvs
-        j.ts = False
-        j.ph = NO_PLACEHOLDER
-
-        pseudo_jobs.append(j)
-
-    if pseudo_jobs != []:
-        initial_slot_set.split_slots_jobs(pseudo_jobs)
-
     #
     # Get already scheduled jobs advanced reservations and jobs from more higher priority queues
     #
@@ -169,15 +152,16 @@ def gantt_init_with_running_jobs(plt, initial_time_sec, job_security_time):
                 besteffort_rid2job[r_id] = job
 
     # Create and fill gantt
-    all_slot_sets = {"default": initial_slot_set}
-    if scheduled_jobs != []:
-        filter_besteffort = True
-        set_slots_with_prev_scheduled_jobs(
-            all_slot_sets,
-            scheduled_jobs,
-            job_security_time,
-            initial_time_sec,
-            filter_besteffort,
+    if config["SCHEDULER_INCREMENTAL_GANTT"] == "yes":
+        global incremental_gantt
+        if not incremental_gantt:
+            incremental_gantt = IncrementalGantt()
+        all_slot_sets = incremental_gantt.slot_sets(
+            resource_set, scheduled_jobs, job_security_time, initial_time_sec
+        )
+    else:
+        all_slot_sets = init_slot_sets(
+            resource_set, scheduled_jobs, job_security_time, initial_time_sec
         )
 
     return (all_slot_sets, scheduled_jobs, besteffort_rid2job)
@@ -384,15 +368,16 @@ def check_reservation_jobs(
 
             # TODO: test if container is an AR job
 
-            slots = all_slot_sets[ss_name].slots
+            slots_set = all_slot_sets[ss_name]
+            slots = slots_set.slots
 
             t_e = job.start_time + walltime - job_security_time
-            sid_left, sid_right = get_encompassing_slots(slots, job.start_time, t_e)
+            sid_left, sid_right = slots_set.get_encompassing_slots(job.start_time, t_e)
 
             if job.ts or (job.ph == ALLOW):
                 itvs_avail = intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job)
             else:
-                itvs_avail = intersec_itvs_slots(slots, sid_left, sid_right)
+                itvs_avail = slots_set.intersec_itvs_slots(sid_left, sid_right)
 
             itvs = find_resource_hierarchies_job(
                 itvs_avail, hy_res_rqts, resource_set.hierarchy
@@ -587,14 +572,37 @@ def handle_jobs_to_launch(jobs_to_launch_lst, current_time_sec, current_time_sql
 def update_gantt_visualization():
     """
     Update the database with the new scheduling decisions for visualizations.
-    """
-    db.query(GanttJobsPredictionsVisu).delete()
-    db.query(GanttJobsResourcesVisu).delete()
-    db.commit()
 
+    Visu tables are updated from their differences with gantt tables, in one
+    transaction: only changed predictions and resources are written and
+    readers (drawgantt, API) never see partially filled tables.
+    """
+    gantt_resources = gantt_jobs_resources_sql()
     sql_queries = [
-        "INSERT INTO gantt_jobs_predictions_visu SELECT * FROM gantt_jobs_predictions",
-        "INSERT INTO gantt_jobs_resources_visu SELECT * FROM gantt_jobs_resources",
+        # predictions
+        "DELETE FROM gantt_jobs_predictions_visu WHERE NOT EXISTS "
+        "(SELECT 1 FROM gantt_jobs_predictions p "
+        "WHERE p.moldable_job_id = gantt_jobs_predictions_visu.moldable_job_id)",
+        "UPDATE gantt_jobs_predictions_visu SET start_time = "
+        "(SELECT p.start_time FROM gantt_jobs_predictions p "
+        "WHERE p.moldable_job_id = gantt_jobs_predictions_visu.moldable_job_id) "
+        "WHERE EXISTS (SELECT 1 FROM gantt_jobs_predictions p "
+        "WHERE p.moldable_job_id = gantt_jobs_predictions_visu.moldable_job_id "
+        "AND p.start_time <> gantt_jobs_predictions_visu.start_time)",
+        "INSERT INTO gantt_jobs_predictions_visu (moldable_job_id, start_time) "
+        "SELECT p.moldable_job_id, p.start_time FROM gantt_jobs_predictions p "
+        "WHERE NOT EXISTS (SELECT 1 FROM gantt_jobs_predictions_visu v "
+        "WHERE v.moldable_job_id = p.moldable_job_id)",
+        # resources
+        "DELETE FROM gantt_jobs_resources_visu WHERE NOT EXISTS "
+        "(SELECT 1 FROM " + gantt_resources + " r "
+        "WHERE r.moldable_job_id = gantt_jobs_resources_visu.moldable_job_id "
+        "AND r.resource_id = gantt_jobs_resources_visu.resource_id)",
+        "INSERT INTO gantt_jobs_resources_visu (moldable_job_id, resource_id) "
+        "SELECT r.moldable_job_id, r.resource_id FROM " + gantt_resources + " r "
+        "WHERE NOT EXISTS (SELECT 1 FROM gantt_jobs_resources_visu v "
+        "WHERE v.moldable_job_id = r.moldable_job_id "
+        "AND v.resource_id = r.resource_id)",
     ]
     for query in sql_queries:
         db.session.execute(query)
@@ -729,11 +737,14 @@ def call_batsim_sched_proxy(
 
 
 def call_internal_scheduler(
-    plt, scheduled_jobs, all_slot_sets, job_security_time, queues, now
+    plt, scheduled_jobs, all_slot_sets, job_security_time, queues, now, budget=None
 ):
     """
     Internal scheduling phase. The scheduler is not loaded from an external command,
     so it can shares states with the metascheduler and between scheduling phases (on each queues).
+
+    Return the ids of the waiting jobs not reached within the placement time
+    `budget` (see :func:`oar.kao.scheduling.schedule_id_jobs_ct`).
     """
 
     # Place running besteffort jobs if their queue is considered
@@ -742,8 +753,8 @@ def call_internal_scheduler(
             all_slot_sets, scheduled_jobs, job_security_time, now, False, True
         )
 
-    internal_schedule_cycle(
-        plt, now, all_slot_sets, job_security_time, [q.name for q in queues]
+    return internal_schedule_cycle(
+        plt, now, all_slot_sets, job_security_time, [q.name for q in queues], budget
     )
 
 
@@ -813,6 +824,11 @@ def meta_schedule(mode="internal", plt=Platform()):
     """
     exit_code = 0
 
+    # The metascheduler can be a long-lived process (see oar.kao.kao.KaoServer),
+    # job launching notifications are only deduplicated within a round.
+    to_launch_jobs_already_treated.clear()
+    metrics.reset()
+
     job_security_time = int(config["SCHEDULER_JOB_SECURITY_TIME"])
 
     # Kill duration before starting jobs
@@ -831,7 +847,8 @@ def meta_schedule(mode="internal", plt=Platform()):
     if ("WALLTIME_CHANGE_ENABLED" in config) and (
         config["WALLTIME_CHANGE_ENABLED"] == "yes"
     ):
-        process_walltime_change_requests(plt)
+        with metrics.phase("walltime_change"):
+            process_walltime_change_requests(plt)
 
     tools.create_almighty_socket()
 
@@ -848,10 +865,20 @@ def meta_schedule(mode="internal", plt=Platform()):
     current_time_sec = initial_time_sec
     current_time_sql = initial_time_sql
 
-    gantt_init_results = gantt_init_with_running_jobs(
-        plt, initial_time_sec, job_security_time
-    )
-    all_slot_sets, scheduled_jobs, besteffort_rid2jid = gantt_init_results
+    # Time given to the placement of waiting jobs (only with the internal
+    # scheduler), the jobs not reached keep their previous predictions
+    budget = placement_budget() if mode == "internal" else None
+    not_reevaluated_jids = []
+    if budget is not None:
+        previous_predictions = get_gantt_waiting_jobs_predictions()
+
+    with metrics.phase("gantt_init") as phase:
+        gantt_init_results = gantt_init_with_running_jobs(
+            plt, initial_time_sec, job_security_time
+        )
+        all_slot_sets, scheduled_jobs, besteffort_rid2jid = gantt_init_results
+        phase.jobs += len(scheduled_jobs)
+        phase.count_slots(all_slot_sets)
     resource_set = plt.resource_set()
 
     # Path for user of external schedulers
@@ -906,158 +933,184 @@ def meta_schedule(mode="internal", plt=Platform()):
 
         # Only internal scheduler support non-strict priorities between queues
         if mode == "internal":
-            call_internal_scheduler(
+            not_reevaluated_jids += call_internal_scheduler(
                 plt,
                 scheduled_jobs,
                 all_slot_sets,
                 job_security_time,
                 active_queues,
                 initial_time_sec,
+                budget,
             )
             for queue in active_queues:
-                handle_waiting_reservation_jobs(
-                    queue.name, resource_set, job_security_time, current_time_sec
-                )
-                # handle_new_AR_jobs
-                check_reservation_jobs(
-                    plt, resource_set, queue.name, all_slot_sets, current_time_sec
-                )
-        else:
-            for queue in active_queues:
-                if mode == "external":  # pragma: no cover
-                    call_external_scheduler(
-                        binpath,
-                        scheduled_jobs,
-                        all_slot_sets,
-                        resource_set,
-                        job_security_time,
-                        queue,
-                        initial_time_sec,
-                        initial_time_sql,
+                with metrics.phase("reservations", queue.name):
+                    handle_waiting_reservation_jobs(
+                        queue.name, resource_set, job_security_time, current_time_sec
                     )
-                elif mode == "batsim_sched_proxy":
-                    call_batsim_sched_proxy(
-                        plt,
-                        scheduled_jobs,
-                        all_slot_sets,
-                        job_security_time,
-                        queue,
-                        initial_time_sec,
+                    # handle_new_AR_jobs
+                    check_reservation_jobs(
+                        plt, resource_set, queue.name, all_slot_sets, current_time_sec
                     )
-                else:
-                    logger.error("Specified mode is unknown: " + mode)
+        else:
+            for queue in active_queues:
+                with metrics.phase("placement", queue.name):
+                    if mode == "external":  # pragma: no cover
+                        call_external_scheduler(
+                            binpath,
+                            scheduled_jobs,
+                            all_slot_sets,
+                            resource_set,
+                            job_security_time,
+                            queue,
+                            initial_time_sec,
+                            initial_time_sql,
+                        )
+                    elif mode == "batsim_sched_proxy":
+                        call_batsim_sched_proxy(
+                            plt,
+                            scheduled_jobs,
+                            all_slot_sets,
+                            job_security_time,
+                            queue,
+                            initial_time_sec,
+                        )
+                    else:
+                        logger.error("Specified mode is unknown: " + mode)
 
-                handle_waiting_reservation_jobs(
-                    queue.name, resource_set, job_security_time, current_time_sec
-                )
+                with metrics.phase("reservations", queue.name):
+                    handle_waiting_reservation_jobs(
+                        queue.name, resource_set, job_security_time, current_time_sec
+                    )
 
-    (
-        jobs_to_launch_with_security_time,
-        jobs_to_launch_with_security_time_lst,
-        rid2jid_to_launch,
-    ) = get_gantt_jobs_to_launch(
-        resource_set,
-        job_security_time,
-        current_time_sec,
-        kill_duration_before_reservation=kill_duration_before_reservation,
-    )
+    if budget is not None:
+        set_jobs_not_reevaluated(not_reevaluated_jids)
 
-    # Filter jobs that are not yet ready to be scheduled, but present because of the
-    # kill_duration_before_reservation=kill_duration_before_reservation parameter
-    jobs_to_launch_lst = filter(
-        lambda j: j.start_time <= current_time_sec,
-        jobs_to_launch_with_security_time_lst,
-    )
+    with metrics.phase("jobs_to_launch") as phase:
+        (
+            jobs_to_launch_with_security_time,
+            jobs_to_launch_with_security_time_lst,
+            rid2jid_to_launch,
+        ) = get_gantt_jobs_to_launch(
+            resource_set,
+            job_security_time,
+            current_time_sec,
+            kill_duration_before_reservation=kill_duration_before_reservation,
+        )
 
-    if (
-        check_besteffort_jobs_to_kill(
+        # Filter jobs that are not yet ready to be scheduled, but present because of the
+        # kill_duration_before_reservation=kill_duration_before_reservation parameter
+        jobs_to_launch_lst = [
+            j
+            for j in jobs_to_launch_with_security_time_lst
+            if j.start_time <= current_time_sec
+        ]
+        phase.jobs += len(jobs_to_launch_lst)
+
+    with metrics.phase("besteffort_kills") as phase:
+        besteffort_to_kill = check_besteffort_jobs_to_kill(
             jobs_to_launch_with_security_time,  # Jobs to launch or about to be launched
             rid2jid_to_launch,
             current_time_sec,
             besteffort_rid2jid,
             resource_set,
         )
-        == 1
-    ):
+        phase.jobs += len({job.id for job in besteffort_rid2jid.values()})
+
+    if besteffort_to_kill == 1:
         # We must kill some besteffort jobs
         tools.notify_almighty("ChState")
         exit_code = 2
-    elif (
-        handle_jobs_to_launch(jobs_to_launch_lst, current_time_sec, current_time_sql)
-        == 1
-    ):
-        exit_code = 0
-
-    # Update visu gantt tables
-    update_gantt_visualization()
+    else:
+        with metrics.phase("jobs_to_launch"):
+            if (
+                handle_jobs_to_launch(
+                    jobs_to_launch_lst, current_time_sec, current_time_sql
+                )
+                == 1
+            ):
+                exit_code = 0
 
     #
     # Manage dynamic node feature for energy saving:
     #
     if ("ENERGY_SAVING_MODE" in config) and config["ENERGY_SAVING_MODE"] != "":
-        if config["ENERGY_SAVING_MODE"] == "metascheduler_decision_making":
-            nodes_2_change = nodes_energy_saving(current_time_sec)
-        elif config["ENERGY_SAVING_MODE"] == "batsim_scheduler_proxy_decision_making":
-            nodes_2_change = batsim_sched_proxy.retrieve_pstate_changes_to_apply()
-        else:
-            logger.error(
-                "Error ENERGY_SAVING_MODE unknown: " + config["ENERGY_SAVING_MODE"]
-            )
+        with metrics.phase("energy_saving"):
+            if config["ENERGY_SAVING_MODE"] == "metascheduler_decision_making":
+                nodes_2_change = nodes_energy_saving(current_time_sec)
+            elif (
+                config["ENERGY_SAVING_MODE"] == "batsim_scheduler_proxy_decision_making"
+            ):
+                nodes_2_change = batsim_sched_proxy.retrieve_pstate_changes_to_apply()
+            else:
+                logger.error(
+                    "Error ENERGY_SAVING_MODE unknown: " + config["ENERGY_SAVING_MODE"]
+                )
 
-        hulot = HulotClient()
+            hulot = HulotClient()
 
-        flag_hulot = False
-        timeout_cmd = int(config["SCHEDULER_TIMEOUT"])
+            flag_hulot = False
+            timeout_cmd = int(config["SCHEDULER_TIMEOUT"])
 
-        # Command Hulot to halt selected nodes
-        nodes_2_halt = nodes_2_change["halt"]
-        if nodes_2_halt != []:
-            logger.debug(
-                "Powering off some nodes (energy saving): " + str(nodes_2_halt)
-            )
-            # Using the built-in energy saving module to shut down nodes
-            if config["ENERGY_SAVING_INTERNAL"] == "yes":
-                hulot.halt_nodes(nodes_2_halt)
-                # logger.error("Communication problem with the energy saving module (Hulot)\n")
-                flag_hulot = True
-            else:
-                # Not using the built-in energy saving module to shut down nodes
-                cmd = config["SCHEDULER_NODE_MANAGER_SLEEP_CMD"]
-                if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_halt):
-                    logger.error(
-                        "Command "
-                        + cmd
-                        + "timeouted ("
-                        + str(timeout_cmd)
-                        + "s) while trying to  poweroff some nodes"
-                    )
+            # Command Hulot to halt selected nodes
+            nodes_2_halt = nodes_2_change["halt"]
+            if nodes_2_halt != []:
+                logger.debug(
+                    "Powering off some nodes (energy saving): " + str(nodes_2_halt)
+                )
+                # Using the built-in energy saving module to shut down nodes
+                if config["ENERGY_SAVING_INTERNAL"] == "yes":
+                    hulot.halt_nodes(nodes_2_halt)
+                    # logger.error("Communication problem with the energy saving module (Hulot)\n")
+                    flag_hulot = True
+                else:
+                    # Not using the built-in energy saving module to shut down nodes
+                    cmd = config["SCHEDULER_NODE_MANAGER_SLEEP_CMD"]
+                    if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_halt):
+                        logger.error(
+                            "Command "
+                            + cmd
+                            + "timeouted ("
+                            + str(timeout_cmd)
+                            + "s) while trying to  poweroff some nodes"
+                        )
 
-        # Command Hulot to wake up selected nodes
-        nodes_2_wakeup = nodes_2_change["wakeup"]
+            # Command Hulot to wake up selected nodes
+            nodes_2_wakeup = nodes_2_change["wakeup"]
 
-        if nodes_2_wakeup != []:
-            logger.debug("Awaking some nodes: " + str(nodes_2_change))
-            # Using the built-in energy saving module to wake up nodes
-            if config["ENERGY_SAVING_INTERNAL"] == "yes":
-                hulot.wake_up_nodes(nodes_2_wakeup)
-                # logger.error("Communication problem with the energy saving module (Hulot)")
-                flag_hulot = True
-            else:
-                # Not using the built-in energy saving module to wake up nodes
-                cmd = config["SCHEDULER_NODE_MANAGER_WAKE_UP_CMD"]
-                if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_wakeup):
-                    logger.error(
-                        "Command "
-                        + cmd
-                        + "timeouted ("
-                        + str(timeout_cmd)
-                        + "s) while trying to wake-up some nodes "
-                    )
+            if nodes_2_wakeup != []:
+                logger.debug("Awaking some nodes: " + str(nodes_2_change))
+                # Using the built-in energy saving module to wake up nodes
+                if config["ENERGY_SAVING_INTERNAL"] == "yes":
+                    hulot.wake_up_nodes(nodes_2_wakeup)
+                    # logger.error("Communication problem with the energy saving module (Hulot)")
+                    flag_hulot = True
+                else:
+                    # Not using the built-in energy saving module to wake up nodes
+                    cmd = config["SCHEDULER_NODE_MANAGER_WAKE_UP_CMD"]
+                    if tools.fork_and_feed_stdin(cmd, timeout_cmd, nodes_2_wakeup):
+                        logger.error(
+                            "Command "
+                            + cmd
+                            + "timeouted ("
+                            + str(timeout_cmd)
+                            + "s) while trying to wake-up some nodes "
+                        )
 
-        # Send CHECK signal to Hulot if needed
-        if not flag_hulot and (config["ENERGY_SAVING_INTERNAL"] == "yes"):
-            hulot.check_nodes()
-            #    logger.error("Communication problem with the energy saving module (Hulot)")
+            # Send CHECK signal to Hulot if needed
+            if not flag_hulot and (config["ENERGY_SAVING_INTERNAL"] == "yes"):
+                hulot.check_nodes()
+                #    logger.error("Communication problem with the energy saving module (Hulot)")
+
+    if budget is not None:
+        # after the launching and energy saving decisions, only for information:
+        # they were not checked against the jobs placed in this round
+        keep_gantt_predictions(
+            previous_predictions, not_reevaluated_jids, initial_time_sec
+        )
+
+    # Update visu gantt tables
+    with metrics.phase("visu_refresh"):
+        update_gantt_visualization()
 
     # Retrieve jobs according to their state and excluding job in 'Waiting' state.
     jobs_by_state = get_current_not_waiting_jobs()
@@ -1077,7 +1130,7 @@ def meta_schedule(mode="internal", plt=Platform()):
             if other_jobs == []:
                 # We can resume the job
                 logger.debug("[" + str(job.id) + "] Resuming job")
-                if "noop" in job.types:
+                if "noop" in get_job_types(job.id):
                     resume_job_action(job.id)
                     logger.debug("[" + str(job.id) + "] Resume NOOP job OK")
                 else:
@@ -1244,5 +1297,6 @@ def meta_schedule(mode="internal", plt=Platform()):
             notify_to_run_job(job.id)
 
     logger.debug("End of Meta Scheduler")
+    metrics.emit(logger)
 
     return exit_code
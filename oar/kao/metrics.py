@@ -0,0 +1,122 @@
+# coding: utf-8
+"""
+Instrumentation of the phases of a scheduling cycle.
+
+Each phase (gantt initialisation, retrieval of waiting jobs, sorting,
+placement, saving...) is timed with :meth:`CycleMetrics.phase`, per queue when
+it is run per queue, along with the number of jobs it processed and the number
+of slots of the gantt when it ends. At the end of the cycle,
+:meth:`CycleMetrics.emit` logs them as one JSON line and writes them in the
+Prometheus text format to ``SCHEDULER_METRICS_FILE`` if set (e.g. in the
+directory of node_exporter's textfile collector).
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from oar.lib import config
+
+PROMETHEUS_METRICS = (
+    ("seconds", "Wall time of the phase in the last scheduling cycle."),
+    ("jobs", "Number of jobs processed by the phase in the last scheduling cycle."),
+    ("slots", "Number of gantt slots at the end of the phase in the last cycle."),
+)
+
+
+class PhaseMetrics(object):
+    def __init__(self):
+        self.seconds = 0.0
+        self.jobs = 0
+        self.slots = 0
+
+    def count_slots(self, all_slot_sets):
+        """Set `slots` to the total number of slots of `all_slot_sets`."""
+        self.slots = sum(len(ss.slots) for ss in all_slot_sets.values())
+
+
+class CycleMetrics(object):
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Start a new cycle."""
+        self.start = time.time()
+        self.phases = OrderedDict()
+
+    @contextmanager
+    def phase(self, name, queue=""):
+        """
+        Time the block as phase `name` of `queue`, the yielded
+        :class:`PhaseMetrics` can be filled with jobs and slots. Phases run
+        several times in a cycle are accumulated.
+        """
+        if (name, queue) not in self.phases:
+            self.phases[(name, queue)] = PhaseMetrics()
+        metrics = self.phases[(name, queue)]
+        start = time.time()
+        try:
+            yield metrics
+        finally:
+            metrics.seconds += time.time() - start
+
+    def to_dict(self):
+        return {
+            "start": int(self.start),
+            "seconds": round(time.time() - self.start, 6),
+            "phases": [
+                {
+                    "phase": name,
+                    "queue": queue,
+                    "seconds": round(metrics.seconds, 6),
+                    "jobs": metrics.jobs,
+                    "slots": metrics.slots,
+                }
+                for (name, queue), metrics in self.phases.items()
+            ],
+        }
+
+    def to_prometheus(self, cycle=None):
+        if cycle is None:
+            cycle = self.to_dict()
+        lines = [
+            "# HELP oar_scheduler_cycle_seconds Wall time of the last scheduling cycle.",
+            "# TYPE oar_scheduler_cycle_seconds gauge",
+            "oar_scheduler_cycle_seconds %s" % cycle["seconds"],
+            "# HELP oar_scheduler_cycle_start_time_seconds Start time of the last scheduling cycle.",
+            "# TYPE oar_scheduler_cycle_start_time_seconds gauge",
+            "oar_scheduler_cycle_start_time_seconds %s" % cycle["start"],
+        ]
+        for key, help in PROMETHEUS_METRICS:
+            name = "oar_scheduler_phase_%s" % key
+            lines.append("# HELP %s %s" % (name, help))
+            lines.append("# TYPE %s gauge" % name)
+            for phase in cycle["phases"]:
+                lines.append(
+                    '%s{phase="%s",queue="%s"} %s'
+                    % (name, phase["phase"], phase["queue"], phase[key])
+                )
+        return "\n".join(lines) + "\n"
+
+    def emit(self, logger):
+        """Log the metrics of the cycle and write them to the metrics file."""
+        cycle = self.to_dict()
+        logger.info("scheduling cycle metrics: " + json.dumps(cycle))
+
+        filename = config["SCHEDULER_METRICS_FILE"]
+        if filename:
+            # Written aside then renamed, readers never see a partial file
+            tmp_filename = filename + ".tmp"
+            try:
+                with open(tmp_filename, "w") as metrics_file:
+                    metrics_file.write(self.to_prometheus(cycle))
+                os.replace(tmp_filename, filename)
+            except OSError as e:
+                logger.warning(
+                    "cannot write scheduler metrics to " + filename + ": " + str(e)
+                )
+
+
+# Metrics of the current scheduling cycle of the process
+metrics = CycleMetrics()
@@ -1,3 +1,5 @@
+import os
+
 import yaml
 
 from oar.kao.karma import evaluate_jobs_karma
@@ -7,6 +9,56 @@ from oar.lib import config, get_logger
 
 logger = get_logger("oar.kao.priorty")
 
+PRIORITY_DEFAULTS = {
+    "age_weight": 0,
+    "age_coef": 1.65e-06,  # 7 days in seconds
+    "queue_weight": 0,
+    "queue_coefs": {},
+    "work_weight": 0,
+    "work_mode": 0,  # prioritize small jobs
+    "size_weight": 0,
+    "size_mode": 0,  # prioritize small jobs
+    "karma_weight": 0,
+    "qos_weight": 0,
+    "nice_weight": 0,
+}
+
+
+class PriorityConf(object):
+    """
+    Parsed ``PRIORITY_CONF_FILE``, kept until the file is changed (its
+    modification time or size).
+    """
+
+    key = None
+    values = None
+
+    @classmethod
+    def get(cls):
+        filename = config["PRIORITY_CONF_FILE"]
+        stat = os.stat(filename)
+        key = (filename, stat.st_mtime_ns, stat.st_size)
+        if key != cls.key:
+            values = dict(PRIORITY_DEFAULTS)
+            with open(filename, "r") as stream:
+                try:
+                    values.update(yaml.safe_load(stream) or {})
+                except yaml.YAMLError as exc:
+                    logger.error(exc)
+            cls.key = key
+            cls.values = values
+        return cls.values
+
+    @classmethod
+    def clear(cls):
+        cls.key = None
+        cls.values = None
+
+
+def add_factor(priorities, weight, factors):
+    """Add `weight` times the factor of each job to its priority."""
+    return [priority + weight * factor for priority, factor in zip(priorities, factors)]
+
 
 def evaluate_jobs_priority(queues, now, jids, jobs, plt):
     """
@@ -27,88 +79,75 @@ def evaluate_jobs_priority(queues, now, jids, jobs, plt):
 
     Each criterion is positive integer
 
+    Factors are computed by criterion for all the jobs, from the columns of
+    the criterion values.
+
     Note: The priority approach is largely inspired by Slurm's one
     """
-
-    age_weight = 0
-    age_coef = 1.65e-06  # 7 days in seconds
-    queue_weight = 0
-    work_weight = 0
-    work_mode = 0  # prioritize small jobs
-    size_weight = 0
-    size_mode = 0  # prioritize small jobs
-    karma_weight = 0
-    qos_weight = 0
-    nice_weight = 0
-
-    queue_coefs = {}
-
-    with open(config["PRIORITY_CONF_FILE"], "r") as stream:
-        try:
-            yaml_priority = yaml.safe_load(stream)
-        except yaml.YAMLError as exc:
-            logger.error(exc)
-
-    if ("age_weight") in yaml_priority:
-        age_weight = yaml_priority["age_weight"]
-    if ("age_coef") in yaml_priority:
-        age_coef = yaml_priority["age_coef"]
-    if ("queue_weight") in yaml_priority:
-        queue_weight = yaml_priority["queue_weight"]
-    if ("queue_coefs") in yaml_priority:
-        queue_coefs = yaml_priority["queue_coefs"]
-    if ("work_weight") in yaml_priority:
-        work_weight = yaml_priority["work_weight"]
-    if ("work_mode") in yaml_priority:
-        work_mode = yaml_priority["work_mode"]
-    if ("size_weight") in yaml_priority:
-        size_weight = yaml_priority["size_weight"]
-    if ("size_mode") in yaml_priority:
-        size_mode = yaml_priority["size_mode"]
-    if ("karma_weight") in yaml_priority:
-        karma_weight = yaml_priority["karma_weight"]
-    if ("qos_weight") in yaml_priority:
-        qos_weight = yaml_priority["qos_weight"]
-    if ("nice_weight") in yaml_priority:
-        nice_weight = yaml_priority["nice_weight"]
+    conf = PriorityConf.get()
+    age_coef = conf["age_coef"]
+    queue_weight = conf["queue_weight"]
+    queue_coefs = conf["queue_coefs"]
+    work_weight = conf["work_weight"]
+    size_weight = conf["size_weight"]
+    qos_weight = conf["qos_weight"]
+    nice_weight = conf["nice_weight"]
 
     # evalute and retrieve jobs' karma for fair-share
     evaluate_jobs_karma(queues, now, jids, jobs, plt)
 
-    for job in jobs.values():
-        job.priority = age_weight * max(1.0, age_coef * (now - job.submission_time))
-        if queue_weight > 0.0:
-            if job.queue_name in queue_coefs:
-                job.priority += queue_weight * queue_coefs[job.queue_name]
-            else:
-                logger.warning(
-                    "queue {} is define in queue_coefs but the queue_weight is.".format(
-                        job.queue_name
-                    )
-                )
-        if work_weight > 0.0:
-            if work_mode:
-                # prioritize big jobs over small ones (work = nb_resources * walltime)
-                job.priority += work_weight * (1.0 - 1.0 / min(1.0, job.work))
-            else:
-                # prioritize small jobs over big ones  (work = nb_resources * walltime)
-                job.priority += work_weight * 1.0 / min(1.0, job.work)
-        if size_weight > 0.0:
-            if size_mode:
-                # prioritize big jobs over small ones
-                job.priority += size_weight * (job.size / plt.nb_default_resources)
-            else:
-                # prioritize small jobs over big ones
-                job.priority += size_weight * (
-                    1.0 - (job.size / plt.nb_default_resources)
+    jobs_lst = list(jobs.values())
+
+    priorities = [
+        conf["age_weight"] * max(1.0, age_coef * (now - submission_time))
+        for submission_time in [job.submission_time for job in jobs_lst]
+    ]
+    if queue_weight > 0.0:
+        queue_names = [job.queue_name for job in jobs_lst]
+        for queue_name in set(queue_names) - set(queue_coefs):
+            logger.warning(
+                "queue {} is define in queue_coefs but the queue_weight is.".format(
+                    queue_name
                 )
-
-        print("job id {} Karma {}".format(job.id, job.karma))
-        job.priority += karma_weight * (1.0 / (1.0 + job.karma))
-        if qos_weight > 0.0:
-            job.priority += qos_weight * job.qos
-        if nice_weight > 0.0:
-            job.priority += nice_weight * max(1.0, job.nice)
+            )
+        priorities = add_factor(
+            priorities,
+            queue_weight,
+            [queue_coefs.get(queue_name, 0.0) for queue_name in queue_names],
+        )
+    if work_weight > 0.0:
+        works = [min(1.0, job.work) for job in jobs_lst]
+        if conf["work_mode"]:
+            # prioritize big jobs over small ones (work = nb_resources * walltime)
+            factors = [1.0 - 1.0 / work for work in works]
+        else:
+            # prioritize small jobs over big ones  (work = nb_resources * walltime)
+            factors = [1.0 / work for work in works]
+        priorities = add_factor(priorities, work_weight, factors)
+    if size_weight > 0.0:
+        sizes = [job.size / plt.nb_default_resources for job in jobs_lst]
+        if conf["size_mode"]:
+            # prioritize big jobs over small ones
+            factors = sizes
+        else:
+            # prioritize small jobs over big ones
+            factors = [1.0 - size for size in sizes]
+        priorities = add_factor(priorities, size_weight, factors)
+
+    priorities = add_factor(
+        priorities,
+        conf["karma_weight"],
+        [1.0 / (1.0 + karma) for karma in [job.karma for job in jobs_lst]],
+    )
+    if qos_weight > 0.0:
+        priorities = add_factor(priorities, qos_weight, [job.qos for job in jobs_lst])
+    if nice_weight > 0.0:
+        priorities = add_factor(
+            priorities, nice_weight, [max(1.0, job.nice) for job in jobs_lst]
+        )
+
+    for job, priority in zip(jobs_lst, priorities):
+        job.priority = priority
 
 
 def multifactor_jobs_sorting(queues, now, jids, jobs, plt):
@@ -4,6 +4,7 @@ import time
 from procset import ProcSet
 
 from oar.kao.karma import (
+    get_sum_accounting,
     get_sum_accounting_by_project,
     get_sum_accounting_by_user,
     get_sum_accounting_window,
@@ -14,7 +15,7 @@ from oar.lib.job_handling import (
     get_waiting_jobs,
     save_assigns,
 )
-from oar.lib.resource import ResourceSet
+from oar.lib.resource import get_resource_set
 
 
 class Platform(object):
@@ -29,7 +30,7 @@ class Platform(object):
         pass
 
     def resource_set(self):
-        return ResourceSet()
+        return get_resource_set()
 
     def get_time(self):
         return int(time.time())
@@ -55,6 +56,9 @@ class Platform(object):
     def get_sum_accounting_by_user(self, *args):
         return get_sum_accounting_by_user(*args)
 
+    def get_sum_accounting(self, *args):
+        return get_sum_accounting(*args)
+
     #
     # SimSim and BatSim mode simu
     #
@@ -146,6 +150,9 @@ class SimuPlatform(Platform):
     def get_sum_accounting_by_user(self, *args):
         print("get_sum_accounting_by_user NOT IMPLEMENTED")
 
+    def get_sum_accounting(self, *args):
+        print("get_sum_accounting NOT IMPLEMENTED")
+
     def get_waiting_jobs(self, queue):
 
         print(" get_waiting_jobs_simu:", self.waiting_jids)
@@ -1,7 +1,6 @@
 # coding: utf-8
-from collections import defaultdict
-from copy import deepcopy
 from datetime import datetime, timedelta
+from operator import add
 
 import simplejson as json
 
@@ -404,6 +403,93 @@ class Calendar(object):
             print("remaining_duration {}".format(remaining_duration))
 
 
+class QuotasRule(object):
+    """A quotas rule of a :class:`QuotasRulesIndex`."""
+
+    def __init__(self, fields, quotas):
+        self.fields = fields
+        self.quotas = quotas
+        # fields where any value ('/') matches, it cannot be used for job type
+        self.any_fields = [i for i in (0, 1, 3) if fields[i] == "/"]
+        self.positions = []
+        self.nb_keys_matched = 0
+
+    def counters_positions(self):
+        """
+        Return the positions of the counters checked by the rule.
+
+        A rule without '/' only checks the counter with the same key. With
+        '/', counters must have the rule's value for the other fields, the
+        matching counters are searched among the ones registered since last
+        call.
+        """
+        if not self.any_fields:
+            position = Quotas.counters_index.get(self.fields)
+            return () if position is None else (position,)
+
+        keys = Quotas.counters_keys
+        fields = self.fields
+        any_fields = self.any_fields
+        for n in range(self.nb_keys_matched, len(keys)):
+            key = keys[n]
+            if all((i in any_fields) or (fields[i] == key[i]) for i in range(4)):
+                self.positions.append(3 * n)
+        self.nb_keys_matched = len(keys)
+        return self.positions
+
+
+class QuotasRulesIndex(object):
+    """
+    Quotas rules compiled for :meth:`Quotas.check`.
+
+    A rule applies to a job if its queue, project and user are '*', '/' or
+    the job's ones and if its job type is '*' or one of the job's types.
+    The rules applying to each (queue, project, job types, user) are
+    computed once and kept in the index, only them are checked for a job.
+    """
+
+    # id(rules) -> (rules, index), emptied when quotas rules are reloaded
+    indexes = {}
+
+    def __init__(self, rules):
+        self.rules = [QuotasRule(fields, quotas) for fields, quotas in rules.items()]
+        self.rules_types = set(rule.fields[2] for rule in self.rules)
+        self.job_rules_cache = {}
+
+    @classmethod
+    def get(cls, rules):
+        """Return the index of `rules` (a dict as default_rules), compiled once."""
+        entry = cls.indexes.get(id(rules))
+        if (entry is None) or (entry[0] is not rules):
+            # keep rules, so its id cannot be reused
+            entry = (rules, QuotasRulesIndex(rules))
+            cls.indexes[id(rules)] = entry
+        return entry[1]
+
+    @classmethod
+    def reset(cls):
+        """Drop the compiled indexes, rules they refer to are not used anymore."""
+        cls.indexes = {}
+
+    def job_rules(self, job):
+        """Return the rules applying to `job`, in rules' order."""
+        types = tuple(sorted(t for t in self.rules_types if t in job.types))
+        profile = (job.queue_name, job.project, types, job.user)
+        job_rules = self.job_rules_cache.get(profile)
+        if job_rules is None:
+            queue, project, _, user = profile
+            job_rules = [
+                rule
+                for rule in self.rules
+                if (rule.fields[0] in ("*", "/", queue))
+                and (rule.fields[1] in ("*", "/", project))
+                and ((rule.fields[2] == "*") or (rule.fields[2] in types))
+                and (rule.fields[3] in ("*", "/", user))
+            ]
+            self.job_rules_cache[profile] = job_rules
+        return job_rules
+
+
 class Quotas(object):
     """
 
@@ -513,6 +599,15 @@ class Quotas(object):
     default_rules = {}
     job_types = ["*"]
 
+    # Counters of all Quotas instances are flat lists sharing the same layout:
+    # the counters of key (queue, project, job_type, user) are at position
+    # counters_index[key] (nb_resources), +1 (nb_jobs) and +2 (resources_time)
+    counters_index = {}
+    counters_keys = []
+    # (queue, project, user, job_types) -> positions of the counters to update
+    # The layout depends on the rules, it is reset by load_quotas_rules.
+    job_positions = {}
+
     @classmethod
     def enable(cls, resource_set=None):
         cls.enabled = True
@@ -530,23 +625,63 @@ class Quotas(object):
         cls.load_quotas_rules(all_value)
 
     def __init__(self):
-        self.counters = defaultdict(lambda: [0, 0, 0])
+        # flat list of counters, see counters_index
+        self.counters = []
         self.rules = Quotas.default_rules
 
     def deepcopy_from(self, quotas):
-        self.counters = deepcopy(quotas.counters)
+        self.counters = quotas.counters[:]
+
+    @classmethod
+    def counter_position(cls, key):
+        """Return the position in counters of the first of the 3 values of `key`."""
+        position = cls.counters_index.get(key)
+        if position is None:
+            position = 3 * len(cls.counters_keys)
+            cls.counters_index[key] = position
+            cls.counters_keys.append(key)
+        return position
+
+    @classmethod
+    def job_counters_positions(cls, job):
+        """Return the positions of the counters to update for `job`."""
+        types = tuple(t for t in cls.job_types if (t == "*") or (t in job.types))
+        profile = (job.queue_name, job.project, job.user, types)
+        positions = cls.job_positions.get(profile)
+        if positions is None:
+            queue, project, user, _ = profile
+            positions = [
+                cls.counter_position(key)
+                for t in types
+                for key in (
+                    ("*", "*", t, "*"),
+                    ("*", "*", t, user),
+                    ("*", project, t, "*"),
+                    (queue, "*", t, "*"),
+                    (queue, project, t, user),
+                    (queue, project, t, "*"),
+                    (queue, "*", t, user),
+                    ("*", project, t, user),
+                )
+            ]
+            cls.job_positions[profile] = positions
+        return positions
+
+    def counters_items(self):
+        """Return the (key, [nb_resources, nb_jobs, resources_time]) of counters."""
+        counters = self.counters
+        return [
+            (key, counters[i : i + 3])
+            for i, key in zip(range(0, len(counters), 3), Quotas.counters_keys)
+        ]
 
     def show_counters(self, msg=""):  # pragma: no cover
         print("show_counters:", msg)
-        for k, v in self.counters.items():
+        for k, v in self.counters_items():
             print(k, " = ", v)
 
     def update(self, job, prev_nb_res=0, prev_duration=0):
 
-        queue = job.queue_name
-        project = job.project
-        user = job.user
-
         # TOREMOVE ?
         if hasattr(job, "res_set"):
             if not hasattr(self, "nb_res"):
@@ -560,104 +695,63 @@ class Quotas(object):
         else:
             duration = prev_duration
 
-        for t in Quotas.job_types:
-            if (t == "*") or (t in job.types):
-                # Update the number of used resources
-                self.counters["*", "*", t, "*"][0] += nb_resources
-                self.counters["*", "*", t, user][0] += nb_resources
-                self.counters["*", project, t, "*"][0] += nb_resources
-                self.counters[queue, "*", t, "*"][0] += nb_resources
-                self.counters[queue, project, t, user][0] += nb_resources
-                self.counters[queue, project, t, "*"][0] += nb_resources
-                self.counters[queue, "*", t, user][0] += nb_resources
-                self.counters["*", project, t, user][0] += nb_resources
-                # Update the number of running jobs
-                self.counters["*", "*", t, "*"][1] += 1
-                self.counters["*", "*", t, user][1] += 1
-                self.counters["*", project, t, "*"][1] += 1
-                self.counters[queue, "*", t, "*"][1] += 1
-                self.counters[queue, project, t, user][1] += 1
-                self.counters[queue, project, t, "*"][1] += 1
-                self.counters[queue, "*", t, user][1] += 1
-                self.counters["*", project, t, user][1] += 1
-                # Update the resource * second
-                self.counters["*", "*", t, "*"][2] += nb_resources * duration
-                self.counters["*", "*", t, user][2] += nb_resources * duration
-                self.counters["*", project, t, "*"][2] += nb_resources * duration
-                self.counters[queue, "*", t, "*"][2] += nb_resources * duration
-                self.counters[queue, project, t, user][2] += nb_resources * duration
-                self.counters[queue, project, t, "*"][2] += nb_resources * duration
-                self.counters[queue, "*", t, user][2] += nb_resources * duration
-                self.counters["*", project, t, user][2] += nb_resources * duration
+        positions = Quotas.job_counters_positions(job)
+        counters = self.counters
+        if positions:
+            nb_missing = max(positions) + 3 - len(counters)
+            if nb_missing > 0:
+                counters.extend([0] * nb_missing)
+        for i in positions:
+            # Update the number of used resources
+            counters[i] += nb_resources
+            # Update the number of running jobs
+            counters[i + 1] += 1
+            # Update the resource * second
+            counters[i + 2] += nb_resources * duration
 
     def combine(self, quotas):
-        # self.show_counters('combine before')
-        for key, value in quotas.counters.items():
-            self.counters[key][0] = max(self.counters[key][0], value[0])
-            self.counters[key][1] = max(self.counters[key][1], value[1])
-            self.counters[key][2] += value[2]
-        # self.show_counters('combine after')
+        counters = self.counters
+        others = quotas.counters
+        n = len(others)
+        if len(counters) < n:
+            counters.extend([0] * (n - len(counters)))
+        counters[0:n:3] = map(max, counters[0:n:3], others[0::3])
+        counters[1:n:3] = map(max, counters[1:n:3], others[1::3])
+        counters[2:n:3] = map(add, counters[2:n:3], others[2::3])
 
     def check(self, job):
-        # self.show_counters('before check, job id: ' + str(job.id))
-        for rl_fields, rl_quotas in self.rules.items():
-            # pdb.set_trace()
-            rl_queue, rl_project, rl_job_type, rl_user = rl_fields
-            rl_nb_resources, rl_nb_jobs, rl_resources_time = rl_quotas
-            for fields, counters in self.counters.items():
-                queue, project, job_type, user = fields
-                nb_resources, nb_jobs, resources_time = counters
-                # match queue
-                if (
-                    ((rl_queue == "*") and (queue == "*"))
-                    or ((rl_queue == queue) and (job.queue_name == queue))
-                    or (rl_queue == "/")
-                ):
-                    # match project
-                    if (
-                        ((rl_project == "*") and (project == "*"))
-                        or ((rl_project == project) and (job.project == project))
-                        or (rl_project == "/")
-                    ):
-                        # match job_typ
-                        if ((rl_job_type == "*") and (job_type == "*")) or (
-                            (rl_job_type == job_type) and (job_type in job.types)
-                        ):
-                            # match user
-                            if (
-                                ((rl_user == "*") and (user == "*"))
-                                or ((rl_user == user) and (job.user == user))
-                                or (rl_user == "/")
-                            ):
-                                # test quotas values plus job's ones
-                                # 1) test nb_resources
-                                if (rl_nb_resources > -1) and (
-                                    rl_nb_resources < nb_resources
-                                ):
-                                    return (
-                                        False,
-                                        "nb resources quotas failed",
-                                        rl_fields,
-                                        rl_nb_resources,
-                                    )
-                                # 2) test nb_jobs
-                                if (rl_nb_jobs > -1) and (rl_nb_jobs < nb_jobs):
-                                    return (
-                                        False,
-                                        "nb jobs quotas failed",
-                                        rl_fields,
-                                        rl_nb_jobs,
-                                    )
-                                # 3) test resources_time (work)
-                                if (rl_resources_time > -1) and (
-                                    rl_resources_time < resources_time
-                                ):
-                                    return (
-                                        False,
-                                        "resources hours quotas failed",
-                                        rl_fields,
-                                        rl_resources_time,
-                                    )
+        counters = self.counters
+        nb_counters = len(counters)
+        for rule in QuotasRulesIndex.get(self.rules).job_rules(job):
+            rl_nb_resources, rl_nb_jobs, rl_resources_time = rule.quotas
+            for i in rule.counters_positions():
+                if i >= nb_counters:
+                    continue
+                # test quotas values plus job's ones
+                # 1) test nb_resources
+                if (rl_nb_resources > -1) and (rl_nb_resources < counters[i]):
+                    return (
+                        False,
+                        "nb resources quotas failed",
+                        rule.fields,
+                        rl_nb_resources,
+                    )
+                # 2) test nb_jobs
+                if (rl_nb_jobs > -1) and (rl_nb_jobs < counters[i + 1]):
+                    return (
+                        False,
+                        "nb jobs quotas failed",
+                        rule.fields,
+                        rl_nb_jobs,
+                    )
+                # 3) test resources_time (work)
+                if (rl_resources_time > -1) and (rl_resources_time < counters[i + 2]):
+                    return (
+                        False,
+                        "resources hours quotas failed",
+                        rule.fields,
+                        rl_resources_time,
+                    )
         return (True, "quotas ok", "", 0)
 
     @staticmethod
@@ -766,6 +860,14 @@ class Quotas(object):
         }
 
         """
+        # rules may change between two scheduling rounds of a long-lived
+        # scheduler, forget what was computed for the previous ones
+        QuotasRulesIndex.reset()
+        cls.counters_index = {}
+        cls.counters_keys = []
+        cls.job_positions = {}
+        cls.job_types = ["*"]
+
         quotas_rules_filename = config["QUOTAS_CONF_FILE"]
         with open(quotas_rules_filename) as json_file:
             json_quotas = json.load(json_file)
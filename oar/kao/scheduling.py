@@ -1,13 +1,21 @@
 # coding: utf-8
 import copy
+import time
 
 from procset import ProcSet
 
 from oar.kao.quotas import Quotas
-from oar.kao.slot import Slot, SlotSet, intersec_itvs_slots, intersec_ts_ph_itvs_slots
+from oar.kao.slot import (
+    MAX_TIME,
+    IntersectionWindow,
+    Slot,
+    SlotSet,
+    new_slot_set,
+    ts_ph_itvs_slot,
+)
 from oar.lib import config, get_logger
 from oar.lib.hierarchy import find_resource_hierarchies_scattered
-from oar.lib.job_handling import ALLOW, JobPseudo
+from oar.lib.job_handling import ALLOW, NO_PLACEHOLDER, JobPseudo
 
 # for quotas
 from oar.lib.resource import ResourceSet
@@ -77,6 +85,56 @@ def set_slots_with_prev_scheduled_jobs(
             slot_set.split_slots_jobs(jobs_slotsets[ss_name])
 
 
+def init_slot_sets(resource_set, scheduled_jobs, job_security_time, now):
+    """
+    Build the slot sets from the available resources and the previously
+    scheduled jobs (besteffort jobs are not taken into account).
+
+    :param ResourceSet resource_set: \
+        Resources available for scheduling.
+    :param list scheduled_jobs: \
+        Jobs already scheduled (sorted by start_time).
+    :param int job_security_time: \
+        Job security time.
+    :param int now: \
+        Time from which to schedule.
+    :return: \
+        The dict of :class:`SlotSet` indexed by name.
+    """
+    initial_slot_set = new_slot_set((resource_set.roid_itvs, now))
+
+    #
+    #  Resource availabilty (Available_upto field) is integrated through pseudo job
+    #
+    pseudo_jobs = []
+    for t_avail_upto in sorted(resource_set.available_upto.keys()):
+        itvs = resource_set.available_upto[t_avail_upto]
+        j = JobPseudo()
+        j.start_time = t_avail_upto
+        j.walltime = MAX_TIME - t_avail_upto
+        j.res_set = itvs
+        j.ts = False
+        j.ph = NO_PLACEHOLDER
+
+        pseudo_jobs.append(j)
+
+    if pseudo_jobs != []:
+        initial_slot_set.split_slots_jobs(pseudo_jobs)
+
+    all_slot_sets = {"default": initial_slot_set}
+    if scheduled_jobs != []:
+        filter_besteffort = True
+        set_slots_with_prev_scheduled_jobs(
+            all_slot_sets,
+            scheduled_jobs,
+            job_security_time,
+            now,
+            filter_besteffort,
+        )
+
+    return all_slot_sets
+
+
 def find_resource_hierarchies_job(itvs_slots, hy_res_rqts, hy):
     """find resources in interval for all resource subrequests of a moldable
     instance of a job"""
@@ -117,6 +175,28 @@ def get_encompassing_slots(slots, t_begin, t_end):
 
 def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_time):
     """find first_suitable_contiguous_slot"""
+    itvs, sid_left, sid_right, _ = find_first_suitable_window(
+        slots_set, job, res_rqt, hy, min_start_time
+    )
+    return (itvs, sid_left, sid_right)
+
+
+def find_first_suitable_window(
+    slots_set,
+    job,
+    res_rqt,
+    hy,
+    min_start_time,
+    max_start_time=MAX_TIME,
+    update_cache=True,
+):
+    """
+    See :func:`find_first_suitable_contiguous_slots`, also return the
+    resources available during the slots found. Windows starting after
+    `max_start_time` (or the gantt horizon) are not searched. The slot set
+    cache is only updated if `update_cache` is true, a search for another
+    request than the job's one must not update it.
+    """
 
     (mld_id, walltime, hy_res_rqts) = res_rqt
 
@@ -125,7 +205,7 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
     slots = slots_set.slots
     cache = slots_set.cache
     # flag to control cache update for considered entry
-    no_cache = False
+    no_cache = not update_cache
     # updated_cache = False
     sid_left = 1
     if min_start_time < 0:
@@ -138,15 +218,27 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
             # print("cache miss :(")
 
     else:
-        while slots[sid_left].b < min_start_time:
-            sid_left = slots[sid_left].next
         # satisfy job dependencies converted in min start_time
+        sid_left = slots_set.slot_id_from(min_start_time)
 
     # sid_left = 1 # TODO no cache
 
+    # jobs which cannot start before the horizon are not placed in this round
+    horizon = int(config["SCHEDULER_GANTT_HORIZON"])
+    horizon_time = slots_set.begin + horizon if horizon > 0 else MAX_TIME
+    # only the horizon applies to the same jobs, not max_start_time
+    horizon_cut = horizon_time <= max_start_time
+    horizon_time = min(horizon_time, max_start_time)
+
     sid_right = sid_left
     slot_e = slots[sid_right].e
 
+    # resources of the slots from win_left to win_right
+    window = IntersectionWindow()
+    win_left = 0
+    win_right = 0
+    ts_ph = job.ts or (job.ph == ALLOW)
+
     # print('first sid_left', sid_left)
 
     while True:
@@ -162,7 +254,22 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
             logger.info(
                 "can't schedule job with id: {}, no suitable resources".format(job.id)
             )
-            return (ProcSet(), -1, -1)
+            return (ProcSet(), -1, -1, ProcSet())
+        if slot_b > horizon_time:
+            logger.info(
+                "can't schedule job with id: {}, no start before {}".format(
+                    job.id, horizon_time
+                )
+            )
+            if (
+                job.key_cache
+                and (min_start_time < 0)
+                and (not no_cache)
+                and horizon_cut
+            ):
+                # same jobs will not start before either
+                cache[job.key_cache[mld_id]] = sid_left
+            return (ProcSet(), -1, -1, ProcSet())
         # import pdb; pdb.set_trace()
         if Quotas.calendar and (not job.no_quotas):
             time_limit = slot_b + config["QUOTAS_WINDOW_TIME_LIMIT"]
@@ -173,7 +280,7 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
                             job.id, walltime
                         )
                     )
-                    return (ProcSet(), -1, -1)
+                    return (ProcSet(), -1, -1, ProcSet())
                 # test next slot need to be temporal_quotas sliced
                 if slots[sid_right].quotas_rules_id == -1:
                     # assumption is done that this part is rarely executed (either it's abnormal)
@@ -195,7 +302,7 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
                             job.id, walltime
                         )
                     )
-                    return (ProcSet(), -1, -1)
+                    return (ProcSet(), -1, -1, ProcSet())
 
                 if slots[sid_left].quotas_rules_id != slots[sid_right].quotas_rules_id:
                     sid_left = sid_right
@@ -205,7 +312,7 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
                                 job.id
                             )
                         )
-                        return (ProcSet(), -1, -1)
+                        return (ProcSet(), -1, -1, ProcSet())
         else:
             while (slot_e - slot_b + 1) < walltime:
                 sid_right = slots[sid_right].next
@@ -217,16 +324,25 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
                             job.id, walltime
                         )
                     )
-                    return (ProcSet(), -1, -1)
+                    return (ProcSet(), -1, -1, ProcSet())
 
         #        if not updated_cache and (slots[sid_left].itvs != []):
         #            cache[walltime] = sid_left
         #            updated_cache = True
 
-        if job.ts or (job.ph == ALLOW):
-            itvs_avail = intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job)
-        else:
-            itvs_avail = intersec_itvs_slots(slots, sid_left, sid_right)
+        if win_left != sid_left:
+            # first window or left slot moved by temporal quotas
+            window = IntersectionWindow()
+            win_left = sid_left
+            win_right = 0
+        while win_right != sid_right:
+            win_right = slots[win_right].next if win_right else sid_left
+            if ts_ph:
+                window.push(ts_ph_itvs_slot(slots[win_right], job))
+            else:
+                window.push(slots[win_right].itvs)
+
+        itvs_avail = window.intersection()
         # print("itvs_avail", itvs_avail, "h_res_req", hy_res_rqts, "hy", hy)
         if job.find:
             beginning_slotset = (
@@ -269,7 +385,9 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
             else:
                 break
 
+        window.pop()
         sid_left = slots[sid_left].next
+        win_left = sid_left
 
     if job.key_cache and (min_start_time < 0) and (not no_cache):  # and (not job.deps):
         cache[job.key_cache[mld_id]] = sid_left
@@ -277,7 +395,7 @@ def find_first_suitable_contiguous_slots(slots_set, job, res_rqt, hy, min_start_
         # else:
         # print("cache: not updated ", job.key_cache, min_start_time, job.deps)
 
-    return (itvs, sid_left, sid_right)
+    return (itvs, sid_left, sid_right, itvs_avail)
 
 
 def assign_resources_mld_job_split_slots(slots_set, job, hy, min_start_time):
@@ -332,16 +450,218 @@ def assign_resources_mld_job_split_slots(slots_set, job, hy, min_start_time):
     return prev_sid_left, prev_sid_right, job
 
 
-def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
-    """Schedule loop with support for jobs container - can be recursive (recursion has not be tested)"""
+def assign_resources_mld_job_backfill_split_slots(
+    slots_set, job, hy, min_start_time, hole_minimum_time=0
+):
+    """
+    Backfill a job into the current holes of the slot set (see
+    ``SCHEDULER_BACKFILLING="easy"``): assign resources to it and split the
+    slots only if it can start at the beginning of the slot set, in a hole
+    lasting at least `hole_minimum_time`. Otherwise the job gets no
+    reservation (start_time is -1).
+    """
+    start_time = slots_set.begin
+    prev_walltime = None
+
+    if min_start_time <= start_time:
+        for res_rqt in job.mld_res_rqts:
+            mld_id, walltime, hy_res_rqts = res_rqt
+            if (prev_walltime is not None) and (walltime >= prev_walltime):
+                # all moldable instances start now, keep the first finishing
+                continue
+            res_set, _, _, _ = find_first_suitable_window(
+                slots_set,
+                job,
+                (mld_id, max(walltime, hole_minimum_time), hy_res_rqts),
+                hy,
+                min_start_time,
+                start_time,
+                update_cache=False,
+            )
+            if len(res_set) != 0:
+                prev_walltime = walltime
+                prev_res_set = res_set
+                prev_mld_id = mld_id
+
+    if prev_walltime is None:
+        job.res_set = ProcSet()
+        job.start_time = -1
+        job.moldable_id = -1
+        return
+
+    job.moldable_id = prev_mld_id
+    job.res_set = prev_res_set
+    job.start_time = start_time
+    job.walltime = prev_walltime
+
+    # slots during the job only, the hole can be longer
+    sid_left, sid_right = slots_set.get_encompassing_slots(
+        start_time, start_time + prev_walltime - 1
+    )
+    slots_set.split_slots(sid_left, sid_right, job)
+    return sid_left, sid_right, job
+
+
+def job_class_key(job):
+    """
+    Return the key of the class of identical subjobs of an array which
+    `job` belongs to, or None if it must be placed on its own.
+
+    Identical subjobs have the same request, walltime, properties and types.
+    Jobs with dependencies, timesharing, placeholder, custom assign or find
+    functions, several moldable instances or container type are left alone, as
+    well as all jobs when quotas are enabled.
+    """
+    if (
+        (not getattr(job, "array_id", 0))
+        or (not job.key_cache)
+        or job.deps
+        or job.ts
+        or (job.ph != NO_PLACEHOLDER)
+        or job.assign
+        or job.find
+        or (len(job.mld_res_rqts) != 1)
+        or ("container" in job.types)
+    ):
+        return None
+    return (job.array_id, next(iter(job.key_cache.values())), str(job.types))
+
+
+def assign_resources_job_class_split_slots(slots_set, class_jobs, hy):
+    """
+    Assign resources to identical jobs (see :func:`job_class_key`) in order,
+    as :func:`assign_resources_mld_job_split_slots` would do one after the
+    other.
+
+    Once the first suitable slots are found for a job, the following ones are
+    placed at the same time while the free resources of these slots allow it,
+    then slots are split once for all of them. The search resumes from there
+    for the next job.
+    """
+    slots = slots_set.slots
+    i = 0
+    while i < len(class_jobs):
+        job = class_jobs[i]
+        res_rqt = job.mld_res_rqts[0]
+        (mld_id, walltime, hy_res_rqts) = res_rqt
+        res_set, sid_left, sid_right, itvs_avail = find_first_suitable_window(
+            slots_set, job, res_rqt, hy, -1
+        )
+        if len(res_set) == 0:
+            # slots are unchanged, the next jobs cannot be placed either
+            for job in class_jobs[i:]:
+                job.res_set = ProcSet()
+                job.start_time = -1
+                job.moldable_id = -1
+            return
+
+        start_time = slots[sid_left].b
+        itvs_assigned = ProcSet()
+        while True:
+            job.moldable_id = mld_id
+            job.res_set = res_set
+            job.start_time = start_time
+            job.walltime = walltime
+            itvs_avail = itvs_avail - res_set
+            itvs_assigned = itvs_assigned | res_set
+            i += 1
+            if i == len(class_jobs):
+                break
+            job = class_jobs[i]
+            (mld_id, walltime, hy_res_rqts) = job.mld_res_rqts[0]
+            res_set = find_resource_hierarchies_job(itvs_avail, hy_res_rqts, hy)
+            if len(res_set) == 0:
+                break
+
+        slots_set.split_slots(
+            sid_left,
+            sid_right,
+            JobPseudo(start_time=start_time, walltime=walltime, res_set=itvs_assigned),
+        )
+
+
+class TimeBudget(object):
+    """
+    Time given to the placement of jobs, started by the first job placed with
+    it (see :func:`schedule_id_jobs_ct`): at least one job is always placed.
+    """
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.deadline = None
+
+    def start(self):
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.duration
+
+    def exhausted(self):
+        return (self.deadline is not None) and (time.monotonic() >= self.deadline)
+
+
+def placement_budget():
+    """Return the TimeBudget of a scheduling round, None without limit."""
+    duration = float(config["SCHEDULER_PLACEMENT_TIME_BUDGET"])
+    if duration > 0:
+        return TimeBudget(duration)
+    return None
+
+
+def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time, budget=None):
+    """Schedule loop with support for jobs container - can be recursive (recursion has not be tested)
+
+    Jobs are placed in the order of `id_jobs` until the TimeBudget `budget`
+    (if any) is exhausted, the ids of the jobs not reached are returned.
+    """
 
     #    for k,job in jobs.items():
     # print("*********j_id:", k, job.mld_res_rqts[0])
 
-    for jid in id_jobs:
+    # with EASY backfilling only the first jobs which cannot start now get a
+    # reservation, the following ones are only backfilled in current holes
+    easy = config["SCHEDULER_BACKFILLING"] == "easy"
+    reservation_depth = int(config["SCHEDULER_RESERVATION_DEPTH"])
+    hole_minimum_time = int(config["SCHEDULER_GANTT_HOLE_MINIMUM_TIME"])
+    nb_reservations = 0
+
+    bulk = (not Quotas.enabled) and (not easy)
+    i = 0
+    while i < len(id_jobs):
+        if budget is not None:
+            if budget.exhausted():
+                logger.info(
+                    "placement time budget exhausted, "
+                    + str(len(id_jobs) - i)
+                    + " job(s) not re-evaluated"
+                )
+                for jid in id_jobs[i:]:
+                    # Set job as not scheduled in this round
+                    jobs[jid].start_time = -1
+                return id_jobs[i:]
+            budget.start()
+        jid = id_jobs[i]
+        i += 1
         logger.debug("Schedule job:" + str(jid))
         job = jobs[jid]
 
+        key = job_class_key(job) if bulk else None
+        if key is not None and job.types.get("inner", "default") in slots_sets:
+            # following identical subjobs of the array are placed together
+            class_jobs = [job]
+            while i < len(id_jobs) and job_class_key(jobs[id_jobs[i]]) == key:
+                class_jobs.append(jobs[id_jobs[i]])
+                i += 1
+            if len(class_jobs) > 1:
+                logger.debug(
+                    "Schedule jobs:"
+                    + ",".join(str(j.id) for j in class_jobs[1:])
+                    + " with job:"
+                    + str(jid)
+                )
+                assign_resources_job_class_split_slots(
+                    slots_sets[job.types.get("inner", "default")], class_jobs, hy
+                )
+                continue
+
         min_start_time = -1
         to_skip = False
         # Dependencies
@@ -362,6 +682,10 @@ def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
                 # determine endtime
                 if jid_dep in jobs:
                     job_dep = jobs[jid_dep]
+                    if job_dep.start_time == -1 or not hasattr(job_dep, "walltime"):
+                        # Required job not scheduled, or not yet in this loop
+                        to_skip = True
+                        break
                     job_dep_stop_time = job_dep.start_time + job_dep.walltime
                     if job_dep_stop_time > min_start_time:
                         min_start_time = job_dep_stop_time
@@ -406,8 +730,14 @@ def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
                     *job.assign_args,
                     **job.assign_kwargs
                 )
+            elif easy and (nb_reservations >= reservation_depth):
+                assign_resources_mld_job_backfill_split_slots(
+                    slots_set, job, hy, min_start_time, hole_minimum_time
+                )
             else:
                 assign_resources_mld_job_split_slots(slots_set, job, hy, min_start_time)
+                if easy and (job.start_time > slots_set.begin):
+                    nb_reservations += 1
 
             if "container" in job.types:
                 if job.types["container"] == "":
@@ -437,3 +767,5 @@ def schedule_id_jobs_ct(slots_sets, jobs, hy, id_jobs, job_security_time):
                     )
                     # slot.show()
                     slots_sets[ss_name] = SlotSet(slot)
+
+    return []
@@ -4,10 +4,14 @@ This module contains the base scheduling structures :class:`SlotSet` and :class:
 """
 
 import copy
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
 
 from procset import ProcSet
 
 from oar.kao.quotas import Quotas
+from oar.lib import config
 from oar.lib.job_handling import ALLOW, NO_PLACEHOLDER, PLACEHOLDER
 from oar.lib.utils import dict_ps_copy
 
@@ -132,6 +136,32 @@ def intersec_itvs_slots(slots, sid_left, sid_right):
     return itvs_acc
 
 
+def ts_ph_itvs_slot(slot, job):
+    """
+    Return the resources of `slot` available for `job`, including the ones it can share
+    with time sharing jobs or use in placeholders (see :func:`intersec_ts_ph_itvs_slots`).
+    """
+    itvs = slot.itvs
+
+    if job.ts:
+        if "*" in slot.ts_itvs:  # slot.ts_itvs[user][name]
+            if "*" in slot.ts_itvs["*"]:
+                itvs = itvs | slot.ts_itvs["*"]["*"]
+            elif job.name in slot.ts_itvs["*"]:
+                itvs = itvs | slot.ts_itvs["*"][job.name]
+        elif job.user in slot.ts_itvs:
+            if "*" in slot.ts_itvs[job.user]:
+                itvs = itvs | slot.ts_itvs[job.user]["*"]
+            elif job.name in slot.ts_itvs[job.user]:
+                itvs = itvs | slot.ts_itvs[job.user][job.name]
+
+    if job.ph == ALLOW:
+        if job.ph_name in slot.ph_itvs:
+            itvs = itvs | slot.ph_itvs[job.ph_name]
+
+    return itvs
+
+
 def intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job):
     """
     Same as :func:`intersec_itvs_slots`, but depending on the `job` configuration enables to share resources between jobs.
@@ -141,23 +171,7 @@ def intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job):
     itvs_acc = ProcSet()
     while True:
         slot = slots[sid]
-        itvs = slot.itvs
-
-        if job.ts:
-            if "*" in slot.ts_itvs:  # slot.ts_itvs[user][name]
-                if "*" in slot.ts_itvs["*"]:
-                    itvs = itvs | slot.ts_itvs["*"]["*"]
-                elif job.name in slot.ts_itvs["*"]:
-                    itvs = itvs | slot.ts_itvs["*"][job.name]
-            elif job.user in slot.ts_itvs:
-                if "*" in slot.ts_itvs[job.user]:
-                    itvs = itvs | slot.ts_itvs[job.user]["*"]
-                elif job.name in slot.ts_itvs[job.user]:
-                    itvs = itvs | slot.ts_itvs[job.user][job.name]
-
-        if job.ph == ALLOW:
-            if job.ph_name in slot.ph_itvs:
-                itvs = itvs | slot.ph_itvs[job.ph_name]
+        itvs = ts_ph_itvs_slot(slot, job)
 
         if not itvs_acc:
             itvs_acc = itvs
@@ -171,7 +185,97 @@ def intersec_ts_ph_itvs_slots(slots, sid_left, sid_right, job):
     return itvs_acc
 
 
-class SlotSet:
+class IntersectionWindow(object):
+    """
+    Intersection of the resources of a window of contiguous slots, slots being added
+    on its right and removed on its left as in :func:`find_first_suitable_contiguous_slots`.
+
+    The window is a queue made of two stacks: the back stack keeps the intersection of
+    its elements, the front stack keeps for each element the intersection from it to
+    the end of the front stack. Each slot takes part in a constant number of
+    intersections, instead of one per window which contains it.
+    """
+
+    def __init__(self):
+        self.front = []
+        self.back = []
+        self.back_itvs = None
+
+    def __len__(self):
+        return len(self.front) + len(self.back)
+
+    def push(self, itvs):
+        """Add the resources of the slot on the right of the window."""
+        self.back.append(itvs)
+        if self.back_itvs is None:
+            self.back_itvs = itvs
+        elif itvs is not self.back_itvs:
+            self.back_itvs = self.back_itvs & itvs
+
+    def pop(self):
+        """Remove the slot on the left of the window."""
+        if not self.front:
+            itvs_acc = None
+            for itvs in reversed(self.back):
+                if itvs_acc is None:
+                    itvs_acc = itvs
+                elif itvs is not itvs_acc:
+                    itvs_acc = itvs & itvs_acc
+                self.front.append(itvs_acc)
+            self.back = []
+            self.back_itvs = None
+        self.front.pop()
+
+    def intersection(self):
+        """Return the resources available in all the slots of the window."""
+        if not self.front:
+            return self.back_itvs
+        if self.back_itvs is None:
+            return self.front[-1]
+        return self.front[-1] & self.back_itvs
+
+
+class SlotTimeIndex(object):
+    """
+    Index of the slots sorted by beginning time, the slot at a given time is found
+    by bisection instead of walking the linked list of slots from the first one.
+    Slot sets must add the slots created by a split with :meth:`index_slot`
+    (beginnings of existing slots never change during a split).
+    """
+
+    def build_time_index(self):
+        self.index_b = []
+        self.index_sid = []
+        slots = self.slots
+        sid = 1
+        while sid:
+            slot = slots[sid]
+            self.index_b.append(slot.b)
+            self.index_sid.append(sid)
+            sid = slot.next
+
+    def index_slot(self, b, sid):
+        # after the slots beginning at the same time, as in the linked list
+        i = bisect_right(self.index_b, b)
+        self.index_b.insert(i, b)
+        self.index_sid.insert(i, sid)
+
+    def slot_id_at(self, t):
+        """Return the id of the slot containing `t` (the first slot if `t` is before it)."""
+        i = bisect_right(self.index_b, t)
+        if i == 0:
+            return 1
+        return self.index_sid[i - 1]
+
+    def slot_id_from(self, t):
+        """Return the id of the first slot beginning at or after `t`, 0 if there is none."""
+        i = bisect_left(self.index_b, t)
+        if i == len(self.index_sid):
+            return 0
+        return self.index_sid[i]
+
+
+class SlotSet(SlotTimeIndex):
     """
     :class:`SlotSet` holds a linked list of slots and provides utilities for their manipulation.
     """
@@ -225,6 +329,8 @@ class SlotSet:
         #  (same requested resources w/ constraintes)
         self.cache = {}
 
+        self.build_time_index()
+
         # Slots must be splitted according to Quotas' calendar if applied and the first has not
         # rules affected
         # import pdb; pdb.set_trace()
@@ -255,11 +361,64 @@ class SlotSet:
     def show_slots(self):
         print("%s" % self)
 
+    def copy(self):
+        """
+        Return a copy of the :class:`SlotSet` which can be split without modifying this one.
+        :class:`ProcSet` are shared between the copies since they are never modified in place.
+        """
+        slots = {}
+        for sid, slot in self.slots.items():
+            a_slot = Slot(
+                slot.id,
+                slot.prev,
+                slot.next,
+                slot.itvs,
+                slot.b,
+                slot.e,
+                dict_ps_copy(slot.ts_itvs),
+                dict_ps_copy(slot.ph_itvs),
+            )
+            if hasattr(a_slot, "quotas"):
+                a_slot.quotas.deepcopy_from(slot.quotas)
+                a_slot.quotas_rules_id = slot.quotas_rules_id
+                a_slot.quotas.set_rules(slot.quotas_rules_id)
+            slots[sid] = a_slot
+
+        slot_set = SlotSet(slots)
+        # identifiers of new slots must not collide with existing ones
+        slot_set.last_id = self.last_id
+        return slot_set
+
+    def drop_slots_before(self, t):
+        """
+        Remove the slots ending before `t`, the remaining first slot (with id 1) begins at `t`.
+        It is used to move forward in time a :class:`SlotSet` kept between scheduling rounds.
+        """
+        if t <= self.begin:
+            return
+
+        slot = self.slots[1]
+        while slot.e < t:
+            del self.slots[slot.id]
+            slot = self.slots[slot.next]
+
+        if slot.id != 1:
+            del self.slots[slot.id]
+            if slot.next:
+                self.slots[slot.next].prev = 1
+            slot.id = 1
+            self.slots[1] = slot
+
+        slot.prev = 0
+        slot.b = t
+        self.begin = t
+        self.cache = {}
+        self.build_time_index()
+
     def slot_before_job(self, slot, job):
         s_id = slot.id
         self.last_id += 1
         next_id = self.last_id
-        print("next id:", next_id)
         a_slot = Slot(
             s_id,
             slot.prev,
@@ -276,6 +435,8 @@ class SlotSet:
         # w/ sid = 1 r
         slot.id = next_id
         self.slots[next_id] = slot
+        # slot's beginning is set to job's start by sub/add_slot_during_job
+        self.index_slot(job.start_time, next_id)
 
         if hasattr(a_slot, "quotas"):
             a_slot.quotas.deepcopy_from(slot.quotas)
@@ -344,6 +505,7 @@ class SlotSet:
         )
         slot.next = s_id
         self.slots[s_id] = c_slot
+        self.index_slot(c_slot.b, s_id)
 
         if hasattr(c_slot, "quotas"):
             c_slot.quotas.deepcopy_from(slot.quotas)
@@ -431,31 +593,26 @@ class SlotSet:
         Jobs must be sorted by start_time.
         It used in to insert previously scheduled jobs in slots or container jobs.
         """
-        slot = self.slots[1]  # 1
-        left_sid_2_split = 1
-        right_sid_2_split = 1
-
         if not sub:
             # for adding resources we need to inverse the chronological order
             ordered_jobs.reverse()
 
         for job in ordered_jobs:
             # Find first slot
-            while not (
-                (slot.b > job.start_time)
-                or ((slot.b <= job.start_time) and (job.start_time <= slot.e))
-            ):
-                left_sid_2_split = slot.next
-                slot = self.slots[slot.next]
-
-            right_sid_2_split = left_sid_2_split
+            left_sid_2_split = self.slot_id_at(job.start_time)
             # Find slots encompass
-            while not (slot.e >= (job.start_time + job.walltime)):
-                right_sid_2_split = slot.next
-                slot = self.slots[slot.next]
+            right_sid_2_split = self.slot_id_at(job.start_time + job.walltime)
 
             self.split_slots(left_sid_2_split, right_sid_2_split, job, sub)
 
+    def get_encompassing_slots(self, t_begin, t_end):
+        """Return the ids of the first and last slots encompassing [t_begin, t_end]."""
+        return (self.slot_id_at(t_begin), self.slot_id_at(t_end))
+
+    def intersec_itvs_slots(self, sid_left, sid_right):
+        """See :func:`intersec_itvs_slots`."""
+        return intersec_itvs_slots(self.slots, sid_left, sid_right)
+
     def temporal_quotas_split_slot(self, slot, quotas_rules_id, remaining_duration):
         while True:
             # import pdb; pdb.set_trace()
@@ -483,6 +640,7 @@ class SlotSet:
                     dict_ps_copy(slot.ph_itvs),
                 )
                 self.slots[b_id] = b_slot
+                self.index_slot(b_slot.b, b_id)
                 # modify current A
                 slot.next = b_id
                 slot.e = slot.b + remaining_duration - 1
@@ -498,3 +656,374 @@ class SlotSet:
 
                 # for next iteration
                 slot = b_slot
+
+
+class ArraySlot(object):
+    """View on a slot of an :class:`ArraySlotSet`, with the attributes of :class:`Slot`."""
+
+    __slots__ = ("slot_set", "id")
+
+    def __init__(self, slot_set, id):
+        self.slot_set = slot_set
+        self.id = id
+
+    @property
+    def prev(self):
+        return self.slot_set.prevs[self.id]
+
+    @property
+    def next(self):
+        return self.slot_set.nexts[self.id]
+
+    @property
+    def b(self):
+        return self.slot_set.begins[self.id]
+
+    @b.setter
+    def b(self, b):
+        self.slot_set.begins[self.id] = b
+
+    @property
+    def e(self):
+        return self.slot_set.ends[self.id]
+
+    @e.setter
+    def e(self, e):
+        self.slot_set.ends[self.id] = e
+
+    @property
+    def itvs(self):
+        return self.slot_set.itvs[self.id]
+
+    @itvs.setter
+    def itvs(self, itvs):
+        self.slot_set.itvs[self.id] = itvs
+
+    @property
+    def ts_itvs(self):
+        return self.slot_set.ts_itvs.get(self.id, {})
+
+    @property
+    def ph_itvs(self):
+        return self.slot_set.ph_itvs.get(self.id, {})
+
+    def __str__(self):
+        return (
+            "Slot(id=%s, prev=%s, next=%s, itvs=%s, b=%s, e=%s, ts_itvs=%s, ph_itvs=%s)"
+            % (
+                self.id,
+                self.prev,
+                self.next,
+                self.itvs,
+                self.b,
+                self.e,
+                self.ts_itvs,
+                self.ph_itvs,
+            )
+        )
+
+    def __repr__(self):
+        return "<%s>" % self
+
+
+class ArraySlots(Mapping):
+    """Read access to the slots of an :class:`ArraySlotSet` as a `dict` of slots."""
+
+    def __init__(self, slot_set):
+        self.slot_set = slot_set
+
+    def __getitem__(self, sid):
+        if (sid <= 0) or (sid >= len(self.slot_set.begins)):
+            raise KeyError(sid)
+        return ArraySlot(self.slot_set, sid)
+
+    def __iter__(self):
+        nexts = self.slot_set.nexts
+        sid = 1
+        while sid:
+            yield sid
+            sid = nexts[sid]
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class ArraySlotSet(SlotTimeIndex):
+    """
+    Alternative to :class:`SlotSet` where the slots are stored in contiguous arrays
+    (beginning, end, previous and next slot ids) instead of :class:`Slot` objects.
+    Slot ids are indexes in these arrays, the index 0 is not used and the first slot
+    has identifier one.
+
+    Resources of slots are kept in a list of :class:`ProcSet` shared between slots:
+    as :class:`ProcSet` are never modified in place, slots (and copies of the slot set)
+    with the same resources reference the same object, and splitting a slot
+    only copies references. The set operations applied by a job on slots sharing the
+    same resources are done once.
+
+    It provides the same methods to split slots, the :attr:`slots` attribute gives
+    access to the slots as :class:`Slot`-like objects. Quotas are not supported.
+    """
+
+    def __init__(self, slots):
+        """
+        :class:`ArraySlotSet` is initialized like :class:`SlotSet`, with a `dict` of
+        :class:`Slot`, a `tuple` (resources, beginning) or a single :class:`Slot`.
+        """
+        self.begins = array("q", [0])
+        self.ends = array("q", [0])
+        self.prevs = array("l", [0])
+        self.nexts = array("l", [0])
+        self.itvs = [ProcSet()]
+        # timesharing and placeholder intervals of slots which have some
+        self.ts_itvs = {}
+        self.ph_itvs = {}
+
+        if isinstance(slots, dict):
+            # slots are renumbered in chronological order
+            slot = slots[1]
+            while True:
+                self.new_slot(slot.itvs, slot.b, slot.e, slot.ts_itvs, slot.ph_itvs)
+                if slot.next == 0:
+                    break
+                slot = slots[slot.next]
+        elif isinstance(slots, tuple):
+            itvs, b = slots
+            if not isinstance(itvs, ProcSet):
+                itvs = ProcSet(*itvs)
+            self.new_slot(itvs, b, MAX_TIME)
+        else:
+            # Given slots is, in fact, one slot
+            self.new_slot(slots.itvs, slots.b, slots.e, slots.ts_itvs, slots.ph_itvs)
+
+        self.begin = self.begins[1]
+        self.cache = {}
+        self.slots = ArraySlots(self)
+        self.build_time_index()
+
+    def new_slot(self, itvs, b, e, ts_itvs=None, ph_itvs=None):
+        """Append a slot after the last one."""
+        sid = len(self.begins)
+        prev = sid - 1
+        self.begins.append(b)
+        self.ends.append(e)
+        self.prevs.append(prev)
+        self.nexts.append(0)
+        self.itvs.append(itvs)
+        if prev:
+            self.nexts[prev] = sid
+        if ts_itvs:
+            self.ts_itvs[sid] = dict_ps_copy(ts_itvs)
+        if ph_itvs:
+            self.ph_itvs[sid] = dict_ps_copy(ph_itvs)
+
+    def __str__(self):
+        lines = []
+        for i, slot in self.slots.items():
+            lines.append("[%s] %s" % (i, slot))
+        max_length = max([len(line) for line in lines])
+        lines.append("%s" % ("-" * max_length))
+        lines.insert(0, ("{:-^%d}" % max_length).format(" SlotSet "))
+        return "\n".join(lines)
+
+    def __repr__(self):
+        return "%s" % self
+
+    def show_slots(self):
+        print("%s" % self)
+
+    def copy(self):
+        """Return a copy of the :class:`ArraySlotSet`, resources are shared."""
+        slot_set = copy.copy(self)
+        slot_set.begins = self.begins[:]
+        slot_set.ends = self.ends[:]
+        slot_set.prevs = self.prevs[:]
+        slot_set.nexts = self.nexts[:]
+        slot_set.itvs = self.itvs[:]
+        slot_set.ts_itvs = {sid: dict_ps_copy(d) for sid, d in self.ts_itvs.items()}
+        slot_set.ph_itvs = {sid: dict_ps_copy(d) for sid, d in self.ph_itvs.items()}
+        slot_set.cache = {}
+        slot_set.slots = ArraySlots(slot_set)
+        slot_set.index_b = self.index_b[:]
+        slot_set.index_sid = self.index_sid[:]
+        return slot_set
+
+    def drop_slots_before(self, t):
+        """See :meth:`SlotSet.drop_slots_before`."""
+        if t <= self.begin:
+            return
+
+        sid = 1
+        while self.ends[sid] < t:
+            self.ts_itvs.pop(sid, None)
+            self.ph_itvs.pop(sid, None)
+            sid = self.nexts[sid]
+
+        if sid != 1:
+            # move the first remaining slot at index 1, the others are left unused
+            self.ends[1] = self.ends[sid]
+            self.nexts[1] = self.nexts[sid]
+            self.itvs[1] = self.itvs[sid]
+            self.itvs[sid] = self.itvs[0]
+            if sid in self.ts_itvs:
+                self.ts_itvs[1] = self.ts_itvs.pop(sid)
+            if sid in self.ph_itvs:
+                self.ph_itvs[1] = self.ph_itvs.pop(sid)
+            if self.nexts[1]:
+                self.prevs[self.nexts[1]] = 1
+
+        self.prevs[1] = 0
+        self.begins[1] = t
+        self.begin = t
+        self.cache = {}
+        self.build_time_index()
+
+    def duplicate_slot(self, sid, b, e):
+        """Insert after slot `sid` a slot with the same resources and return its id."""
+        new_sid = len(self.begins)
+        next_sid = self.nexts[sid]
+        self.begins.append(b)
+        self.ends.append(e)
+        self.prevs.append(sid)
+        self.nexts.append(next_sid)
+        self.itvs.append(self.itvs[sid])
+        if sid in self.ts_itvs:
+            self.ts_itvs[new_sid] = dict_ps_copy(self.ts_itvs[sid])
+        if sid in self.ph_itvs:
+            self.ph_itvs[new_sid] = dict_ps_copy(self.ph_itvs[sid])
+        if next_sid:
+            self.prevs[next_sid] = new_sid
+        self.nexts[sid] = new_sid
+        self.index_slot(b, new_sid)
+        return new_sid
+
+    def slot_before_job(self, sid, job):
+        """Cut slot `sid` at job's beginning, return the id of the second part."""
+        # the first part keeps its id (the first slot has always id one)
+        b_sid = self.duplicate_slot(sid, job.start_time, self.ends[sid])
+        self.ends[sid] = job.start_time - 1
+        return b_sid
+
+    def slot_after_job(self, sid, job):
+        """Cut slot `sid` at job's end."""
+        self.duplicate_slot(sid, job.start_time + job.walltime, self.ends[sid])
+
+    def sub_slot_during_job(self, sid, job, itvs):
+        self.begins[sid] = max(self.begins[sid], job.start_time)
+        self.ends[sid] = min(self.ends[sid], job.start_time + job.walltime - 1)
+        self.itvs[sid] = itvs
+        if job.ts:
+            ts_itvs = self.ts_itvs.setdefault(sid, {})
+            if job.ts_user not in ts_itvs:
+                ts_itvs[job.ts_user] = {}
+
+            if job.ts_name not in ts_itvs[job.ts_user]:
+                ts_itvs[job.ts_user][job.ts_name] = copy.copy(job.res_set)
+
+        if job.ph == ALLOW:
+            ph_itvs = self.ph_itvs.get(sid, {})
+            if job.ph_name in ph_itvs:
+                ph_itvs[job.ph_name] = ph_itvs[job.ph_name] - job.res_set
+
+        if job.ph == PLACEHOLDER:
+            self.ph_itvs.setdefault(sid, {})[job.ph_name] = copy.copy(job.res_set)
+
+    def add_slot_during_job(self, sid, job, itvs):
+        self.begins[sid] = max(self.begins[sid], job.start_time)
+        self.ends[sid] = min(self.ends[sid], job.start_time + job.walltime - 1)
+        if (not job.ts) and (job.ph == NO_PLACEHOLDER):
+            self.itvs[sid] = itvs
+        if job.ts:
+            ts_itvs = self.ts_itvs.setdefault(sid, {})
+            if job.ts_user not in ts_itvs:
+                ts_itvs[job.ts_user] = {}
+            if job.ts_name not in ts_itvs[job.ts_user]:
+                ts_itvs[job.ts_user][job.ts_name] = copy.copy(job.res_set)
+            else:
+                itvs = ts_itvs[job.ts_user][job.ts_name]
+                ts_itvs[job.ts_user][job.ts_name] = itvs | job.res_set
+
+        if job.ph == PLACEHOLDER:
+            ph_itvs = self.ph_itvs.setdefault(sid, {})
+            if job.ph_name in ph_itvs:
+                ph_itvs[job.ph_name] = ph_itvs[job.ph_name] | job.res_set
+            else:
+                ph_itvs[job.ph_name] = copy.copy(job.res_set)
+
+    def split_slots(self, sid_left, sid_right, job, sub=True):
+        """See :meth:`SlotSet.split_slots`."""
+        job_end = job.start_time + job.walltime
+        # resources after the job's insertion, by id of the resources before
+        new_itvs = {}
+        sid = sid_left
+        while True:
+            next_sid = self.nexts[sid]
+
+            b_sid = sid
+            if job.start_time > self.begins[sid]:
+                # Generate A
+                b_sid = self.slot_before_job(sid, job)
+            if (job_end - 1) < self.ends[b_sid]:
+                # Generate C
+                self.slot_after_job(b_sid, job)
+
+            itvs = self.itvs[b_sid]
+            key = id(itvs)
+            if key not in new_itvs:
+                # itvs is kept in the dict so its id cannot be reused
+                if sub:
+                    new_itvs[key] = (itvs, itvs - job.res_set)
+                else:
+                    new_itvs[key] = (itvs, itvs | job.res_set)
+
+            if sub:
+                # substract resources
+                self.sub_slot_during_job(b_sid, job, new_itvs[key][1])
+            else:
+                # add resources
+                self.add_slot_during_job(b_sid, job, new_itvs[key][1])
+
+            if sid == sid_right:
+                break
+            sid = next_sid
+
+    def split_slots_jobs(self, ordered_jobs, sub=True):
+        """See :meth:`SlotSet.split_slots_jobs`."""
+        if not sub:
+            # for adding resources we need to inverse the chronological order
+            ordered_jobs.reverse()
+
+        for job in ordered_jobs:
+            sid_left = self.slot_id_at(job.start_time)
+            sid_right = self.slot_id_at(job.start_time + job.walltime)
+            self.split_slots(sid_left, sid_right, job, sub)
+
+    def get_encompassing_slots(self, t_begin, t_end):
+        """See :meth:`SlotSet.get_encompassing_slots`."""
+        return (self.slot_id_at(t_begin), self.slot_id_at(t_end))
+
+    def intersec_itvs_slots(self, sid_left, sid_right):
+        """See :func:`intersec_itvs_slots`, intersections with the same object are skipped."""
+        slots_itvs = self.itvs
+        nexts = self.nexts
+        sid = sid_left
+        itvs_acc = slots_itvs[sid]
+
+        while sid != sid_right:
+            sid = nexts[sid]
+            itvs = slots_itvs[sid]
+            if itvs is not itvs_acc:
+                itvs_acc = itvs_acc & itvs
+
+        return itvs_acc
+
+
+def new_slot_set(slots):
+    """
+    Return a slot set using the implementation selected by ``SCHEDULER_SLOT_SET``:
+    :class:`SlotSet` (``"dict"``, default) or :class:`ArraySlotSet` (``"array"``).
+    Quotas are only supported by :class:`SlotSet`.
+    """
+    if (config["SCHEDULER_SLOT_SET"] == "array") and not Quotas.enabled:
+        return ArraySlotSet(slots)
+    return SlotSet(slots)
@@ -18,6 +18,9 @@ all_by_module = {
     "oar.lib.models": [
         "db",
         "Accounting",
+        "AccountingKarma",
+        "AccountingKarmaWindow",
+        "AccountingRollup",
         "AdmissionRule",
         "AssignedResource",
         "Challenge",
@@ -29,6 +32,7 @@ all_by_module = {
         "GanttJobsPredictionsLog",
         "GanttJobsPredictionsVisu",
         "GanttJobsResource",
+        "GanttJobsResourcesItvs",
         "GanttJobsResourcesLog",
         "GanttJobsResourcesVisu",
         "Job",
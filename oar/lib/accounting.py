@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
+import calendar
+import datetime
+from collections import defaultdict
+
 from sqlalchemy import func, or_
+from sqlalchemy.dialects import postgresql, sqlite
 
 from oar.lib import (
     Accounting,
+    AccountingKarma,
+    AccountingKarmaWindow,
+    AccountingRollup,
     AssignedResource,
     Job,
     MoldableJobDescription,
     Resource,
+    config,
     db,
 )
 
@@ -17,24 +26,36 @@ from oar.lib import (
 
 def get_accounting_summary(start_time, stop_time, user="", sql_property=""):
     """Get an array of consumptions by users
-    params: start date, ending date, optional user"""
-    if db.dialect == "sqlite":  # pragma: no cover
-        msg = "Get_accounting_summary is not supported with sqlite"
-        raise NotImplementedError(msg)
+    params: start date, ending date, optional user
 
-    user_query = "AND accounting_user = '%s'" % (user) if user else ""
-    sql_property = "AND ( " + sql_property + " )" if sql_property else ""
+    The accounting rollups are used, unless `sql_property` (on the accounting
+    table) is given."""
+    if sql_property:
+        if db.dialect == "sqlite":  # pragma: no cover
+            msg = "Get_accounting_summary is not supported with sqlite"
+            raise NotImplementedError(msg)
 
-    cur = db.session
-    res = cur.execute(
-        """SELECT accounting_user as user, consumption_type,
+        user_query = "AND accounting_user = '%s'" % (user) if user else ""
+        sql_property = "AND ( " + sql_property + " )"
+
+        cur = db.session
+        res = cur.execute(
+            """SELECT accounting_user as user, consumption_type,
     sum(consumption) as seconds,
     min(window_start) as first_window_start, max(window_stop) as last_window_stop
     FROM accounting
     WHERE window_stop > %s AND window_start < %s %s %s
     GROUP BY accounting_user,consumption_type ORDER BY seconds"""
-        % (start_time, stop_time, user_query, sql_property)
-    )
+            % (start_time, stop_time, user_query, sql_property)
+        )
+    else:
+        sums = sum_accounting_windows(
+            ("user", "consumption_type"), start_time, stop_time, user
+        )
+        res = sorted(
+            (key + tuple(key_sums) for key, key_sums in sums.items()),
+            key=lambda r: r[2],
+        )
 
     results = {}
     for r in res:
@@ -54,30 +75,21 @@ def get_accounting_summary_byproject(
     """ "Get an array of consumptions by project for a given user
     params: start date, ending date, user"""
 
-    user_query = ""
-    if user:
-        user_query = "AND accounting_user = '%s'" % (user)
-    limit_offset_query = ""
-    if limit:
-        limit_offset_query = "LIMIT " + limit
-    if offset:
-        limit_offset_query = limit_offset_query + " OFFSET " + offset
-
-    cur = db.session
-    res = cur.execute(
-        """SELECT accounting_user as user, consumption_type,
-    sum(consumption) as seconds, accounting_project as project
-    FROM accounting
-    WHERE
-    window_stop > %s AND window_start < %s %s
-    GROUP BY accounting_user,project,consumption_type
-    ORDER BY project,consumption_type,seconds %s """
-        % (start_time, stop_time, user_query, limit_offset_query)
+    sums = sum_accounting_windows(
+        ("user", "consumption_type", "project"), start_time, stop_time, user
+    )
+    res = sorted(
+        (key + (key_sums[0],) for key, key_sums in sums.items()),
+        key=lambda r: (r[2], r[1], r[3]),
     )
+    if offset:
+        res = res[int(offset) :]
+    if limit:
+        res = res[: int(limit)]
 
     results = {}
     for r in res:
-        user, consumption_type, consumption, project = r
+        user, consumption_type, project, consumption = r
         if project not in results:
             results[project] = {}
         if consumption_type not in results[project]:
@@ -87,10 +99,19 @@ def get_accounting_summary_byproject(
     return results
 
 
-def update_accounting(
-    start_time, stop_time, window_size, user, project, queue_name, c_type, nb_resources
+def accounting_consumptions(
+    consumptions,
+    start_time,
+    stop_time,
+    window_size,
+    user,
+    project,
+    queue_name,
+    c_type,
+    nb_resources,
 ):
-    """Insert accounting data in table accounting
+    """Add the consumption of a job to `consumptions`, a dict by (window
+    start, window stop, user, project, queue, type) of accounting rows.
     # params : start date in second, stop date in second, window size, user, queue, type(ASKED or USED)
     """
     nb_windows = int(start_time / window_size)
@@ -106,96 +127,105 @@ def update_accounting(
             consumption = window_stop - start_time + 1
 
         consumption = consumption * nb_resources
-        add_accounting_row(
-            window_start, window_stop, user, project, queue_name, c_type, consumption
-        )
+        consumptions[
+            (window_start, window_stop, user, project, queue_name, c_type)
+        ] += consumption
         window_start = window_stop + 1
         start_time = window_start
         window_stop += window_size
+    return consumptions
+
+
+def update_accounting(
+    start_time, stop_time, window_size, user, project, queue_name, c_type, nb_resources
+):
+    """Insert accounting data in table accounting
+    # params : start date in second, stop date in second, window size, user, queue, type(ASKED or USED)
+    """
+    add_accounting_rows(
+        accounting_consumptions(
+            defaultdict(int),
+            start_time,
+            stop_time,
+            window_size,
+            user,
+            project,
+            queue_name,
+            c_type,
+            nb_resources,
+        )
+    )
 
 
 def add_accounting_row(
     window_start, window_stop, user, project, queue_name, c_type, consumption
 ):
     # Insert or update one row according to consumption
-
-    # Test if the window exists
-    # TODO: Need to be cached (in python process or externaly through Redis by example
-    result = (
-        db.query(Accounting.consumption)
-        .filter(Accounting.user == user)
-        .filter(Accounting.project == project)
-        .filter(Accounting.consumption_type == c_type)
-        .filter(Accounting.queue_name == queue_name)
-        .filter(Accounting.window_start == window_start)
-        .filter(Accounting.window_stop == window_stop)
-        .one_or_none()
+    add_accounting_rows(
+        {(window_start, window_stop, user, project, queue_name, c_type): consumption}
     )
 
-    if result:
-        consumption = consumption + result[0]
-        print(
-            "[ACCOUNTING] Update the existing window "
-            + str(window_start)
-            + " --> "
-            + str(window_stop)
-            + ", project "
-            + project
-            + ", user "
-            + user
-            + ", queue"
-            + queue_name
-            + ", type "
-            + "type with conso = "
-            + str(consumption)
-            + " s"
-        )
 
-        db.query(Accounting).filter(Accounting.user == user).filter(
-            Accounting.project == project
-        ).filter(Accounting.consumption_type == c_type).filter(
-            Accounting.queue_name == queue_name
-        ).filter(
-            Accounting.window_start == window_start
-        ).filter(
-            Accounting.window_stop == window_stop
-        ).update(
-            {Accounting.consumption: consumption}, synchronize_session=False
-        )
-    else:
+def dialect_insert(table):
+    """Return an insert into `table` supporting ``on_conflict_do_update``."""
+    if db.dialect == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
 
-        # Create the window
-        print(
-            "[ACCOUNTING] Create new window "
-            + str(window_start)
-            + " --> "
-            + str(window_stop)
-            + ", project "
-            + project
-            + ", user "
-            + user
-            + ", queue"
-            + queue_name
-            + ", type "
-            + "type with conso = "
-            + str(consumption)
-            + " s"
-        )
 
-        Accounting.create(
-            user=user,
-            consumption_type=c_type,
-            queue_name=queue_name,
-            window_start=window_start,
-            window_stop=window_stop,
-            consumption=consumption,
-            project=project,
-        )
+def add_accounting_rows(consumptions):
+    """
+    Add `consumptions` (see :func:`accounting_consumptions`) to the accounting
+    rows, inserted or updated by a single upsert.
+    """
+    if not consumptions:
+        return
+    rows = [
+        {
+            "window_start": window_start,
+            "window_stop": window_stop,
+            "accounting_user": user,
+            "accounting_project": project,
+            "queue_name": queue_name,
+            "consumption_type": c_type,
+            "consumption": consumption,
+        }
+        for (
+            window_start,
+            window_stop,
+            user,
+            project,
+            queue_name,
+            c_type,
+        ), consumption in consumptions.items()
+    ]
+
+    insert = dialect_insert(Accounting.__table__)
+    db.session.execute(
+        insert.on_conflict_do_update(
+            index_elements=list(Accounting.__table__.primary_key),
+            set_={
+                "consumption": Accounting.__table__.c.consumption
+                + insert.excluded.consumption
+            },
+        ),
+        rows,
+    )
+
+    add_accounting_rollups(consumptions)
+    if config["SCHEDULER_FAIRSHARING_INCREMENTAL"] == "yes":
+        update_karma_sums(consumptions)
+    else:
+        discard_karma_sums()
 
 
 def check_accounting_update(window_size):
     """Check jobs that are not treated in accounting table
-    params : base, window size"""
+    params : base, window size
+
+    The consumptions of all these jobs are summed by accounting row before
+    being added, then the jobs are marked as accounted.
+    """
 
     result = (
         db.query(
@@ -228,6 +258,8 @@ def check_accounting_update(window_size):
         .all()
     )
 
+    consumptions = defaultdict(int)
+    job_ids = []
     for job_accounting_info in result:
         (
             start_time,
@@ -240,8 +272,9 @@ def check_accounting_update(window_size):
             project,
         ) = job_accounting_info
         max_stop_time = start_time + walltime
-        print("[ACCOUNTING] Treate job " + str(job_id))
-        update_accounting(
+        job_ids.append(job_id)
+        accounting_consumptions(
+            consumptions,
             start_time,
             stop_time,
             window_size,
@@ -251,7 +284,8 @@ def check_accounting_update(window_size):
             "USED",
             nb_resources,
         )
-        update_accounting(
+        accounting_consumptions(
+            consumptions,
             start_time,
             max_stop_time,
             window_size,
@@ -262,7 +296,11 @@ def check_accounting_update(window_size):
             nb_resources,
         )
 
-        db.query(Job).update({Job.accounted: "YES"}, synchronize_session=False)
+    add_accounting_rows(consumptions)
+    if job_ids:
+        db.query(Job).filter(Job.id.in_(tuple(job_ids))).update(
+            {Job.accounted: "YES"}, synchronize_session=False
+        )
 
     db.commit()
 
@@ -270,6 +308,8 @@ def check_accounting_update(window_size):
 def delete_all_from_accounting():
     """Empty the table accounting and update the jobs table."""
     db.query(Accounting).delete(synchronize_session=False)
+    db.query(AccountingRollup).delete(synchronize_session=False)
+    discard_karma_sums()
     db.query(Job).update({Job.accounted: "NO"}, synchronize_session=False)
     db.commit()
 
@@ -279,9 +319,498 @@ def delete_accounting_windows_before(window_stop):
     db.query(Accounting).filter(Accounting.window_stop <= window_stop).delete(
         synchronize_session=False
     )
+    rebuild_accounting_rollups(window_stop)
+    discard_karma_sums()
     db.commit()
 
 
+# Accounting rollups
+#
+# The consumptions of the accounting windows are also summed by UTC day and
+# by UTC month of their window_start in accounting_rollups, when they are
+# added by add_accounting_rows. Reports (see get_accounting_summary) read the
+# rollups of the whole days and months of the asked period and the accounting
+# table only for the partial days at its edges.
+
+ACCOUNTING_ROLLUP_PERIODS = ("day", "month")
+DAY = 86400
+
+
+def month_start(time):
+    """Return the start of the UTC month of `time`."""
+    date = datetime.datetime.fromtimestamp(time, datetime.timezone.utc)
+    return calendar.timegm((date.year, date.month, 1, 0, 0, 0))
+
+
+def next_month_start(time):
+    """Return the start of the UTC month following the one of `time`."""
+    date = datetime.datetime.fromtimestamp(time, datetime.timezone.utc)
+    if date.month == 12:
+        return calendar.timegm((date.year + 1, 1, 1, 0, 0, 0))
+    return calendar.timegm((date.year, date.month + 1, 1, 0, 0, 0))
+
+
+def period_start(period, time):
+    """Return the start of the `period` ("day" or "month") of `time`."""
+    if period == "day":
+        return time - time % DAY
+    return month_start(time)
+
+
+def next_period_start(period, time):
+    """Return the start of the `period` ("day" or "month") following the one of `time`."""
+    if period == "day":
+        return period_start(period, time) + DAY
+    return next_month_start(time)
+
+
+def add_accounting_rollups(consumptions, periods=ACCOUNTING_ROLLUP_PERIODS):
+    """
+    Add `consumptions` (see :func:`accounting_consumptions`) to the rollups
+    of `periods`.
+    """
+    rollups = {}
+    for (
+        window_start,
+        window_stop,
+        user,
+        project,
+        queue_name,
+        c_type,
+    ), consumption in consumptions.items():
+        for period in periods:
+            key = (
+                period,
+                period_start(period, window_start),
+                user,
+                project,
+                queue_name,
+                c_type,
+            )
+            rollup = rollups.get(key)
+            if rollup is None:
+                rollups[key] = [consumption, window_start, window_stop]
+            else:
+                rollup[0] += consumption
+                rollup[1] = min(rollup[1], window_start)
+                rollup[2] = max(rollup[2], window_stop)
+    if not rollups:
+        return
+
+    table = AccountingRollup.__table__
+    insert = dialect_insert(table)
+    if db.dialect == "sqlite":
+        least, greatest = func.min, func.max
+    else:
+        least, greatest = func.least, func.greatest
+    db.session.execute(
+        insert.on_conflict_do_update(
+            index_elements=list(table.primary_key),
+            set_={
+                "consumption": table.c.consumption + insert.excluded.consumption,
+                "first_window_start": least(
+                    table.c.first_window_start, insert.excluded.first_window_start
+                ),
+                "last_window_stop": greatest(
+                    table.c.last_window_stop, insert.excluded.last_window_stop
+                ),
+            },
+        ),
+        [
+            {
+                "period": period,
+                "period_start": start,
+                "accounting_user": user,
+                "accounting_project": project,
+                "queue_name": queue_name,
+                "consumption_type": c_type,
+                "consumption": consumption,
+                "first_window_start": first_window_start,
+                "last_window_stop": last_window_stop,
+            }
+            for (period, start, user, project, queue_name, c_type), (
+                consumption,
+                first_window_start,
+                last_window_stop,
+            ) in rollups.items()
+        ],
+    )
+
+
+def rebuild_accounting_rollups(window_stop=None):
+    """
+    Compute the rollups again from the accounting table, only those of the
+    periods beginning at or before `window_stop` if it is given (after
+    :func:`delete_accounting_windows_before`).
+    """
+    for period in ACCOUNTING_ROLLUP_PERIODS:
+        rollups = db.query(AccountingRollup).filter(AccountingRollup.period == period)
+        windows = db.query(
+            Accounting.window_start,
+            Accounting.window_stop,
+            Accounting.user,
+            Accounting.project,
+            Accounting.queue_name,
+            Accounting.consumption_type,
+            Accounting.consumption,
+        )
+        if window_stop is not None:
+            rollups = rollups.filter(AccountingRollup.period_start <= window_stop)
+            windows = windows.filter(
+                Accounting.window_start < next_period_start(period, window_stop)
+            )
+        rollups.delete(synchronize_session=False)
+
+        consumptions = defaultdict(int)
+        for window in windows.yield_per(10000):
+            consumptions[window[:-1]] += window[-1]
+        add_accounting_rollups(consumptions, (period,))
+
+
+def accounting_ranges(start_time, stop_time):
+    """
+    Split the window starts from `start_time` to `stop_time` (excluded) in
+    ranges ``(period, start, stop)`` of whole months or days of the rollups,
+    and of the accounting table (`period` is None) for the remaining parts.
+    """
+    first_day = -(-start_time // DAY) * DAY
+    last_day = stop_time - stop_time % DAY
+    if first_day >= last_day:
+        ranges = [(None, start_time, stop_time)]
+    else:
+        first_month = month_start(first_day)
+        if first_month < first_day:
+            first_month = next_month_start(first_day)
+        last_month = month_start(last_day)
+        ranges = [(None, start_time, first_day)]
+        if first_month >= last_month:
+            ranges.append(("day", first_day, last_day))
+        else:
+            ranges += [
+                ("day", first_day, first_month),
+                ("month", first_month, last_month),
+                ("day", last_month, last_day),
+            ]
+        ranges.append((None, last_day, stop_time))
+    return [(period, start, stop) for (period, start, stop) in ranges if start < stop]
+
+
+def sum_accounting_windows(keys, start_time, stop_time, user=""):
+    """
+    Return the consumptions of the accounting windows ending after
+    `start_time` and beginning before `stop_time`, of `user` if given, as a
+    dict by the values of the `keys` attributes (among user, project,
+    queue_name and consumption_type) of ``[consumption, first window start,
+    last window stop]``.
+    """
+    sums = {}
+
+    def add_sums(model, first_window_start, last_window_stop, *criterions):
+        query = db.query(
+            *[getattr(model, key) for key in keys],
+            func.sum(model.consumption),
+            func.min(first_window_start),
+            func.max(last_window_stop),
+        ).filter(*criterions)
+        if user:
+            query = query.filter(model.user == user)
+        for row in query.group_by(*[getattr(model, key) for key in keys]):
+            key = tuple(row[:-3])
+            consumption, first, last = row[-3:]
+            if key in sums:
+                key_sums = sums[key]
+                key_sums[0] += int(consumption)
+                key_sums[1] = min(key_sums[1], first)
+                key_sums[2] = max(key_sums[2], last)
+            else:
+                sums[key] = [int(consumption), first, last]
+
+    # windows beginning before start_time
+    add_sums(
+        Accounting,
+        Accounting.window_start,
+        Accounting.window_stop,
+        Accounting.window_start <= start_time,
+        Accounting.window_stop > start_time,
+    )
+    for (period, start, stop) in accounting_ranges(start_time + 1, stop_time):
+        if period is None:
+            add_sums(
+                Accounting,
+                Accounting.window_start,
+                Accounting.window_stop,
+                Accounting.window_start >= start,
+                Accounting.window_start < stop,
+            )
+        else:
+            add_sums(
+                AccountingRollup,
+                AccountingRollup.first_window_start,
+                AccountingRollup.last_window_stop,
+                AccountingRollup.period == period,
+                AccountingRollup.period_start >= start,
+                AccountingRollup.period_start < stop,
+            )
+    return sums
+
+
+# Karma sums
+#
+# Fairsharing (see oar.kao.karma) uses the consumptions of the accounting
+# windows of the last SCHEDULER_FAIRSHARING_WINDOW_SIZE seconds, by queue, by
+# project and by user. Instead of summing them over the accounting table on
+# each scheduling round, they can be kept by queue in accounting_karma: the
+# windows of accounting_karma_windows (those beginning at or after its
+# window_start and ending before its window_stop) are summed. On each round,
+# the windows which left or entered the fairsharing window are subtracted or
+# added, and the rows added to the accounting by add_accounting_rows are added
+# to the sums of their queue if their window is summed.
+
+
+def sum_accounting_by_key(queues, *criterions):
+    """
+    Return the consumptions of the accounting rows of `queues` matching
+    `criterions`, summed by queue, project, user and type.
+    """
+    return (
+        db.query(
+            Accounting.queue_name,
+            Accounting.project,
+            Accounting.user,
+            Accounting.consumption_type,
+            func.sum(Accounting.consumption),
+        )
+        .filter(Accounting.queue_name.in_(tuple(queues)))
+        .filter(*criterions)
+        .group_by(
+            Accounting.queue_name,
+            Accounting.project,
+            Accounting.user,
+            Accounting.consumption_type,
+        )
+        .all()
+    )
+
+
+def karma_sums_deltas(sums, deltas, sign=1):
+    """
+    Add (or subtract when `sign` is -1) consumptions of `sums` (see
+    :func:`sum_accounting_by_key`) to `deltas`, a dict by (queue, kind, key,
+    type) of the rows of accounting_karma.
+    """
+    for (queue_name, project, user, c_type, consumption) in sums:
+        consumption = sign * int(consumption)
+        deltas[(queue_name, "queue", "", c_type)] += consumption
+        deltas[(queue_name, "project", project, c_type)] += consumption
+        deltas[(queue_name, "user", user, c_type)] += consumption
+    return deltas
+
+
+def add_karma_sums(deltas):
+    """Add `deltas` (see :func:`karma_sums_deltas`) to accounting_karma."""
+    for (queue_name, kind, key, c_type), consumption in deltas.items():
+        if consumption == 0:
+            continue
+        nb_updated = (
+            db.query(AccountingKarma)
+            .filter(AccountingKarma.queue_name == queue_name)
+            .filter(AccountingKarma.karma_kind == kind)
+            .filter(AccountingKarma.karma_key == key)
+            .filter(AccountingKarma.consumption_type == c_type)
+            .update(
+                {
+                    AccountingKarma.consumption: AccountingKarma.consumption
+                    + consumption
+                },
+                synchronize_session=False,
+            )
+        )
+        if nb_updated == 0:
+            db.session.execute(
+                AccountingKarma.__table__.insert(),
+                {
+                    "queue_name": queue_name,
+                    "karma_kind": kind,
+                    "karma_key": key,
+                    "consumption_type": c_type,
+                    "consumption": consumption,
+                },
+            )
+    # forget users and projects without consumption left in the window
+    db.query(AccountingKarma).filter(AccountingKarma.consumption == 0).delete(
+        synchronize_session=False
+    )
+
+
+def update_karma_sums(consumptions):
+    """
+    Add `consumptions` (see :func:`accounting_consumptions`), added to the
+    accounting rows, to the karma sums of their queue if their window is
+    summed.
+    """
+    karma_windows = {
+        kw.queue_name: kw
+        for kw in db.query(AccountingKarmaWindow)
+        .filter(
+            AccountingKarmaWindow.queue_name.in_(
+                tuple({key[4] for key in consumptions})
+            )
+        )
+        .with_for_update()
+    }
+    if not karma_windows:
+        return
+    sums = []
+    for (
+        window_start,
+        window_stop,
+        user,
+        project,
+        queue_name,
+        c_type,
+    ), consumption in consumptions.items():
+        karma_window = karma_windows.get(queue_name)
+        if (
+            karma_window
+            and (window_start >= karma_window.window_start)
+            and (window_stop < karma_window.window_stop)
+        ):
+            sums.append((queue_name, project, user, c_type, consumption))
+    add_karma_sums(karma_sums_deltas(sums, defaultdict(int)))
+
+
+def delete_karma_sums():
+    """Forget karma sums, they are computed again on next use."""
+    db.query(AccountingKarma).delete(synchronize_session=False)
+    db.query(AccountingKarmaWindow).delete(synchronize_session=False)
+
+
+def discard_karma_sums():
+    """
+    Forget karma sums if there are any. They are not updated while
+    ``SCHEDULER_FAIRSHARING_INCREMENTAL`` is "no", the sums of a previous
+    "yes" period must not be used when it is set back to "yes".
+    """
+    if db.query(AccountingKarmaWindow.queue_name).first() is not None:
+        delete_karma_sums()
+
+
+def get_karma_sums(queues, window_start, window_stop):
+    """
+    Return the consumptions of the accounting windows of `queues` between
+    `window_start` and `window_stop` as ``(sum_window, sum_by_project,
+    sum_by_user)``, the results of :func:`oar.kao.karma.get_sum_accounting_window`,
+    :func:`oar.kao.karma.get_sum_accounting_by_project` and
+    :func:`oar.kao.karma.get_sum_accounting_by_user`, from the karma sums
+    kept in accounting_karma, which are updated first. Rows of
+    accounting_karma_windows stay locked until the caller commits.
+    """
+    karma_windows = {
+        kw.queue_name: kw
+        for kw in db.query(AccountingKarmaWindow)
+        .filter(AccountingKarmaWindow.queue_name.in_(tuple(queues)))
+        .with_for_update()
+    }
+
+    deltas = defaultdict(int)
+    # queues with summed windows to update, by these windows
+    queues_to_slide = defaultdict(list)
+    queues_to_sum = []
+    for queue_name in queues:
+        karma_window = karma_windows.get(queue_name)
+        if karma_window is None:
+            db.add(
+                AccountingKarmaWindow(
+                    queue_name=queue_name,
+                    window_start=window_start,
+                    window_stop=window_stop,
+                )
+            )
+            queues_to_sum.append(queue_name)
+        elif (window_start < karma_window.window_start) or (
+            window_stop < karma_window.window_stop
+        ):
+            # back in time or larger window, sum everything again
+            db.query(AccountingKarma).filter(
+                AccountingKarma.queue_name == queue_name
+            ).delete(synchronize_session=False)
+            queues_to_sum.append(queue_name)
+        else:
+            queues_to_slide[
+                (karma_window.window_start, karma_window.window_stop)
+            ].append(queue_name)
+        if karma_window is not None:
+            karma_window.window_start = window_start
+            karma_window.window_stop = window_stop
+
+    if queues_to_sum:
+        sums = sum_accounting_by_key(
+            queues_to_sum,
+            Accounting.window_start >= window_start,
+            Accounting.window_stop < window_stop,
+        )
+        karma_sums_deltas(sums, deltas)
+
+    for (prev_window_start, prev_window_stop), queues_slid in queues_to_slide.items():
+        # windows leaving
+        if window_start > prev_window_start:
+            sums = sum_accounting_by_key(
+                queues_slid,
+                Accounting.window_start >= prev_window_start,
+                Accounting.window_start < window_start,
+                Accounting.window_stop < prev_window_stop,
+            )
+            karma_sums_deltas(sums, deltas, -1)
+        # windows entering
+        if window_stop > prev_window_stop:
+            sums = sum_accounting_by_key(
+                queues_slid,
+                Accounting.window_start >= window_start,
+                Accounting.window_stop >= prev_window_stop,
+                Accounting.window_stop < window_stop,
+            )
+            karma_sums_deltas(sums, deltas)
+
+    add_karma_sums(deltas)
+
+    sum_window = {}
+    sum_by_project = ({}, {})
+    sum_by_user = ({}, {})
+    for karma_sum in db.query(AccountingKarma).filter(
+        AccountingKarma.queue_name.in_(tuple(queues))
+    ):
+        consumption = float(karma_sum.consumption)
+        c_type = karma_sum.consumption_type
+        if c_type not in ("ASKED", "USED"):
+            continue
+        if karma_sum.karma_kind == "queue":
+            by_key = sum_window
+            key = c_type
+        else:
+            if karma_sum.karma_kind == "project":
+                by_key = sum_by_project[c_type == "USED"]
+            else:
+                by_key = sum_by_user[c_type == "USED"]
+            key = karma_sum.karma_key
+        by_key[key] = by_key.get(key, 0.0) + consumption
+
+    # windows of users also include the one ending at window_stop
+    for (_, _, user, c_type, consumption) in sum_accounting_by_key(
+        queues,
+        Accounting.window_start >= window_start,
+        Accounting.window_stop == window_stop,
+    ):
+        if c_type in ("ASKED", "USED"):
+            by_user = sum_by_user[c_type == "USED"]
+            by_user[user] = by_user.get(user, 0.0) + float(consumption)
+
+    return (
+        (sum_window.get("ASKED", 1), sum_window.get("USED", 1)),
+        sum_by_project,
+        sum_by_user,
+    )
+
+
 def get_last_project_karma(user, project, date):
     """Get the last project Karma of user at a given date
     params: user, project, date"""
@@ -68,10 +68,39 @@ class Configuration(dict):
         "METASCHEDULER_MODE": "internal",
         # Tell the metascheduler that it runs into an oar2 installation.
         "METASCHEDULER_OAR3_WITH_OAR2": "no",
+        # Run kao as a server triggered by Almighty instead of a command per round.
+        "METASCHEDULER_DAEMON": "no",
+        "METASCHEDULER_SERVER": "localhost",
+        "METASCHEDULER_PORT": 6673,
+        # Max waiting time (in seconds) for the answer of the server to a round
+        "METASCHEDULER_TIMEOUT": 300,
         "HIERARCHY_LABELS": "resource_id,network_address",
         "SCHEDULER_RESOURCE_ORDER": "resource_id ASC",
         "SCHEDULER_JOB_SECURITY_TIME": "60",  # TODO should be int
         "SCHEDULER_AVAILABLE_SUSPENDED_RESOURCE_TYPE": "default",
+        # Keep the gantt in memory between rounds (only useful with METASCHEDULER_DAEMON)
+        "SCHEDULER_INCREMENTAL_GANTT": "no",
+        # Slot set implementation: "dict" or "array"
+        "SCHEDULER_SLOT_SET": "dict",
+        # Share ResourceSet snapshots until resources change
+        "RESOURCE_SET_CACHE": "no",
+        # Evaluation of resource constraints: "sql" or "memory" (simple ones)
+        "SCHEDULER_CONSTRAINTS_EVALUATION": "sql",
+        # Saving of scheduling results: "default" (ORM) or "bulk" (COPY/executemany)
+        "SCHEDULER_SAVE_ASSIGNS": "default",
+        # Gantt resources storage: "rows" or "intervals" (ranges of resource ids)
+        "SCHEDULER_GANTT_RESOURCES": "rows",
+        # Prometheus text file of the phases of the last scheduling cycle
+        "SCHEDULER_METRICS_FILE": "",
+        # Time (seconds) to place waiting jobs in a scheduling round, 0: no limit
+        "SCHEDULER_PLACEMENT_TIME_BUDGET": 0,
+        # Jobs are not placed beyond this duration (seconds) in the gantt, 0: no limit
+        "SCHEDULER_GANTT_HORIZON": 0,
+        # Backfilling: "conservative" (every job gets a reservation) or "easy"
+        "SCHEDULER_BACKFILLING": "conservative",
+        # Number of jobs getting a reservation with EASY backfilling
+        "SCHEDULER_RESERVATION_DEPTH": 1,
+        "SCHEDULER_GANTT_HOLE_MINIMUM_TIME": 300,
         "FAIRSHARING_ENABLED": "no",
         "SCHEDULER_FAIRSHARING_MAX_JOB_PER_USER": "30",
         "RESERVATION_WAITING_RESOURCES_TIMEOUT": "300",
@@ -94,6 +123,8 @@ class Configuration(dict):
         "SCHEDULER_FAIRSHARING_COEF_PROJECT": "0",
         "SCHEDULER_FAIRSHARING_COEF_USER": "1",
         "SCHEDULER_FAIRSHARING_COEF_USER_ASK": "1",
+        # Keep karma sums in accounting_karma, updated incrementally
+        "SCHEDULER_FAIRSHARING_INCREMENTAL": "no",
         "QUOTAS": "no",
         "QUOTAS_CONF_FILE": "/etc/oar/quotas_conf.json",
         "QUOTAS_PERIOD": 1296000,  # 15 days in seconds
@@ -0,0 +1,284 @@
+# coding: utf-8
+"""
+In memory evaluation of simple resource constraints.
+
+Jobs' properties are SQL expressions on the columns of the resources table.
+The simple ones, comparisons of a column with literals combined with AND, OR,
+NOT and parentheses (e.g. ``cluster='x' AND gpu IN ('YES', 'MAYBE')``), are
+compiled by :func:`compile_constraint` into a predicate on the rows of
+:class:`ResourceColumns`, a columnar copy of the resources table. Others raise
+:class:`NotSimpleConstraint` and are left to the database, as well as
+ordering comparisons of strings, which depend on the database collation.
+
+NULL values follow SQL three-valued logic: a comparison with NULL is unknown
+and only rows for which the whole expression is true match.
+"""
+import operator
+import re
+
+from procset import ProcSet
+
+from oar.lib import Resource, db
+
+TOKENS = re.compile(
+    r"\s*(?:"
+    r"(?P<string>'(?:[^']|'')*')"
+    r"|(?P<number>-?\d+(?:\.\d+)?)(?![\w.])"
+    r"|(?P<op><=|>=|<>|!=|=|<|>)"
+    r"|(?P<punct>[(),])"
+    r"|(?P<word>[A-Za-z_][A-Za-z0-9_]*)"
+    r")"
+)
+
+# operators whose result does not depend on the collation of the database,
+# the only ones evaluated in memory for strings
+EQUALITY_OPERATORS = ("=", "!=", "<>")
+
+OPERATORS = {
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<>": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+KEYWORDS = ("and", "or", "not", "in")
+
+
+class NotSimpleConstraint(Exception):
+    """The constraint must be evaluated by the database."""
+
+
+def tokenize(sql):
+    tokens = []
+    pos = 0
+    sql = sql.rstrip()
+    while pos < len(sql):
+        m = TOKENS.match(sql, pos)
+        if not m or m.end() == pos:
+            raise NotSimpleConstraint(sql)
+        kind = m.lastgroup
+        value = m.group(kind)
+        if kind == "string":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "word" and value.lower() in KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+        pos = m.end()
+    return tokens
+
+
+class ResourceColumns(object):
+    """
+    Columnar copy of the resources of a resource set: `roids` and, for each
+    column of the resources table, the list of values of these resources.
+    """
+
+    def __init__(self, roids, columns, types):
+        self.roids = roids
+        self.columns = columns
+        self.types = types
+
+    @classmethod
+    def from_db(cls, resource_set):
+        table = Resource.__table__
+        names = [c.name for c in table.columns]
+        columns = {name: [] for name in names}
+        roids = []
+        for row in db.query(table).all():
+            rid = row.resource_id
+            roid = resource_set.rid_i2o[rid]
+            # only resources of the set (rid_i2o defaults to 0)
+            if resource_set.rid_o2i[roid] != rid:
+                continue
+            roids.append(roid)
+            for name, value in zip(names, row):
+                columns[name].append(value)
+
+        types = {}
+        for c in table.columns:
+            try:
+                types[c.name] = c.type.python_type
+            except NotImplementedError:
+                pass
+        return cls(roids, columns, types)
+
+    def literal(self, column, value):
+        """Convert `value` to the type of `column` as the database would do."""
+        column_type = self.types.get(column)
+        if column_type is str and isinstance(value, str):
+            return value
+        if column_type in (int, float) and not isinstance(value, bool):
+            if column_type is int and isinstance(value, float):
+                # the database compares 2.5 to an integer column as a float
+                if not value.is_integer():
+                    raise NotSimpleConstraint(column)
+            try:
+                return column_type(value)
+            except ValueError:
+                pass
+        raise NotSimpleConstraint(column)
+
+    def select(self, predicate):
+        """Return the ProcSet of roids of rows for which `predicate` is true."""
+        roids = self.roids
+        return ProcSet(*[roids[i] for i in range(len(roids)) if predicate(i)])
+
+
+class ConstraintParser(object):
+    """Recursive descent parser compiling a constraint into a predicate."""
+
+    def __init__(self, tokens, resource_columns):
+        self.tokens = tokens
+        self.pos = 0
+        self.resource_columns = resource_columns
+
+    def peek(self):
+        if self.pos < len(self.tokens):
+            return self.tokens[self.pos]
+        return (None, None)
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, kind, value=None):
+        token_kind, token_value = self.next()
+        if token_kind != kind or (value is not None and token_value != value):
+            raise NotSimpleConstraint(token_value)
+        return token_value
+
+    def parse(self):
+        predicate = self.disjunction()
+        if self.pos != len(self.tokens):
+            raise NotSimpleConstraint(self.peek()[1])
+        return predicate
+
+    def disjunction(self):
+        predicates = [self.conjunction()]
+        while self.peek() == ("keyword", "or"):
+            self.next()
+            predicates.append(self.conjunction())
+        if len(predicates) == 1:
+            return predicates[0]
+
+        def disjunction(i):
+            result = False
+            for predicate in predicates:
+                value = predicate(i)
+                if value:
+                    return True
+                if value is None:
+                    result = None
+            return result
+
+        return disjunction
+
+    def conjunction(self):
+        predicates = [self.negation()]
+        while self.peek() == ("keyword", "and"):
+            self.next()
+            predicates.append(self.negation())
+        if len(predicates) == 1:
+            return predicates[0]
+
+        def conjunction(i):
+            result = True
+            for predicate in predicates:
+                value = predicate(i)
+                if value is False:
+                    return False
+                if value is None:
+                    result = None
+            return result
+
+        return conjunction
+
+    def negation(self):
+        if self.peek() == ("keyword", "not"):
+            self.next()
+            predicate = self.negation()
+
+            def negation(i):
+                value = predicate(i)
+                return None if value is None else not value
+
+            return negation
+
+        if self.peek() == ("punct", "("):
+            self.next()
+            predicate = self.disjunction()
+            self.expect("punct", ")")
+            return predicate
+
+        return self.comparison()
+
+    def comparison(self):
+        # unquoted identifiers are case insensitive
+        column = self.expect("word").lower()
+        if column not in self.resource_columns.columns:
+            raise NotSimpleConstraint(column)
+        values = self.resource_columns.columns[column]
+
+        negated = False
+        if self.peek() == ("keyword", "not"):
+            self.next()
+            negated = True
+            if self.peek() != ("keyword", "in"):
+                raise NotSimpleConstraint(column)
+
+        kind, op = self.next()
+        if kind == "keyword" and op == "in":
+            self.expect("punct", "(")
+            literals = [self.literal(column)]
+            while self.peek() == ("punct", ","):
+                self.next()
+                literals.append(self.literal(column))
+            self.expect("punct", ")")
+            literals = frozenset(literals)
+
+            def in_literals(i):
+                value = values[i]
+                if value is None:
+                    return None
+                return (value in literals) != negated
+
+            return in_literals
+
+        if kind != "op":
+            raise NotSimpleConstraint(op)
+        if (op not in EQUALITY_OPERATORS) and (
+            self.resource_columns.types.get(column) is str
+        ):
+            # strings are ordered by the collation of the database
+            raise NotSimpleConstraint(op)
+        compare = OPERATORS[op]
+        literal = self.literal(column)
+
+        def comparison(i):
+            value = values[i]
+            if value is None:
+                return None
+            return compare(value, literal)
+
+        return comparison
+
+    def literal(self, column):
+        kind, value = self.next()
+        if kind not in ("string", "number"):
+            raise NotSimpleConstraint(value)
+        return self.resource_columns.literal(column, value)
+
+
+def compile_constraint(sql_constraints, resource_columns):
+    """
+    Compile `sql_constraints` into a predicate on the row indexes of
+    `resource_columns`, raise :class:`NotSimpleConstraint` if it is not a
+    simple constraint.
+    """
+    return ConstraintParser(tokenize(sql_constraints), resource_columns).parse()
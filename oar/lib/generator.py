@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+Synthetic platforms and workloads, to measure the scheduler at scale.
+
+Platforms are made of clusters of switches of hosts of cpus of cores, one
+resource per core. Workloads are jobs submitted through the regular
+submission path, with moldable requests, dependencies, containers, running
+jobs and optionally a quotas file. Given the same parameters and seed, the
+same platform and workload are generated.
+"""
+import io
+import json
+import random
+import time
+from contextlib import redirect_stderr
+
+from sqlalchemy import inspect
+
+from oar.lib import (
+    AssignedResource,
+    Job,
+    MoldableJobDescription,
+    Queue,
+    Resource,
+    config,
+    db,
+    get_logger,
+)
+from oar.lib.job_handling import bulk_insert
+from oar.lib.resource_handling import resources_creation_bulk
+from oar.lib.submission import JobParameters, Submission
+
+logger = get_logger("oar.lib.generator")
+
+PLATFORM_PROPERTIES = (
+    ("cluster", db.String(255)),
+    ("switch", db.String(255)),
+    ("host", db.String(255)),
+    ("cpu", db.Integer),
+    ("core", db.Integer),
+    ("mem", db.Integer),
+)
+
+HIERARCHY_LABELS = "resource_id,network_address,cluster,switch,host,cpu,core"
+
+WALLTIMES = (600, 1800, 3600, 2 * 3600, 6 * 3600, 12 * 3600, 24 * 3600)
+
+MEMORIES = (64, 128, 192, 256, 512)
+
+
+def add_platform_properties():
+    """
+    Add the properties of generated platforms missing from the resources
+    table. It must be called before ``db.reflect()`` for the new properties to
+    be known by the Resource model.
+    """
+    columns = {c["name"] for c in inspect(db.engine).get_columns("resources")}
+    for name, type_ in PLATFORM_PROPERTIES:
+        if name not in columns:
+            db.op.add_column("resources", db.Column(name, type_, nullable=True))
+
+
+def generate_platform(
+    nb_clusters=1, nb_switches=2, nb_hosts=8, nb_cpus=2, nb_cores=8, seed=0
+):
+    """
+    Create `nb_clusters` clusters of `nb_switches` switches of `nb_hosts`
+    hosts of `nb_cpus` cpus of `nb_cores` cores. Hosts are named node1 to
+    nodeN and cpus, cores and switches are numbered across the whole
+    platform. The memory of hosts is drawn per cluster.
+
+    Properties missing from the Resource model (see
+    :func:`add_platform_properties`) are not filled. Return the number of
+    created resources.
+    """
+    rng = random.Random(seed)
+    hosts_per_cluster = nb_switches * nb_hosts
+    nb_resources_per_host = nb_cpus * nb_cores
+    memories = [rng.choice(MEMORIES) for _ in range(nb_clusters)]
+
+    properties = {
+        "cluster": lambda node, cpuset: f"cluster{node // hosts_per_cluster + 1}",
+        "switch": lambda node, cpuset: f"switch{node // nb_hosts + 1}",
+        "host": lambda node, cpuset: f"node{node + 1}",
+        "cpu": lambda node, cpuset: node * nb_cpus + cpuset // nb_cores + 1,
+        "core": lambda node, cpuset: node * nb_resources_per_host + cpuset + 1,
+        "mem": lambda node, cpuset: memories[node // hosts_per_cluster],
+    }
+    columns = Resource.__table__.columns
+    properties = {name: value for name, value in properties.items() if name in columns}
+
+    nb_nodes = nb_clusters * hosts_per_cluster
+    resources_creation_bulk("node", nb_nodes, nb_resources_per_host, properties)
+    logger.info(
+        "generated %s hosts, %s resources"
+        % (nb_nodes, nb_nodes * nb_resources_per_host)
+    )
+    return nb_nodes * nb_resources_per_host
+
+
+class RequestGenerator(object):
+    """
+    Draw resource requests on the platform, as oarsub would receive them,
+    using the hierarchy labels of ``HIERARCHY_LABELS``.
+    """
+
+    def __init__(self, rng):
+        self.rng = rng
+        labels = config["HIERARCHY_LABELS"].split(",")
+        self.switch = "switch" if "switch" in labels else None
+        self.node = "host" if "host" in labels else "network_address"
+        self.unit = "core" if "core" in labels else "resource_id"
+
+        self.nb_nodes = db.query(Resource.network_address).distinct().count()
+        nb_resources = db.query(Resource).count()
+        self.nb_units = max(1, nb_resources // max(1, self.nb_nodes))
+        if self.switch:
+            nb_switches = db.query(getattr(Resource, self.switch)).distinct().count()
+            self.nodes_per_switch = self.nb_nodes // max(1, nb_switches)
+
+    def walltime(self):
+        return self.rng.choice(WALLTIMES)
+
+    def nb_nodes_request(self):
+        """Mostly small jobs, some wide ones."""
+        return min(self.nb_nodes, int(self.rng.paretovariate(1.2)))
+
+    def request(self, nb_nodes, walltime):
+        if nb_nodes == 1 and self.rng.random() < 0.5:
+            units = self.rng.randint(1, self.nb_units)
+            resources = f"/{self.node}=1/{self.unit}={units}"
+        elif (
+            self.switch
+            and nb_nodes <= self.nodes_per_switch
+            and self.rng.random() < 0.3
+        ):
+            resources = f"/{self.switch}=1/{self.node}={nb_nodes}"
+        else:
+            resources = f"/{self.node}={nb_nodes}"
+        return f"{resources},walltime=0:0:{walltime}"
+
+    def nodes_request(self, nb_nodes):
+        return f"/{self.node}={nb_nodes},walltime=0:0:{self.walltime()}"
+
+    def moldable_requests(self, moldable=False, small=False):
+        nb_nodes = 1 if small else self.nb_nodes_request()
+        walltime = self.walltime()
+        requests = [self.request(nb_nodes, walltime)]
+        if moldable and nb_nodes * 2 <= self.nb_nodes:
+            # Twice the nodes for half the time
+            requests.append(self.request(nb_nodes * 2, max(60, walltime // 2)))
+        return requests
+
+
+def submit_job(resource, user, project, queue, types=None, dependencies=None):
+    job_parameters = JobParameters(
+        job_type="PASSIVE",
+        resource=resource,
+        name="generated",
+        project=project,
+        command="sleep 1",
+        info_type="",
+        queue=queue,
+        properties="",
+        checkpoint=0,
+        signal=12,
+        notify="",
+        types=types if types else [],
+        directory="/tmp",
+        dependencies=dependencies,
+        stdout=None,
+        stderr=None,
+        hold=None,
+        initial_request="oarsub -l %s 'sleep 1'" % " -l ".join(resource),
+        user=user,
+    )
+    error = job_parameters.check_parameters()
+    if error[0] == 0:
+        # Silence the estimations printed for oarsub
+        with redirect_stderr(io.StringIO()):
+            error, job_ids = Submission(job_parameters).submit()
+    if error[0] != 0:
+        raise RuntimeError("job generation failed: %s" % str(error))
+    return job_ids[0]
+
+
+def hosts_resources():
+    """Return the lists of resource ids of hosts, ordered by host."""
+    hosts = {}
+    for network_address, r_id in (
+        db.query(Resource.network_address, Resource.id)
+        .order_by(Resource.network_address, Resource.id)
+        .all()
+    ):
+        hosts.setdefault(network_address, []).append(r_id)
+    return [hosts[network_address] for network_address in sorted(hosts)]
+
+
+def start_jobs(jobs, start_time, rng):
+    """
+    Mark `jobs`, pairs of job id and resource ids, as Running on their
+    resources since some time before `start_time`.
+    """
+    assigned_resources = []
+    for job_id, resource_ids in jobs:
+        moldable_id, walltime = (
+            db.query(MoldableJobDescription.id, MoldableJobDescription.walltime)
+            .filter(MoldableJobDescription.job_id == job_id)
+            .first()
+        )
+        db.query(Job).filter(Job.id == job_id).update(
+            {
+                Job.state: "Running",
+                Job.start_time: start_time - rng.randint(0, walltime // 2),
+                Job.assigned_moldable_job: moldable_id,
+            },
+            synchronize_session=False,
+        )
+        assigned_resources.extend((moldable_id, r_id) for r_id in resource_ids)
+
+    bulk_insert(
+        AssignedResource.__tablename__,
+        ("moldable_job_id", "resource_id"),
+        assigned_resources,
+    )
+    db.commit()
+
+
+def generate_workload(
+    nb_waiting=100,
+    nb_running=0,
+    nb_users=10,
+    nb_projects=3,
+    moldable_ratio=0.2,
+    dependency_ratio=0.1,
+    nb_containers=0,
+    inner_ratio=0.2,
+    queue="default",
+    start_time=None,
+    seed=0,
+):
+    """
+    Submit `nb_waiting` waiting jobs and up to `nb_running` running jobs, on
+    whole hosts and started before `start_time` (now by default), by
+    `nb_users` users over `nb_projects` projects.
+
+    A `moldable_ratio` part of jobs has two moldable descriptions, a
+    `dependency_ratio` part depends on a previous job and, when
+    `nb_containers` container jobs are submitted, an `inner_ratio` part of
+    jobs runs inside them. The queue is created if it does not exist. Return
+    the ids of waiting jobs and of running jobs.
+    """
+    rng = random.Random(seed)
+    if start_time is None:
+        start_time = int(time.time())
+    if not db.query(Queue).filter(Queue.name == queue).count():
+        db.add(Queue(name=queue, priority=3, scheduler_policy="kamelot"))
+        db.commit()
+
+    requests = RequestGenerator(rng)
+
+    def submit(types=None, dependencies=None, moldable=False, resource=None):
+        if resource is None:
+            # Inner jobs have to fit in their container
+            small = bool(types) and types[0].startswith("inner=")
+            resource = requests.moldable_requests(moldable, small)
+        return submit_job(
+            resource,
+            f"user{rng.randrange(nb_users) + 1}",
+            f"project{rng.randrange(nb_projects) + 1}",
+            queue,
+            types,
+            dependencies,
+        )
+
+    free_hosts = hosts_resources()
+    running = []
+    for _ in range(nb_running):
+        nb_hosts = rng.randint(1, 2)
+        if nb_hosts > len(free_hosts):
+            break
+        job_id = submit(resource=[requests.nodes_request(nb_hosts)])
+        running.append((job_id, sum(free_hosts[:nb_hosts], [])))
+        del free_hosts[:nb_hosts]
+    start_jobs(running, start_time, rng)
+
+    containers = [submit(types=["container"]) for _ in range(nb_containers)]
+    waiting = list(containers)
+    while len(waiting) < nb_waiting:
+        types = None
+        dependencies = None
+        if containers and rng.random() < inner_ratio:
+            types = [f"inner={rng.choice(containers)}"]
+        elif waiting and rng.random() < dependency_ratio:
+            dependencies = [rng.choice(waiting)]
+        waiting.append(
+            submit(types, dependencies, moldable=rng.random() < moldable_ratio)
+        )
+
+    logger.info(
+        "generated %s waiting jobs, %s running jobs" % (len(waiting), len(running))
+    )
+    return waiting, [job_id for job_id, _ in running]
+
+
+def generate_quotas(filename, nb_resources, nb_projects=3):
+    """
+    Write in `filename` quotas rules limiting each user to a quarter of the
+    `nb_resources` resources and each project to half of them.
+    """
+    quotas = {"*,*,*,/": [max(1, nb_resources // 4), -1, -1]}
+    for project in range(nb_projects):
+        quotas[f"*,project{project + 1},*,*"] = [max(1, nb_resources // 2), -1, -1]
+    with open(filename, "w") as quotas_file:
+        json.dump({"quotas": quotas}, quotas_file, indent=4)
@@ -6,9 +6,107 @@ In oar, resources are organized as a `nested sets`_.
 .. _nested sets: https://en.wikipedia.org/wiki/Nested_set_model
 """
 
+from collections import Counter
+
 from procset import ProcSet
 
 
+class HierarchyLevel(list):
+    """
+    List of the blocks (:class:`ProcSet`) of a hierarchy level, with a
+    resource to block index used by :func:`find_resource_hierarchies_scattered`.
+
+    The index is built on first use, a level must not be modified afterwards.
+    ``block_of[roid]`` is the position of the block containing ``roid`` (-1 if
+    none). It is None when blocks of the level overlap, the index cannot be
+    used in this case. Trees with the other levels (see :class:`HierarchyTree`)
+    are kept with the level, as levels of :class:`Hierarchy` built for a
+    :class:`oar.lib.resource.ResourceSet`, they are shared by all the jobs of
+    a scheduling round.
+    """
+
+    def __init__(self, blocks=()):
+        super().__init__(blocks)
+        self.indexed = False
+        self.block_of = None
+        self.intervals = None
+        self.sizes = None
+        # id(sub_level) -> (sub_level, HierarchyTree)
+        self.trees = {}
+
+    def build_index(self):
+        self.indexed = True
+        self.intervals = [tuple(block.intervals()) for block in self]
+        self.sizes = [len(block) for block in self]
+
+        nb_roids = max((block.max + 1 for block in self if block), default=0)
+        block_of = [-1] * nb_roids
+        for k, itvs in enumerate(self.intervals):
+            for (a, b) in itvs:
+                if block_of[a : b + 1].count(-1) != b - a + 1:
+                    # overlapping blocks
+                    return
+                block_of[a : b + 1] = [k] * (b - a + 1)
+        self.block_of = block_of
+
+    def tree(self, sub_level):
+        """
+        Return the :class:`HierarchyTree` between this level and `sub_level`,
+        it is computed on first call and kept with the level.
+        """
+        key = id(sub_level)
+        if key not in self.trees:
+            # keep sub_level, so its id cannot be reused
+            self.trees[key] = (sub_level, HierarchyTree(self, sub_level))
+        return self.trees[key][1]
+
+
+class HierarchyTree(object):
+    """
+    Parent to children relation between the blocks of two indexed levels,
+    `sub_level` blocks must not overlap.
+
+    For the block at position k in `level`:
+
+    - ``children[k]`` are the positions of the blocks of `sub_level` included
+      in it,
+    - ``parts[k]`` are the (part, intervals, size) of the blocks of
+      `sub_level` intersecting it, part being the sub-block itself when it is
+      included in the block, their intersection otherwise.
+
+    Both lists follow the `sub_level` order.
+    """
+
+    def __init__(self, level, sub_level):
+        if not level.indexed:
+            level.build_index()
+        if not sub_level.indexed:
+            sub_level.build_index()
+
+        block_of = sub_level.block_of
+        self.children = []
+        self.parts = []
+        for k, block in enumerate(level):
+            # number of resources of each sub-block in block k
+            nb_in_block = Counter()
+            for (a, b) in level.intervals[k]:
+                nb_in_block.update(block_of[a : b + 1])
+            nb_in_block.pop(-1, None)
+
+            children = []
+            parts = []
+            for j in sorted(nb_in_block):
+                nb = nb_in_block[j]
+                if nb == sub_level.sizes[j]:
+                    children.append(j)
+                    parts.append((sub_level[j], sub_level.intervals[j], nb))
+                else:
+                    part = block & sub_level[j]
+                    parts.append((part, tuple(part.intervals()), nb))
+            self.children.append(children)
+            self.parts.append(parts)
+
+
 class Hierarchy(object):
     # TODO extract hierarchy from ressources table
 
@@ -20,10 +118,14 @@ class Hierarchy(object):
         if hy_rid:
             self.hy = {}
             for hy_label, hy_level_roids in hy_rid.items():
-                self.hy[hy_label] = [ProcSet(*ids) for k, ids in hy_level_roids.items()]
+                self.hy[hy_label] = HierarchyLevel(
+                    ProcSet(*ids) for k, ids in hy_level_roids.items()
+                )
         else:
             if hy:
-                self.hy = hy
+                self.hy = {
+                    hy_label: HierarchyLevel(level) for hy_label, level in hy.items()
+                }
             else:
                 raise Exception("Hierarchy description must be provided")
 
@@ -141,6 +243,13 @@ def find_resource_hierarchies_scattered(itvs, hy, rqts):
     """
 
     l_hy = len(hy)
+    if all(isinstance(level, HierarchyLevel) for level in hy):
+        for level in hy:
+            if not level.indexed:
+                level.build_index()
+        if all(level.block_of is not None for level in hy):
+            return find_resource_hierarchies_indexed(itvs, hy, rqts)
+
     #    print "find itvs: ", itvs, rqts[0]
     if l_hy == 1:
         return extract_n_scattered_block_itv(itvs, hy[0], rqts[0])
@@ -226,6 +335,105 @@ def find_resource_n_h(itvs, hy, rqts, top, h, h_bottom):
                 return ProcSet()
 
 
+def free_map(itvs, nb_roids):
+    """Return a bytearray where ``free[roid]`` is 1 if `roid` is in `itvs`."""
+    free = bytearray(nb_roids)
+    for itv in itvs.intervals():
+        if itv.inf >= nb_roids:
+            break
+        sup = min(itv.sup, nb_roids - 1)
+        free[itv.inf : sup + 1] = b"\x01" * (sup - itv.inf + 1)
+    return free
+
+
+def nb_free(free, intervals):
+    """Return the number of free resources in `intervals`."""
+    return sum(free.count(1, a, b + 1) for (a, b) in intervals)
+
+
+def find_resource_hierarchies_indexed(itvs, hy, rqts):
+    """
+    Same as :func:`find_resource_hierarchies_scattered` for indexed levels
+    (see :class:`HierarchyLevel`) whose blocks do not overlap.
+
+    Blocks are handled by their position in their level. Instead of
+    intersecting :class:`ProcSet`, the free resources of `itvs` are stored in
+    a byte map, used to count the free resources of each block, and the
+    sub-blocks of a block are given by the :class:`HierarchyTree` between its
+    level and the level below.
+    """
+    nb_roids = max(len(level.block_of) for level in hy)
+    free = free_map(itvs, nb_roids)
+    top = range(len(hy[0]))
+
+    if len(hy) == 1:
+        blocks = extract_n_free_blocks(free, hy[0], top, rqts[0])
+    else:
+        blocks = find_blocks_n_h(free, hy, rqts, top, 0, len(hy))
+
+    return ProcSet(*blocks)
+
+
+def extract_n_free_blocks(free, level, top, n):
+    """
+    Return the `n` first blocks of `level`, among positions `top`, whose
+    resources are all free (see :func:`extract_n_scattered_block_itv`), or an
+    empty list.
+    """
+    blocks = []
+    if n > 0:
+        for k in top:
+            if nb_free(free, level.intervals[k]) == level.sizes[k]:
+                blocks.append(level[k])
+                if len(blocks) == n:
+                    return blocks
+    return []
+
+
+def find_blocks_n_h(free, hy, rqts, top, h, h_bottom):
+    """
+    Recursive part of :func:`find_resource_hierarchies_indexed`, see
+    :func:`find_resource_n_h`. `top` contains positions of blocks in level
+    `h`. Return the list of blocks (:class:`ProcSet`) found or an empty list.
+    """
+    level = hy[h]
+    avail_bks = [k for k in top if nb_free(free, level.intervals[k]) != 0]
+    if len(avail_bks) < rqts[h]:
+        # not enough scattered blocks
+        return []
+
+    tree = level.tree(hy[h + 1])
+    blocks = []
+    nb_r = 0
+    for k in avail_bks:
+        if nb_r == rqts[h]:
+            break
+        if h == h_bottom - 2:
+            # reach last level hierarchy of requested resource, take sub-blocks
+            # whose part in block k is free
+            r = []
+            n = rqts[h + 1]
+            for (part, intervals, size) in tree.parts[k] if n > 0 else ():
+                if nb_free(free, intervals) == size:
+                    r.append(part)
+                    if len(r) == n:
+                        break
+            if len(r) < n:
+                r = []
+        else:
+            # intermediate hierarchy level
+            r = find_blocks_n_h(free, hy, rqts, tree.children[k], h + 1, h_bottom)
+
+        if r:
+            blocks.extend(r)
+            nb_r += 1
+
+    if nb_r == rqts[h]:
+        return blocks
+    else:
+        return []
+
+
 # def G(Y):
 #    if one h level:
 #        extract
@@ -20,6 +20,7 @@ from oar.lib import (
     FragJob,
     GanttJobsPrediction,
     GanttJobsResource,
+    GanttJobsResourcesItvs,
     Job,
     JobDependencie,
     JobResourceDescription,
@@ -115,13 +116,117 @@ class JobPseudo(object):
         self.mld_res_rqts = [(1, walltime, [(res_req, ProcSet(*resources_constraint))])]
 
 
+class SchedulingJob(object):
+    """
+    Job as seen by the scheduler: the columns of a row of the jobs table and
+    the scheduling attributes (requests, types, dependencies, assignment...).
+
+    Unlike :class:`Job` entities, these plain objects are not tracked by the
+    session, and changes made on them during scheduling are never flushed to
+    the database. They are built from column-only queries (see
+    :meth:`columns`), the ORM is only used to save the results.
+    """
+
+    # Attributes of the columns of Job
+    job_attributes = (
+        "id",
+        "array_id",
+        "array_index",
+        "initial_request",
+        "name",
+        "env",
+        "type",
+        "info_type",
+        "state",
+        "reservation",
+        "message",
+        "scheduler_info",
+        "user",
+        "project",
+        "group",
+        "command",
+        "exit_code",
+        "queue_name",
+        "properties",
+        "launching_directory",
+        "submission_time",
+        "start_time",
+        "stop_time",
+        "file_id",
+        "accounted",
+        "notify",
+        "assigned_moldable_job",
+        "checkpoint",
+        "checkpoint_signal",
+        "stdout_file",
+        "stderr_file",
+        "resubmit_job_id",
+        "suspended",
+    )
+
+    __slots__ = job_attributes + (
+        "mld_res_rqts",
+        "key_cache",
+        "deps",
+        "types",
+        "ts",
+        "ts_user",
+        "ts_name",
+        "ph",
+        "ph_name",
+        "assign",
+        "assign_args",
+        "assign_kwargs",
+        "assign_func",
+        "find",
+        "find_args",
+        "find_kwargs",
+        "find_func",
+        "no_quotas",
+        "moldable_id",
+        "walltime",
+        "res_set",
+        "priority",
+        "karma",
+        "nb_res",
+    )
+
+    def __init__(self, values):
+        for key, value in zip(self.job_attributes, values):
+            setattr(self, key, value)
+        self.mld_res_rqts = []
+        self.key_cache = {}
+        self.deps = []
+        self.types = {}
+        self.ts = False
+        self.ph = NO_PLACEHOLDER
+        self.assign = False
+        self.assign_args = ()
+        self.assign_kwargs = {}
+        self.find = False
+        self.find_args = ()
+        self.find_kwargs = {}
+        self.no_quotas = False
+
+    @classmethod
+    def columns(cls):
+        """Columns of Job to query, in the order of `job_attributes`."""
+        return [getattr(Job, key) for key in cls.job_attributes]
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.job_attributes}
+
+    def __repr__(self):
+        return "<SchedulingJob %s>" % self.id
+
+
 def get_waiting_jobs(queues, reservation="None"):
     # TODO fairsharing_nb_job_limit
     waiting_jobs = {}
     waiting_jids = []
     nb_waiting_jobs = 0
 
-    query = db.query(Job).filter(Job.state == "Waiting")
+    query = db.query(*SchedulingJob.columns()).filter(Job.state == "Waiting")
     if isinstance(queues, str):
         query = query.filter(Job.queue_name == queues)
     else:
@@ -129,7 +234,8 @@ def get_waiting_jobs(queues, reservation="None"):
 
     query = query.filter(Job.reservation == reservation).order_by(Job.id)
 
-    for j in query.all():
+    for row in query.all():
+        j = SchedulingJob(row)
         jid = int(j.id)
         waiting_jobs[jid] = j
         waiting_jids.append(jid)
@@ -257,8 +363,6 @@ def get_data_jobs(jobs, jids, resource_set, job_security_time, besteffort_durati
     #            .join(JobResourceGroup)\
     #            .join(JobResourceDescription)\
 
-    cache_constraints = {}
-
     first_job = True
     prev_j_id = 0
     prev_mld_id = 0
@@ -355,17 +459,7 @@ def get_data_jobs(jobs, jids, resource_set, job_security_time, besteffort_durati
                     jrg_grp_property = ""
 
                 sql_constraints = j_properties + and_sql + jrg_grp_property
-                if sql_constraints in cache_constraints:
-                    res_constraints = cache_constraints[sql_constraints]
-                else:
-                    request_constraints = (
-                        db.query(Resource.id).filter(text(sql_constraints)).all()
-                    )
-                    roids = [
-                        resource_set.rid_i2o[int(y[0])] for y in request_constraints
-                    ]
-                    res_constraints = ProcSet(*roids)
-                    cache_constraints[sql_constraints] = res_constraints
+                res_constraints = resource_set.constraints_itvs(sql_constraints)
         else:
             # add next res_type , res_value
             jr_descriptions.append((res_type, res_value))
@@ -435,9 +529,11 @@ def extract_scheduled_jobs(result, resource_set, job_security_time, now):
 
     # (job, a, b, c) = req[0]
     if result:
+        nb_columns = len(SchedulingJob.job_attributes)
         for x in result:
-            j, moldable_id, start_time, walltime, r_id = x
-            if j.id != prev_jid:
+            jid = x[0]
+            moldable_id, start_time, walltime = x[nb_columns : nb_columns + 3]
+            if jid != prev_jid:
                 if prev_jid != 0:
                     job.res_set = ProcSet(*roids)
                     jobs_lst.append(job)
@@ -445,22 +541,19 @@ def extract_scheduled_jobs(result, resource_set, job_security_time, now):
                     jobs[job.id] = job
                     roids = []
 
-                prev_jid = j.id
-                job = j
+                prev_jid = jid
+                job = SchedulingJob(x[:nb_columns])
                 job.start_time = start_time
                 job.walltime = walltime + job_security_time
                 job.moldable_id = moldable_id
-                job.ts = False
-                job.ph = NO_PLACEHOLDER
-                job.assign = False
-                job.find = False
-                job.no_quotas = False
                 if job.suspended == "YES":
                     job.walltime += get_job_suspended_sum_duration(job.id, now)
 
-            roid = resource_set.rid_i2o[r_id]
-            roids.append(roid)
-            rid2jid[roid] = j.id
+            # a resource id or a range of resource ids (begin, end)
+            for r_id in range(x[nb_columns + 3], x[-1] + 1):
+                roid = resource_set.rid_i2o[r_id]
+                roids.append(roid)
+                rid2jid[roid] = jid
 
         job.res_set = ProcSet(*roids)
         if job.state == "Suspended":
@@ -474,24 +567,85 @@ def extract_scheduled_jobs(result, resource_set, job_security_time, now):
     return (jobs, jobs_lst, jids, rid2jid)
 
 
-# TODO available_suspended_res_itvs, now
-def get_scheduled_jobs(resource_set, job_security_time, now):
-    result = (
+def gantt_resources_intervals():
+    """
+    Return True when the resources of jobs in the gantt are stored as ranges
+    of resource ids in gantt_jobs_resources_itvs
+    (``SCHEDULER_GANTT_RESOURCES="intervals"``).
+    """
+    return config["SCHEDULER_GANTT_RESOURCES"] == "intervals"
+
+
+def gantt_jobs_resources():
+    """
+    Return the (moldable_id, resource_id) pairs of the gantt as a mapped
+    entity: GanttJobsResource, or the ranges of gantt_jobs_resources_itvs
+    joined to the resources they contain in intervals storage.
+    """
+    if not gantt_resources_intervals():
+        return GanttJobsResource
+    pairs = (
+        select(
+            GanttJobsResourcesItvs.moldable_id.label("moldable_job_id"),
+            Resource.id.label("resource_id"),
+        )
+        .where(
+            Resource.id.between(
+                GanttJobsResourcesItvs.resource_id_begin,
+                GanttJobsResourcesItvs.resource_id_end,
+            )
+        )
+        .subquery("gantt_resources")
+    )
+    return aliased(GanttJobsResource, pairs, adapt_on_names=True)
+
+
+def gantt_jobs_resources_sql():
+    """SQL counterpart of :func:`gantt_jobs_resources` for raw queries."""
+    if not gantt_resources_intervals():
+        return "gantt_jobs_resources"
+    return (
+        "(SELECT i.moldable_job_id, r.resource_id "
+        "FROM gantt_jobs_resources_itvs i, resources r "
+        "WHERE r.resource_id BETWEEN i.resource_id_begin AND i.resource_id_end)"
+    )
+
+
+def scheduled_jobs_query():
+    """
+    Query the current moldable jobs of the gantt with their start time,
+    walltime and resources, for :func:`extract_scheduled_jobs`. There is one
+    row per resource id, or per range of resource ids in intervals storage.
+    """
+    if gantt_resources_intervals():
+        gantt_resources = GanttJobsResourcesItvs
+        resources_columns = (
+            GanttJobsResourcesItvs.resource_id_begin,
+            GanttJobsResourcesItvs.resource_id_end,
+        )
+    else:
+        gantt_resources = GanttJobsResource
+        resources_columns = (GanttJobsResource.resource_id,)
+
+    return (
         db.query(
-            Job,
+            *SchedulingJob.columns(),
             GanttJobsPrediction.moldable_id,
             GanttJobsPrediction.start_time,
             MoldableJobDescription.walltime,
-            GanttJobsResource.resource_id,
+            *resources_columns,
         )
         .filter(MoldableJobDescription.index == "CURRENT")
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
+        .filter(gantt_resources.moldable_id == GanttJobsPrediction.moldable_id)
         .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
         .filter(Job.id == MoldableJobDescription.job_id)
-        .order_by(Job.start_time, Job.id)
-        .all()
     )
 
+
+# TODO available_suspended_res_itvs, now
+def get_scheduled_jobs(resource_set, job_security_time, now):
+    result = scheduled_jobs_query().order_by(Job.start_time, Job.id).all()
+
     jobs, jobs_lst, jids, rid2jid = extract_scheduled_jobs(
         result, resource_set, job_security_time, now
     )
@@ -502,20 +656,10 @@ def get_scheduled_jobs(resource_set, job_security_time, now):
 def get_after_sched_no_AR_jobs(queue_name, resource_set, job_security_time, now):
     """Get waiting jobs which are not AR and after scheduler round"""
     result = (
-        db.query(
-            Job,
-            GanttJobsPrediction.moldable_id,
-            GanttJobsPrediction.start_time,
-            MoldableJobDescription.walltime,
-            GanttJobsResource.resource_id,
-        )
-        .filter(MoldableJobDescription.index == "CURRENT")
+        scheduled_jobs_query()
         .filter(Job.queue_name == queue_name)
         .filter(Job.state == "Waiting")
         .filter(Job.reservation == "None")
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
-        .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
-        .filter(Job.id == MoldableJobDescription.job_id)
         .order_by(Job.start_time, Job.id)
         .all()
     )
@@ -529,20 +673,10 @@ def get_after_sched_no_AR_jobs(queue_name, resource_set, job_security_time, now)
 
 def get_waiting_scheduled_AR_jobs(queue_name, resource_set, job_security_time, now):
     result = (
-        db.query(
-            Job,
-            GanttJobsPrediction.moldable_id,
-            GanttJobsPrediction.start_time,
-            MoldableJobDescription.walltime,
-            GanttJobsResource.resource_id,
-        )
-        .filter(MoldableJobDescription.index == "CURRENT")
+        scheduled_jobs_query()
         .filter(Job.queue_name == queue_name)
         .filter(Job.reservation == "Scheduled")
         .filter(Job.state == "Waiting")
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
-        .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
-        .filter(Job.id == MoldableJobDescription.job_id)
         .order_by(Job.start_time, Job.id)
         .all()
     )
@@ -573,21 +707,22 @@ def get_gantt_jobs_to_launch(
     #
     #           .all()
     date = now + kill_duration_before_reservation
+    gantt_resources = gantt_jobs_resources()
 
     result = (
         db.query(
-            Job,
+            *SchedulingJob.columns(),
             GanttJobsPrediction.moldable_id,
             GanttJobsPrediction.start_time,
             MoldableJobDescription.walltime,
-            GanttJobsResource.resource_id,
+            gantt_resources.resource_id,
         )
         .filter(GanttJobsPrediction.start_time <= date)
         .filter(Job.state == "Waiting")
         .filter(Job.id == MoldableJobDescription.job_id)
         .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
-        .filter(Resource.id == GanttJobsResource.resource_id)
+        .filter(gantt_resources.moldable_id == GanttJobsPrediction.moldable_id)
+        .filter(Resource.id == gantt_resources.resource_id)
         .filter(Resource.state == "Alive")
         .all()
     )
@@ -634,13 +769,43 @@ def job_message(job, nb_resources=None):
     return message
 
 
+def save_jobs_messages(message_updates):
+    """Set the message of jobs, `message_updates` is a dict job_id -> message."""
+    if message_updates:
+        logger.info("save job messages")
+        db.session.query(Job).filter(Job.id.in_(message_updates)).update(
+            {
+                Job.message: case(
+                    message_updates,
+                    value=Job.id,
+                )
+            },
+            synchronize_session=False,
+        )
+
+
+def resource_ids_intervals(resource_ids):
+    """Return the [begin, end] ranges of contiguous ids in `resource_ids`."""
+    intervals = []
+    for r_id in sorted(resource_ids):
+        if intervals and r_id == intervals[-1][1] + 1:
+            intervals[-1][1] = r_id
+        else:
+            intervals.append([r_id, r_id])
+    return intervals
+
+
 def save_assigns(jobs, resource_set):
     # http://docs.sqlalchemy.org/en/rel_0_9/core/dml.html#sqlalchemy.sql.expression.Insert.values
+    if config["SCHEDULER_SAVE_ASSIGNS"] == "bulk":
+        return save_assigns_bulk(jobs, resource_set)
+
     if len(jobs) > 0:
         logger.debug("nb job to save: " + str(len(jobs)))
         mld_id_start_time_s = []
         mld_id_rid_s = []
         message_updates = {}
+        intervals = gantt_resources_intervals()
 
         for j in jobs.values() if isinstance(jobs, dict) else jobs:
             if j.start_time > -1:
@@ -649,69 +814,115 @@ def save_assigns(jobs, resource_set):
                     {"moldable_job_id": j.moldable_id, "start_time": j.start_time}
                 )
                 riods = list(j.res_set)
-                mld_id_rid_s.extend(
-                    [
-                        {
-                            "moldable_job_id": j.moldable_id,
-                            "resource_id": resource_set.rid_o2i[rid],
-                        }
-                        for rid in riods
-                    ]
-                )
+                if intervals:
+                    mld_id_rid_s.extend(
+                        [
+                            {
+                                "moldable_job_id": j.moldable_id,
+                                "resource_id_begin": begin,
+                                "resource_id_end": end,
+                            }
+                            for begin, end in resource_ids_intervals(
+                                [resource_set.rid_o2i[rid] for rid in riods]
+                            )
+                        ]
+                    )
+                else:
+                    mld_id_rid_s.extend(
+                        [
+                            {
+                                "moldable_job_id": j.moldable_id,
+                                "resource_id": resource_set.rid_o2i[rid],
+                            }
+                            for rid in riods
+                        ]
+                    )
                 msg = job_message(j, nb_resources=len(riods))
                 message_updates[j.id] = msg
 
-        if message_updates:
-            logger.info("save job messages")
-            db.session.query(Job).filter(Job.id.in_(message_updates)).update(
-                {
-                    Job.message: case(
-                        message_updates,
-                        value=Job.id,
-                    )
-                },
-                synchronize_session=False,
-            )
+        save_jobs_messages(message_updates)
 
         logger.info("save assignements")
         db.session.execute(GanttJobsPrediction.__table__.insert(), mld_id_start_time_s)
-        db.session.execute(GanttJobsResource.__table__.insert(), mld_id_rid_s)
+        gantt_resources = GanttJobsResourcesItvs if intervals else GanttJobsResource
+        db.session.execute(gantt_resources.__table__.insert(), mld_id_rid_s)
         db.commit()
 
 
-def save_assigns_bulk(jobs, resource_set):
+def bulk_insert(table_name, columns, rows):
+    """
+    Insert `rows` (tuples of `columns` values) in table `table_name` within the
+    current transaction: with COPY on PostgreSQL, with the driver's executemany
+    otherwise.
+    """
+    if not rows:
+        return
+    connection = db.session.connection()
+    if connection.dialect.name == "postgresql":
+        cursor = connection.connection.cursor()
+        pg_bulk_insert(cursor, db[table_name], rows, columns, binary=True)
+    else:
+        placeholder = "?" if connection.dialect.paramstyle == "qmark" else "%s"
+        query = "INSERT INTO %s (%s) VALUES (%s)" % (
+            table_name,
+            ", ".join(columns),
+            ", ".join([placeholder] * len(columns)),
+        )
+        connection.exec_driver_sql(query, rows)
+
 
+def save_assigns_bulk(jobs, resource_set):
+    """
+    Same as :func:`save_assigns` but predictions and resources of jobs are
+    inserted as tuples with :func:`bulk_insert`, used when
+    ``SCHEDULER_SAVE_ASSIGNS="bulk"``.
+    """
     if len(jobs) > 0:
         logger.debug("nb job to save: " + str(len(jobs)))
         mld_id_start_time_s = []
         mld_id_rid_s = []
-        for j in jobs.values():
+        message_updates = {}
+        rid_o2i = resource_set.rid_o2i
+        intervals = gantt_resources_intervals()
+
+        for j in jobs.values() if isinstance(jobs, dict) else jobs:
             if j.start_time > -1:
-                logger.debug("job_id  to save: " + str(j.id))
+                logger.debug("job_id to save: " + str(j.id))
                 mld_id_start_time_s.append((j.moldable_id, j.start_time))
                 riods = list(j.res_set)
-                mld_id_rid_s.extend(
-                    [(j.moldable_id, resource_set.rid_o2i[rid]) for rid in riods]
-                )
+                moldable_id = j.moldable_id
+                if intervals:
+                    mld_id_rid_s.extend(
+                        [
+                            (moldable_id, begin, end)
+                            for begin, end in resource_ids_intervals(
+                                [rid_o2i[rid] for rid in riods]
+                            )
+                        ]
+                    )
+                else:
+                    mld_id_rid_s.extend([(moldable_id, rid_o2i[rid]) for rid in riods])
+                message_updates[j.id] = job_message(j, nb_resources=len(riods))
 
-        logger.info("save assignements")
+        save_jobs_messages(message_updates)
 
-        with db.engine.connect() as to_conn:
-            cursor = to_conn.connection.cursor()
-            pg_bulk_insert(
-                cursor,
-                db["gantt_jobs_predictions"],
-                mld_id_start_time_s,
-                ("moldable_job_id", "start_time"),
-                binary=True,
-            )
-            pg_bulk_insert(
-                cursor,
-                db["queues"],
+        logger.info("save assignements")
+        bulk_insert(
+            "gantt_jobs_predictions",
+            ("moldable_job_id", "start_time"),
+            mld_id_start_time_s,
+        )
+        if intervals:
+            bulk_insert(
+                "gantt_jobs_resources_itvs",
+                ("moldable_job_id", "resource_id_begin", "resource_id_end"),
                 mld_id_rid_s,
-                ("moldable_job_id", "resource_id"),
-                binary=True,
             )
+        else:
+            bulk_insert(
+                "gantt_jobs_resources", ("moldable_job_id", "resource_id"), mld_id_rid_s
+            )
+        db.commit()
 
 
 def get_current_jobs_dependencies(jobs):
@@ -787,9 +998,10 @@ def add_resource_jobs_pairs(tuple_mld_ids):  # pragma: no cover
 
 
 def add_resource_job_pairs(moldable_id):
+    gantt_resources = gantt_jobs_resources()
     resources_mld_ids = (
-        db.query(GanttJobsResource)
-        .filter(GanttJobsResource.moldable_id == moldable_id)
+        db.query(gantt_resources.moldable_id, gantt_resources.resource_id)
+        .filter(gantt_resources.moldable_id == moldable_id)
         .all()
     )
 
@@ -1160,6 +1372,9 @@ def get_waiting_moldable_of_reservations_already_scheduled():
     """
     return the moldable jobs assigned to already scheduled reservations.
     """
+    gantt_resources = (
+        GanttJobsResourcesItvs if gantt_resources_intervals() else GanttJobsResource
+    )
     result = (
         db.query(
             MoldableJobDescription.id,
@@ -1168,7 +1383,7 @@ def get_waiting_moldable_of_reservations_already_scheduled():
         .filter(Job.reservation == "Scheduled")
         .filter(Job.id == MoldableJobDescription.job_id)
         .filter(GanttJobsPrediction.moldable_id == MoldableJobDescription.id)
-        .filter(GanttJobsResource.moldable_id == MoldableJobDescription.id)
+        .filter(gantt_resources.moldable_id == MoldableJobDescription.id)
         .order_by(Job.id)
         .distinct()
         .all()
@@ -1188,13 +1403,103 @@ def gantt_flush_tables(reservations_to_keep_mld_ids=[]):
         db.query(GanttJobsPrediction).filter(
             ~GanttJobsPrediction.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
         ).delete(synchronize_session=False)
-        db.query(GanttJobsResource).filter(
-            ~GanttJobsResource.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
-        ).delete(synchronize_session=False)
+        for gantt_resources in (GanttJobsResource, GanttJobsResourcesItvs):
+            db.query(gantt_resources).filter(
+                ~gantt_resources.moldable_id.in_(tuple(reservations_to_keep_mld_ids))
+            ).delete(synchronize_session=False)
     else:
         db.query(GanttJobsPrediction).delete(synchronize_session=False)
         db.query(GanttJobsResource).delete(synchronize_session=False)
+        db.query(GanttJobsResourcesItvs).delete(synchronize_session=False)
+
+    db.commit()
+
 
+# scheduler_info of the waiting jobs not reached by the placement of a
+# scheduling round (see SCHEDULER_PLACEMENT_TIME_BUDGET)
+NOT_REEVALUATED = "not re-evaluated"
+
+
+def get_gantt_waiting_jobs_predictions():
+    """
+    Return the gantt predictions of the waiting jobs which are not reservations
+    before they are flushed, as a dict by job id of (prediction row,
+    resources rows of gantt_jobs_resources or gantt_jobs_resources_itvs).
+    """
+    gantt_resources = (
+        GanttJobsResourcesItvs if gantt_resources_intervals() else GanttJobsResource
+    )
+    predictions = {
+        moldable_id: (
+            job_id,
+            {"moldable_job_id": moldable_id, "start_time": start_time},
+            [],
+        )
+        for (job_id, moldable_id, start_time) in db.query(
+            Job.id, GanttJobsPrediction.moldable_id, GanttJobsPrediction.start_time
+        )
+        .filter(Job.state == "Waiting")
+        .filter(Job.reservation == "None")
+        .filter(Job.id == MoldableJobDescription.job_id)
+        .filter(GanttJobsPrediction.moldable_id == MoldableJobDescription.id)
+    }
+    if predictions:
+        table = gantt_resources.__table__
+        for row in db.session.execute(
+            table.select().where(table.c.moldable_job_id.in_(tuple(predictions)))
+        ):
+            predictions[row.moldable_job_id][2].append(dict(row._mapping))
+    return {
+        job_id: (prediction, resources)
+        for (job_id, prediction, resources) in predictions.values()
+    }
+
+
+def keep_gantt_predictions(predictions, job_ids, now):
+    """
+    Insert back in the gantt the `predictions` (see
+    :func:`get_gantt_waiting_jobs_predictions`) of the jobs of `job_ids`
+    (not placed in this scheduling round) which start after `now`: they are
+    kept for information and are not launched before being placed again.
+    """
+    gantt_resources = (
+        GanttJobsResourcesItvs if gantt_resources_intervals() else GanttJobsResource
+    )
+    kept = [
+        predictions[job_id]
+        for job_id in job_ids
+        if (job_id in predictions) and (predictions[job_id][0]["start_time"] > now)
+    ]
+    if kept:
+        db.session.execute(
+            GanttJobsPrediction.__table__.insert(),
+            [prediction for (prediction, _) in kept],
+        )
+        resources = [row for (_, rows) in kept for row in rows]
+        if resources:
+            db.session.execute(gantt_resources.__table__.insert(), resources)
+    db.commit()
+
+
+def set_jobs_not_reevaluated(job_ids, queues=None):
+    """
+    Mark the jobs of `job_ids` as not re-evaluated in their scheduler_info,
+    and unmark the other waiting ones (of `queues` if given).
+    """
+    query = (
+        db.query(Job)
+        .filter(Job.state == "Waiting")
+        .filter(Job.scheduler_info == NOT_REEVALUATED)
+    )
+    if job_ids:
+        query = query.filter(~Job.id.in_(tuple(job_ids)))
+    if queues is not None:
+        query = query.filter(Job.queue_name.in_(tuple(queues)))
+    query.update({Job.scheduler_info: ""}, synchronize_session=False)
+    if job_ids:
+        db.query(Job).filter(Job.id.in_(tuple(job_ids))).update(
+            {Job.scheduler_info: NOT_REEVALUATED}, synchronize_session=False
+        )
     db.commit()
 
 
@@ -1284,6 +1589,34 @@ def remove_gantt_resource_job(moldable_id, job_res_set, resource_set):
     if len(job_res_set) != 0:
         resource_ids = [resource_set.rid_o2i[rid] for rid in job_res_set]
 
+        if gantt_resources_intervals():
+            ranges = (
+                db.query(
+                    GanttJobsResourcesItvs.resource_id_begin,
+                    GanttJobsResourcesItvs.resource_id_end,
+                )
+                .filter(GanttJobsResourcesItvs.moldable_id == moldable_id)
+                .all()
+            )
+            kept_ids = ProcSet(*[tuple(r) for r in ranges]) & ProcSet(*resource_ids)
+            db.query(GanttJobsResourcesItvs).filter(
+                GanttJobsResourcesItvs.moldable_id == moldable_id
+            ).delete(synchronize_session=False)
+            if kept_ids:
+                db.session.execute(
+                    GanttJobsResourcesItvs.__table__.insert(),
+                    [
+                        {
+                            "moldable_job_id": moldable_id,
+                            "resource_id_begin": begin,
+                            "resource_id_end": end,
+                        }
+                        for begin, end in kept_ids.intervals()
+                    ],
+                )
+            db.commit()
+            return
+
         db.query(GanttJobsResource).filter(
             GanttJobsResource.moldable_id == moldable_id
         ).filter(~GanttJobsResource.resource_id.in_(tuple(resource_ids))).delete(
@@ -2698,7 +3031,7 @@ def get_possible_job_end_time_in_interval(
 SELECT
   DISTINCT gp.start_time
 FROM
-  jobs j, moldable_job_descriptions m, gantt_jobs_predictions gp, gantt_jobs_resources gr
+  jobs j, moldable_job_descriptions m, gantt_jobs_predictions gp, {} gr
 WHERE
   j.job_id = m.moldable_job_id AND
   {}
@@ -2718,7 +3051,12 @@ WHERE
   ) AND
   gr.resource_id IN ( {} )
     """.format(
-        only_adv_reservations, from_, to, exclude, resources_str
+        gantt_jobs_resources_sql(),
+        only_adv_reservations,
+        from_,
+        to,
+        exclude,
+        resources_str,
     )
     raw_start_times = db.engine.execute(text(req))
 
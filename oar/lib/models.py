@@ -27,6 +27,7 @@ MOLDABLES_JOBS_TABLES = [
     {"gantt_jobs_predictions_log": "moldable_job_id"},
     {"gantt_jobs_predictions_visu": "moldable_job_id"},
     {"gantt_jobs_resources": "moldable_job_id"},
+    {"gantt_jobs_resources_itvs": "moldable_job_id"},
     {"gantt_jobs_resources_log": "moldable_job_id"},
     {"gantt_jobs_resources_visu": "moldable_job_id"},
 ]
@@ -65,7 +66,11 @@ class Accounting(db.Model):
 
     window_start = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
     window_stop = db.Column(
-        db.BigInteger, primary_key=True, autoincrement=False, server_default="0"
+        db.BigInteger,
+        primary_key=True,
+        autoincrement=False,
+        index=True,
+        server_default="0",
     )
     user = db.Column(
         "accounting_user",
@@ -90,6 +95,47 @@ class Accounting(db.Model):
     consumption = db.Column(db.BigInteger, server_default="0")
 
 
+class AccountingKarma(db.Model):
+    __tablename__ = "accounting_karma"
+
+    queue_name = db.Column(db.String(100), primary_key=True, server_default="")
+    # "queue", "project" or "user"
+    karma_kind = db.Column(db.String(7), primary_key=True, server_default="queue")
+    # project or user name, empty for the whole queue
+    karma_key = db.Column(db.String(255), primary_key=True, server_default="")
+    consumption_type = db.Column(db.String(5), primary_key=True, server_default="ASKED")
+    consumption = db.Column(db.BigInteger, server_default="0")
+
+
+class AccountingKarmaWindow(db.Model):
+    __tablename__ = "accounting_karma_windows"
+
+    queue_name = db.Column(db.String(100), primary_key=True, server_default="")
+    window_start = db.Column(db.BigInteger, server_default="0")
+    window_stop = db.Column(db.BigInteger, server_default="0")
+
+
+class AccountingRollup(db.Model):
+    __tablename__ = "accounting_rollups"
+
+    # "day" or "month" (UTC), of the start of the accounting windows
+    period = db.Column(db.String(5), primary_key=True, server_default="day")
+    period_start = db.Column(
+        db.BigInteger, primary_key=True, autoincrement=False, server_default="0"
+    )
+    user = db.Column(
+        "accounting_user", db.String(255), primary_key=True, server_default=""
+    )
+    project = db.Column(
+        "accounting_project", db.String(255), primary_key=True, server_default=""
+    )
+    queue_name = db.Column(db.String(100), primary_key=True, server_default="")
+    consumption_type = db.Column(db.String(5), primary_key=True, server_default="ASKED")
+    consumption = db.Column(db.BigInteger, server_default="0")
+    first_window_start = db.Column(db.BigInteger, server_default="0")
+    last_window_stop = db.Column(db.BigInteger, server_default="0")
+
+
 class AdmissionRule(db.Model):
     __tablename__ = "admission_rules"
 
@@ -227,6 +273,22 @@ class GanttJobsResource(db.Model):
     resource_id = db.Column(db.Integer, primary_key=True, server_default="0")
 
 
+class GanttJobsResourcesItvs(db.Model):
+    __tablename__ = "gantt_jobs_resources_itvs"
+
+    moldable_id = db.Column(
+        "moldable_job_id",
+        db.Integer,
+        primary_key=True,
+        autoincrement=False,
+        server_default="0",
+    )
+    resource_id_begin = db.Column(
+        db.Integer, primary_key=True, autoincrement=False, server_default="0"
+    )
+    resource_id_end = db.Column(db.Integer, server_default="0")
+
+
 class GanttJobsResourcesLog(db.Model):
     __tablename__ = "gantt_jobs_resources_log"
 
@@ -8,7 +8,6 @@ from oar.lib import (
     EventLog,
     EventLogHostname,
     GanttJobsPrediction,
-    GanttJobsResource,
     Job,
     JobType,
     MoldableJobDescription,
@@ -18,6 +17,7 @@ from oar.lib import (
     db,
     get_logger,
 )
+from oar.lib.job_handling import gantt_jobs_resources
 from oar.lib.resource_handling import get_resources_state
 
 STATE2NUM = {"Alive": 1, "Absent": 2, "Suspected": 3, "Dead": 4}
@@ -53,13 +53,14 @@ def get_nodes_with_state(nodes):
 
 
 def search_idle_nodes(date):
+    gantt_resources = gantt_jobs_resources()
     result = (
         db.query(distinct(Resource.network_address))
-        .filter(Resource.id == GanttJobsResource.resource_id)
+        .filter(Resource.id == gantt_resources.resource_id)
         .filter(GanttJobsPrediction.start_time <= date)
         .filter(Resource.network_address != "")
         .filter(Resource.type == "default")
-        .filter(GanttJobsPrediction.moldable_id == GanttJobsResource.moldable_id)
+        .filter(GanttJobsPrediction.moldable_id == gantt_resources.moldable_id)
         .all()
     )
 
@@ -90,14 +91,15 @@ def search_idle_nodes(date):
 # TODO MOVE TO GANTT
 def get_gantt_hostname_to_wake_up(date, wakeup_time):
     """Get hostname that we must wake up to launch jobs"""
+    gantt_resources = gantt_jobs_resources()
     hostnames = (
         db.query(Resource.network_address)
-        .filter(GanttJobsResource.moldable_id == GanttJobsPrediction.moldable_id)
+        .filter(gantt_resources.moldable_id == GanttJobsPrediction.moldable_id)
         .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
         .filter(Job.id == MoldableJobDescription.job_id)
         .filter(GanttJobsPrediction.start_time <= date + wakeup_time)
         .filter(Job.state == "Waiting")
-        .filter(Resource.id == GanttJobsResource.resource_id)
+        .filter(Resource.id == gantt_resources.resource_id)
         .filter(Resource.state == "Absent")
         .filter(Resource.network_address != "")
         .filter(Resource.type == "default")
@@ -113,11 +115,12 @@ def get_gantt_hostname_to_wake_up(date, wakeup_time):
 
 
 def get_next_job_date_on_node(hostname):
+    gantt_resources = gantt_jobs_resources()
     result = (
         db.query(func.min(GanttJobsPrediction.start_time))
         .filter(Resource.network_address == hostname)
-        .filter(GanttJobsResource.resource_id == Resource.id)
-        .filter(GanttJobsPrediction.moldable_id == GanttJobsResource.moldable_id)
+        .filter(gantt_resources.resource_id == Resource.id)
+        .filter(GanttJobsPrediction.moldable_id == gantt_resources.moldable_id)
         .scalar()
     )
     return result
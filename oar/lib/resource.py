@@ -3,12 +3,25 @@ from array import array
 from collections import OrderedDict
 
 from procset import ProcSet
-from sqlalchemy import text
-
-from oar.lib import Resource, config, db
+from sqlalchemy import case, func, text
+
+from oar.lib import Resource, ResourceLog, config, db
+from oar.lib.constraints import (
+    NotSimpleConstraint,
+    ResourceColumns,
+    compile_constraint,
+)
 from oar.lib.hierarchy import Hierarchy
 
 MAX_NB_RESOURCES = 100000
+MAX_CONSTRAINTS_CACHE = 10000
+
+# Configuration used to build a ResourceSet, part of its version
+RESOURCE_SET_CONFIG = (
+    "SCHEDULER_RESOURCE_ORDER",
+    "HIERARCHY_LABELS",
+    "SCHEDULER_AVAILABLE_SUSPENDED_RESOURCE_TYPE",
+)
 
 
 class ResourceSet(object):
@@ -61,11 +74,12 @@ class ResourceSet(object):
 
         self.roid_2_network_address = {}
 
-        # retrieve resource in order from DB
-        self.resources_db = db.query(Resource).order_by(text(order_by_clause)).all()
+        # retrieve resource in order from DB, not kept: a (cached) resource
+        # set holding them would make every commit expire them
+        resources_db = db.query(Resource).order_by(text(order_by_clause)).all()
 
         # fill the different structures
-        for roid, r in enumerate(self.resources_db):
+        for roid, r in enumerate(resources_db):
             self.nb_resources_all += 1
             if r.state != "Dead":
                 self.nb_resources_not_dead += 1
@@ -124,3 +138,108 @@ class ResourceSet(object):
         default_roids = [self.rid_i2o[i] for i in default_rids]
         self.default_itvs = ProcSet(*default_roids)
         ResourceSet.default_itvs = self.default_itvs  # for Quotas
+
+        # roids of resources matching SQL constraints, see constraints_itvs
+        self.constraints_cache = {}
+        self.resource_columns = None
+
+    def constraints_itvs(self, sql_constraints):
+        """
+        Return the roids of the resources matching the SQL `sql_constraints`.
+        Results are kept as long as the resource set, so across scheduling
+        cycles when it is shared by :class:`ResourceSetCache`. With
+        ``SCHEDULER_CONSTRAINTS_EVALUATION="memory"``, simple constraints are
+        evaluated on a columnar copy of the resources instead of the database
+        (see :mod:`oar.lib.constraints`). The result must not be modified.
+        """
+        if sql_constraints in self.constraints_cache:
+            return self.constraints_cache[sql_constraints]
+
+        itvs = None
+        if config["SCHEDULER_CONSTRAINTS_EVALUATION"] == "memory":
+            if self.resource_columns is None:
+                self.resource_columns = ResourceColumns.from_db(self)
+            try:
+                predicate = compile_constraint(sql_constraints, self.resource_columns)
+            except NotSimpleConstraint:
+                pass
+            else:
+                itvs = self.resource_columns.select(predicate)
+
+        if itvs is None:
+            roids = []
+            for (rid,) in db.query(Resource.id).filter(text(sql_constraints)).all():
+                roid = self.rid_i2o[rid]
+                # resources out of the set (e.g. Dead ones) are not mapped
+                if self.rid_o2i[roid] == rid:
+                    roids.append(roid)
+            itvs = ProcSet(*roids)
+
+        if len(self.constraints_cache) >= MAX_CONSTRAINTS_CACHE:
+            self.constraints_cache.clear()
+        self.constraints_cache[sql_constraints] = itvs
+        return itvs
+
+
+def resources_version():
+    """
+    Return the version of resources, it changes when resources are created,
+    deleted, have a property changed or change state.
+
+    State and property changes are recorded in resource_logs, so the greatest
+    resource_log_id is a version counter for them. Creations and deletions
+    change the number of resources and the greatest resource_id. The sum of
+    scheduler priorities and the number of resources with suspended jobs are
+    added as they are often used in ``SCHEDULER_RESOURCE_ORDER``.
+    """
+    (nb_resources, max_resource_id, sum_priority, nb_suspended) = db.query(
+        func.count(Resource.id),
+        func.max(Resource.id),
+        func.sum(Resource.scheduler_priority),
+        func.sum(case((Resource.suspended_jobs == "YES", 1), else_=0)),
+    ).one()
+    max_log_id = db.query(func.max(ResourceLog.id)).scalar()
+    return (
+        max_log_id,
+        nb_resources,
+        max_resource_id,
+        sum_priority,
+        nb_suspended,
+        tuple(config.get(key) for key in RESOURCE_SET_CONFIG),
+    )
+
+
+class ResourceSetCache(object):
+    """
+    Snapshot of resources shared by all the consumers of a :class:`ResourceSet`
+    until :func:`resources_version` changes. The snapshot must not be modified.
+    """
+
+    resource_set = None
+    version = None
+
+    @classmethod
+    def get(cls):
+        version = resources_version()
+        if (cls.resource_set is None) or (version != cls.version):
+            cls.resource_set = ResourceSet()
+            cls.version = version
+        else:
+            # as done by ResourceSet(), for Quotas
+            ResourceSet.default_itvs = cls.resource_set.default_itvs
+        return cls.resource_set
+
+    @classmethod
+    def clear(cls):
+        cls.resource_set = None
+        cls.version = None
+
+
+def get_resource_set():
+    """
+    Return a :class:`ResourceSet`, the shared snapshot of
+    :class:`ResourceSetCache` if ``RESOURCE_SET_CACHE`` is enabled.
+    """
+    if config["RESOURCE_SET_CACHE"] == "yes":
+        return ResourceSetCache.get()
+    return ResourceSet()
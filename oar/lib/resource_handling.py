@@ -19,7 +19,6 @@ from oar.lib import (
     get_logger,
 )
 from oar.lib.event import add_new_event, is_an_event_exists
-from oar.lib.psycopg2 import pg_bulk_insert
 
 State_to_num = {"Alive": 1, "Absent": 2, "Suspected": 3, "Dead": 4}
 
@@ -516,19 +515,26 @@ def resources_creation(node_name, nb_nodes, nb_core=1, vfactor=1):
     db.commit()
 
 
-def resources_creation_bulk(node_name, nb_nodes, nb_cpusets=1):
-    # TODO need all provide all fields
+def resources_creation_bulk(node_name, nb_nodes, nb_cpusets=1, properties=None):
+    """
+    Create `nb_nodes` Alive nodes named `node_name`1 to `node_name`N with
+    `nb_cpusets` resources each, in bulk (COPY on PostgreSQL).
+
+    `properties` maps property names to functions of (node index, cpuset)
+    returning the value of the property for each resource.
+    """
+    from oar.lib.job_handling import bulk_insert
+
+    if properties is None:
+        properties = {}
+    columns = ("network_address", "cpuset", "state") + tuple(properties)
+    values = tuple(properties.values())
+
     resources = [
-        (f"{node_name}{int(i/nb_cpusets)+1}", i % nb_cpusets, "Alive")
-        for i in range(nb_nodes * nb_cpusets)
+        (f"{node_name}{node + 1}", cpuset, "Alive")
+        + tuple(value(node, cpuset) for value in values)
+        for node in range(nb_nodes)
+        for cpuset in range(nb_cpusets)
     ]
-
-    with db.engine.connect() as to_conn:
-        cursor = to_conn.connection.cursor()
-        pg_bulk_insert(
-            cursor,
-            db["resources"],
-            resources,
-            ("network_address", "cpuset", "state"),
-            binary=True,
-        )
+    bulk_insert("resources", columns, resources)
+    db.commit()
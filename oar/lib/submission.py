@@ -6,8 +6,7 @@ import re
 import sys
 from socket import gethostname
 
-from procset import ProcSet
-from sqlalchemy import exc, text
+from sqlalchemy import exc
 
 import oar.lib.tools as tools
 from oar.lib import (
@@ -21,12 +20,11 @@ from oar.lib import (
     JobType,
     MoldableJobDescription,
     Queue,
-    Resource,
     config,
     db,
 )
 from oar.lib.hierarchy import find_resource_hierarchies_scattered
-from oar.lib.resource import ResourceSet
+from oar.lib.resource import get_resource_set
 from oar.lib.tools import (
     PIPE,
     Popen,
@@ -478,7 +476,7 @@ def estimate_job_nb_resources(resource_request, j_properties):
     # estimate_job_nb_resources
     estimated_nb_resources = []
     is_resource_available = False
-    resource_set = ResourceSet()
+    resource_set = get_resource_set()
     resources_itvs = resource_set.roid_itvs
 
     for mld_idx, mld_resource_request in enumerate(resource_request):
@@ -514,9 +512,7 @@ def estimate_job_nb_resources(resource_request, j_properties):
                 sql_constraints = j_properties + and_sql + jrg_grp_property
 
                 try:
-                    request_constraints = (
-                        db.query(Resource.id).filter(text(sql_constraints)).all()
-                    )
+                    constraints = resource_set.constraints_itvs(sql_constraints)
                 except exc.SQLAlchemyError:
                     error_code = -5
                     error_msg = (
@@ -529,9 +525,6 @@ def estimate_job_nb_resources(resource_request, j_properties):
                     error = (error_code, error_msg)
                     return (error, None, None)
 
-                roids = [resource_set.rid_i2o[int(y[0])] for y in request_constraints]
-                constraints = ProcSet(*roids)
-
             hy_levels = []
             hy_nbs = []
             for resource_value in resource_value_lst:
@@ -32,6 +32,9 @@ DEFAULT_CONFIG = {
     "FINAUD_FREQUENCY": "300",
     "LOG_FILE": "/var/log/oar.log",
     "ENERGY_SAVING_INTERNAL": "no",
+    "METASCHEDULER_DAEMON": "no",
+    "METASCHEDULER_SERVER": "localhost",
+    "METASCHEDULER_PORT": "6673",
 }
 
 config.setdefault_config(DEFAULT_CONFIG)
@@ -57,6 +60,7 @@ meta_sched_command = config["META_SCHED_CMD"]
 m = re.match(r"^\/", meta_sched_command)
 if not m:
     meta_sched_command = os.path.join(binpath, meta_sched_command)
+kao_server_command = os.path.join(binpath, "oar-kao-server")
 
 leon_command = os.path.join(binpath, "oar-leon")
 check_for_villains_command = os.path.join(binpath, "oar-sarko")
@@ -97,6 +101,10 @@ schedulertimeout = 60
 scheduler_min_time_between_2_calls = int(config["SCHEDULER_MIN_TIME_BETWEEN_2_CALLS"])
 
 
+# Max waiting time for the answer of the Kao server to a scheduling round
+# request (in ms)
+kao_server_timeout = int(config["METASCHEDULER_TIMEOUT"]) * 1000
+
 # Max waiting time before check for jobs whose time allowed has elapsed
 villainstimeout = 10
 
@@ -164,11 +172,32 @@ def check_hulot(hulot):
 #
 
 
-def meta_scheduler():
-    """Start :mod:`oar.kao.meta_sched`"""
+def meta_scheduler(kao_client=None):
+    """Start :mod:`oar.kao.meta_sched`, or ask the Kao server to run a round if it is used"""
+    if kao_client:
+        exit_code = kao_client.schedule()
+        if exit_code is None:
+            # No answer, a new round will be requested
+            return 1
+        return exit_code
     return launch_command(meta_sched_command)
 
 
+def start_kao_server():
+    """Start the long-lived meta scheduler :class:`oar.kao.kao.KaoServer`"""
+    return tools.Popen(kao_server_command)
+
+
+def stop_kao_server(kao_server):
+    """Terminate the Kao server and wait for it, so it releases its port"""
+    kao_server.terminate()
+    try:
+        kao_server.wait(timeout=10)
+    except tools.TimeoutExpired:
+        kao_server.kill()
+        kao_server.wait()
+
+
 def check_for_villains():
     """Start :mod:`oar.modules.sarko`"""
     return launch_command(check_for_villains_command)
@@ -189,6 +218,40 @@ def nodeChangeState():
     return launch_command(nodeChangeState_command)
 
 
+class KaoClient(object):
+    """Client used to trigger scheduling rounds on the long-lived Kao server (:class:`oar.kao.kao.KaoServer`)"""
+
+    def __init__(self, context, timeout=kao_server_timeout):
+        self.context = context
+        self.timeout = timeout
+        self.connect()
+
+    def connect(self):
+        self.socket = self.context.socket(zmq.REQ)
+        # To not block Almighty's exit on pending request
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.RCVTIMEO = self.timeout
+        self.socket.connect(
+            "tcp://"
+            + config["METASCHEDULER_SERVER"]
+            + ":"
+            + str(config["METASCHEDULER_PORT"])
+        )
+
+    def schedule(self):
+        """Return the exit code of the scheduling round, or None if the server did not answer"""
+        try:
+            self.socket.send_json({"cmd": "SCHEDULE"})
+            answer = self.socket.recv_json()
+        except zmq.ZMQError as e:
+            logger.error("Something is wrong with Kao server: " + str(e))
+            # REQ socket cannot be reused after a missing answer
+            self.socket.close()
+            self.connect()
+            return None
+        return answer["exit_code"]
+
+
 class Almighty(object):
     def __init__(self):
         self.state = "Init"
@@ -220,6 +283,10 @@ class Almighty(object):
 
         self.scheduler_wanted = 0  # 1 if the scheduler must be run next time update
 
+        self.kao_client = None
+        if config["METASCHEDULER_DAEMON"] == "yes":
+            self.kao_client = KaoClient(self.context)
+
         logger.debug("Init done")
         self.state = "Qget"
 
@@ -230,6 +297,8 @@ class Almighty(object):
 
         self.appendice_proxy = tools.Popen(proxy_appendice_command)
         self.bipbip_commander = tools.Popen(bipbip_commander)
+        if self.kao_client:
+            self.kao_server = start_kao_server()
 
     def time_update(self):
         current = tools.get_time()  # ---> TODO my $current = time; -> ???
@@ -330,6 +399,9 @@ class Almighty(object):
                 Redirect_STD_process = False
                 if Redirect_STD_process:
                     tools.kill(Redirect_STD_process, signal.SIGKILL)
+                if self.kao_client:
+                    logger.debug("stop Kao server")
+                    stop_kao_server(self.kao_server)
                 # TODO ipc_clean()
                 logger.warning("Stop Almighty\n")
                 # TODO: send_log_by_email("Stop OAR server", "[Almighty] Stop Almighty")
@@ -402,7 +474,13 @@ class Almighty(object):
                             time.sleep(5)
                             start_hulot()
 
-                        scheduler_result = meta_scheduler()
+                        # a dead child stays a zombie until it is waited,
+                        # poll reaps it
+                        if self.kao_client and (self.kao_server.poll() is not None):
+                            logger.warning("Kao server died. Restarting it.")
+                            self.kao_server = start_kao_server()
+
+                        scheduler_result = meta_scheduler(self.kao_client)
                         self.lastscheduler = tools.get_time()
                         if scheduler_result == 0:
                             self.state = "Time update"
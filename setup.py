@@ -87,6 +87,7 @@ setup(
     .oarwalltime=oar.cli.oarwalltime:cli
     oar2trace=oar.cli.oar2trace:cli
     kao=oar.kao.kao:main
+    oar-kao-server=oar.kao.kao:server
     kamelot=oar.kao.kamelot:main
     kamelot-fifo=oar.kao.kamelot_fifo:main
     bataar=oar.kao.bataar:bataar
@@ -18,11 +18,15 @@ DROP TABLE gantt_jobs_predictions;
 DROP TABLE gantt_jobs_predictions_visu;
 DROP TABLE gantt_jobs_predictions_log;
 DROP TABLE gantt_jobs_resources;
+DROP TABLE gantt_jobs_resources_itvs;
 DROP TABLE gantt_jobs_resources_visu;
 DROP TABLE gantt_jobs_resources_log;
 DROP TABLE files;
 DROP TABLE event_logs;
 DROP TABLE event_log_hostnames;
 DROP TABLE accounting;
+DROP TABLE accounting_karma;
+DROP TABLE accounting_karma_windows;
+DROP TABLE accounting_rollups;
 DROP TABLE job_dependencies;
 
@@ -4,7 +4,7 @@ CREATE TABLE schema (
   version VARCHAR( 255 ) NOT NULL,
   name VARCHAR( 255 ) NOT NULL
 );
-INSERT INTO schema VALUES ('2.6.0','');
+INSERT INTO schema VALUES ('3.0.0','');
 
 CREATE TABLE accounting (
   window_start integer NOT NULL ,
@@ -20,6 +20,39 @@ CREATE INDEX accounting_user ON accounting (accounting_user);
 CREATE INDEX accounting_project ON accounting (accounting_project);
 CREATE INDEX accounting_queue ON accounting (queue_name);
 CREATE INDEX accounting_type ON accounting (consumption_type);
+CREATE INDEX accounting_window_stop ON accounting (window_stop);
+
+
+CREATE TABLE accounting_karma (
+  queue_name varchar(100) NOT NULL default '',
+  karma_kind varchar(7) check (karma_kind in ('queue','project','user')) NOT NULL default 'queue',
+  karma_key varchar(255) NOT NULL default '',
+  consumption_type varchar(5) check (consumption_type in ('ASKED','USED')) NOT NULL default 'ASKED',
+  consumption bigint NOT NULL default '0',
+  PRIMARY KEY  (queue_name,karma_kind,karma_key,consumption_type)
+);
+
+
+CREATE TABLE accounting_karma_windows (
+  queue_name varchar(100) NOT NULL default '',
+  window_start bigint NOT NULL default '0',
+  window_stop bigint NOT NULL default '0',
+  PRIMARY KEY  (queue_name)
+);
+
+
+CREATE TABLE accounting_rollups (
+  period varchar(5) check (period in ('day','month')) NOT NULL default 'day',
+  period_start bigint NOT NULL default '0',
+  accounting_user varchar(255) NOT NULL default '',
+  accounting_project varchar(255) NOT NULL default '',
+  queue_name varchar(100) NOT NULL default '',
+  consumption_type varchar(5) check (consumption_type in ('ASKED','USED')) NOT NULL default 'ASKED',
+  consumption bigint NOT NULL default '0',
+  first_window_start bigint NOT NULL default '0',
+  last_window_stop bigint NOT NULL default '0',
+  PRIMARY KEY  (period,period_start,accounting_user,accounting_project,queue_name,consumption_type)
+);
 
 
 CREATE TABLE admission_rules (
@@ -121,6 +154,14 @@ CREATE TABLE gantt_jobs_resources (
 );
 
 
+CREATE TABLE gantt_jobs_resources_itvs (
+  moldable_job_id integer NOT NULL default '0',
+  resource_id_begin integer NOT NULL default '0',
+  resource_id_end integer NOT NULL default '0',
+  PRIMARY KEY  (moldable_job_id,resource_id_begin)
+);
+
+
 CREATE TABLE gantt_jobs_resources_visu (
   moldable_job_id integer NOT NULL default '0',
   resource_id integer NOT NULL default '0',
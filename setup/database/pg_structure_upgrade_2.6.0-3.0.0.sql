@@ -0,0 +1,64 @@
+-- Accounting windows are deleted by their window_stop
+CREATE INDEX accounting_window_stop ON accounting (window_stop);
+
+-- Create the accounting_karma and accounting_karma_windows tables, used
+-- when SCHEDULER_FAIRSHARING_INCREMENTAL="yes"
+CREATE TABLE accounting_karma (
+  queue_name varchar(100) NOT NULL default '',
+  karma_kind varchar(7) check (karma_kind in ('queue','project','user')) NOT NULL default 'queue',
+  karma_key varchar(255) NOT NULL default '',
+  consumption_type varchar(5) check (consumption_type in ('ASKED','USED')) NOT NULL default 'ASKED',
+  consumption bigint NOT NULL default '0',
+  PRIMARY KEY  (queue_name,karma_kind,karma_key,consumption_type)
+);
+
+CREATE TABLE accounting_karma_windows (
+  queue_name varchar(100) NOT NULL default '',
+  window_start bigint NOT NULL default '0',
+  window_stop bigint NOT NULL default '0',
+  PRIMARY KEY  (queue_name)
+);
+
+-- Create the accounting_rollups table
+CREATE TABLE accounting_rollups (
+  period varchar(5) check (period in ('day','month')) NOT NULL default 'day',
+  period_start bigint NOT NULL default '0',
+  accounting_user varchar(255) NOT NULL default '',
+  accounting_project varchar(255) NOT NULL default '',
+  queue_name varchar(100) NOT NULL default '',
+  consumption_type varchar(5) check (consumption_type in ('ASKED','USED')) NOT NULL default 'ASKED',
+  consumption bigint NOT NULL default '0',
+  first_window_start bigint NOT NULL default '0',
+  last_window_stop bigint NOT NULL default '0',
+  PRIMARY KEY  (period,period_start,accounting_user,accounting_project,queue_name,consumption_type)
+);
+
+-- Sum the existing accounting windows by UTC day and by UTC month of their
+-- window_start, as oaraccounting --rebuild-rollups does
+INSERT INTO accounting_rollups
+  SELECT 'day', window_start - window_start % 86400, accounting_user,
+         accounting_project, queue_name, consumption_type, sum(consumption),
+         min(window_start), max(window_stop)
+  FROM accounting
+  GROUP BY 2, 3, 4, 5, 6;
+
+INSERT INTO accounting_rollups
+  SELECT 'month',
+         CAST(extract(epoch FROM date_trunc('month', to_timestamp(window_start) AT TIME ZONE 'UTC')) AS bigint),
+         accounting_user, accounting_project, queue_name, consumption_type,
+         sum(consumption), min(window_start), max(window_stop)
+  FROM accounting
+  GROUP BY 2, 3, 4, 5, 6;
+
+-- Create the gantt_jobs_resources_itvs table, used when
+-- SCHEDULER_GANTT_RESOURCES="intervals"
+CREATE TABLE gantt_jobs_resources_itvs (
+  moldable_job_id integer NOT NULL default '0',
+  resource_id_begin integer NOT NULL default '0',
+  resource_id_end integer NOT NULL default '0',
+  PRIMARY KEY  (moldable_job_id,resource_id_begin)
+);
+
+-- Update the database schema version
+DELETE FROM schema;
+INSERT INTO schema(version, name) VALUES ('3.0.0', '');
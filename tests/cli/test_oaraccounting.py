@@ -6,7 +6,7 @@ from click.testing import CliRunner
 
 import oar.lib.tools  # for monkeypatching
 from oar.cli.oaraccounting import cli
-from oar.lib import Accounting, db
+from oar.lib import Accounting, AccountingRollup, db
 
 from ..helpers import insert_terminated_jobs
 
@@ -79,3 +79,16 @@ def test_oaraccounting_delete_before(monkeypatch):
     accounting2 = db.query(Accounting).all()
 
     assert len(accounting1) > len(accounting2)
+
+
+def test_oaraccounting_rebuild_rollups():
+    insert_terminated_jobs()
+    rollups = db.query(AccountingRollup).order_by(
+        *AccountingRollup.__table__.primary_key
+    )
+    expected = [r.to_dict() for r in rollups]
+    db.query(AccountingRollup).delete()
+    runner = CliRunner()
+    runner.invoke(cli, ["--rebuild-rollups"])
+    assert expected
+    assert [r.to_dict() for r in rollups] == expected
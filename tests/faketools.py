@@ -1,7 +1,13 @@
 # coding: utf-8
 from oar.lib.tools import TimeoutExpired
 
-fake_popen = {"cmd": None, "wait_return_code": 0, "exception": None}
+fake_popen = {
+    "cmd": None,
+    "wait_return_code": 0,
+    "exception": None,
+    "poll_return_code": None,
+    "terminated": [],
+}
 
 
 class FakePopen(object):
@@ -27,6 +33,15 @@ class FakePopen(object):
 
         return exit_value
 
+    def poll(self):
+        return fake_popen["poll_return_code"]
+
+    def terminate(self):
+        fake_popen["terminated"].append(self.cmd)
+
+    def kill(self):
+        pass
+
     def communicate(self):
         return (b"", b"")
 
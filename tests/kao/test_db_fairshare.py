@@ -80,7 +80,9 @@ def generate_accountings(
     set_accounting(accountings_u, "USED")
 
 
-def test_db_fairsharing():
+@pytest.mark.parametrize("incremental", ["no", "yes"])
+def test_db_fairsharing(monkeypatch, incremental):
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_INCREMENTAL", incremental)
 
     print("Test_db_fairsharing")
 
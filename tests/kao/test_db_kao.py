@@ -1,11 +1,16 @@
 # coding: utf-8
 import pytest
+import zmq
 
 import oar.lib.tools  # for monkeypatching
-from oar.kao.kao import main
+from oar.kao.kao import KaoServer, main
 from oar.lib import config, db
 from oar.lib.job_handling import insert_job
 
+from ..fakezmq import FakeZmq
+
+fakezmq = FakeZmq()
+
 
 @pytest.fixture(scope="function", autouse=True)
 def setup(request):
@@ -40,6 +45,8 @@ def monkeypatch_tools(request, monkeypatch):
         oar.lib.tools, "notify_user", lambda job, state, msg: len(state + msg)
     )
     monkeypatch.setattr(oar.lib.tools, "notify_bipbip_commander", lambda json_msg: True)
+    monkeypatch.setattr(zmq, "Context", FakeZmq)
+    fakezmq.reset()
 
 
 def test_db_kao_simple_1(monkeypatch):
@@ -76,3 +83,35 @@ def test_db_kao_moldable(monkeypatch):
     print(job.state)
 
     assert job.state == "toLaunch"
+
+
+def test_db_kao_server_schedule(monkeypatch):
+    insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+
+    fakezmq.recv_msgs[0] = [{"cmd": "SCHEDULE"}]
+    kao_server = KaoServer()
+    kao_server.run(False)
+
+    assert fakezmq.sent_msgs[0] == [{"exit_code": 0}]
+    assert kao_server.nb_rounds == 1
+
+    job = db["Job"].query.one()
+    assert job.state == "toLaunch"
+
+
+def test_db_kao_server_successive_rounds(monkeypatch):
+    fakezmq.recv_msgs[0] = [{"cmd": "SCHEDULE"}, {"cmd": "SCHEDULE"}, {"cmd": "STOP"}]
+    kao_server = KaoServer()
+
+    kao_server.run(False)
+    # A job submitted between two rounds is seen by the same server
+    insert_job(res=[(60, [("resource_id=2", "")])], properties="")
+    kao_server.run(False)
+    exit_code = kao_server.run()
+
+    assert exit_code == 0
+    assert kao_server.nb_rounds == 2
+    assert fakezmq.sent_msgs[0] == [{"exit_code": 0}] * 3
+
+    job = db["Job"].query.one()
+    assert job.state == "toLaunch"
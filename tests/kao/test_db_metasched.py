@@ -3,19 +3,27 @@ from os import environ
 
 import pytest
 
+import oar.kao.meta_sched
 import oar.lib.tools  # for monkeypatching
-from oar.kao.meta_sched import meta_schedule
+from oar.kao.meta_sched import meta_schedule, update_gantt_visualization
+from oar.kao.metrics import metrics
 from oar.lib import (
     AssignedResource,
     FragJob,
+    GanttJobsPrediction,
+    GanttJobsPredictionsVisu,
+    GanttJobsResource,
+    GanttJobsResourcesItvs,
+    GanttJobsResourcesVisu,
     Job,
     MoldableJobDescription,
     Resource,
     config,
     db,
 )
-from oar.lib.job_handling import insert_job
+from oar.lib.job_handling import NOT_REEVALUATED, get_scheduled_jobs, insert_job
 from oar.lib.queue import get_all_queue_by_priority
+from oar.lib.resource import ResourceSet
 from oar.lib.tools import get_date
 
 
@@ -62,6 +70,107 @@ def test_db_metasched_simple_1(monkeypatch):
     assert job.state == "toLaunch"
 
 
+def test_db_metasched_metrics(monkeypatch, tmpdir):
+    metrics_file = str(tmpdir.join("oar_scheduler.prom"))
+    monkeypatch.setitem(config, "SCHEDULER_METRICS_FILE", metrics_file)
+    insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+
+    meta_schedule()
+
+    phases = {(phase, queue): m.jobs for (phase, queue), m in metrics.phases.items()}
+    assert phases[("get_waiting_jobs", "default")] == 1
+    assert phases[("placement", "default")] == 1
+    assert phases[("jobs_to_launch", "")] == 1
+    assert ("visu_refresh", "") in phases
+    with open(metrics_file) as f:
+        lines = f.read().splitlines()
+    assert 'oar_scheduler_phase_jobs{phase="save_assigns",queue="default"} 1' in lines
+
+
+@pytest.mark.parametrize("gantt_resources", ["rows", "intervals"])
+def test_db_metasched_placement_time_budget(monkeypatch, gantt_resources):
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_RESOURCES", gantt_resources)
+    jids = [
+        insert_job(res=[(60, [("resource_id=5", "")])], properties="") for _ in range(3)
+    ]
+    meta_schedule()
+    predictions = dict(
+        db.query(MoldableJobDescription.job_id, GanttJobsPrediction.start_time)
+        .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
+        .all()
+    )
+
+    # only the first waiting job is placed
+    monkeypatch.setitem(config, "SCHEDULER_PLACEMENT_TIME_BUDGET", 1e-9)
+    meta_schedule()
+
+    jobs = {job.id: job for job in db.query(Job)}
+    assert jobs[jids[0]].state == "toLaunch"
+    assert jobs[jids[1]].scheduler_info == ""
+    assert jobs[jids[2]].scheduler_info == NOT_REEVALUATED
+    assert (
+        db.query(GanttJobsPrediction.start_time)
+        .filter(MoldableJobDescription.id == GanttJobsPrediction.moldable_id)
+        .filter(MoldableJobDescription.job_id == jids[2])
+        .scalar()
+        == predictions[jids[2]]
+    )
+    gantt_resources = (
+        GanttJobsResourcesItvs if gantt_resources == "intervals" else GanttJobsResource
+    )
+    assert (
+        db.query(gantt_resources)
+        .filter(MoldableJobDescription.id == gantt_resources.moldable_id)
+        .filter(MoldableJobDescription.job_id == jids[2])
+        .count()
+        > 0
+    )
+
+    monkeypatch.setitem(config, "SCHEDULER_PLACEMENT_TIME_BUDGET", 60)
+    meta_schedule()
+    assert db.query(Job).filter(Job.scheduler_info == NOT_REEVALUATED).count() == 0
+
+
+def test_db_metasched_placement_time_budget_energy_saving(monkeypatch):
+    jids = [
+        insert_job(res=[(60, [("resource_id=5", "")])], properties="") for _ in range(3)
+    ]
+    meta_schedule()
+
+    def gantt_job_ids():
+        return {
+            job_id
+            for (job_id,) in db.query(MoldableJobDescription.job_id).filter(
+                MoldableJobDescription.id == GanttJobsPrediction.moldable_id
+            )
+        }
+
+    energy_saving_gantt = []
+
+    def nodes_energy_saving(current_time_sec):
+        energy_saving_gantt.append(gantt_job_ids())
+        return {"halt": [], "wakeup": []}
+
+    class FakeHulotClient(object):
+        pass
+
+    monkeypatch.setattr(oar.kao.meta_sched, "nodes_energy_saving", nodes_energy_saving)
+    monkeypatch.setattr(oar.kao.meta_sched, "HulotClient", FakeHulotClient)
+    monkeypatch.setitem(config, "ENERGY_SAVING_MODE", "metascheduler_decision_making")
+    monkeypatch.setitem(config, "SCHEDULER_PLACEMENT_TIME_BUDGET", 1e-9)
+    meta_schedule()
+
+    # energy saving decisions only see the jobs placed in this round
+    assert jids[2] not in energy_saving_gantt[0]
+    assert jids[2] in gantt_job_ids()
+    assert jids[2] in {
+        job_id
+        for (job_id,) in db.query(MoldableJobDescription.job_id).filter(
+            MoldableJobDescription.id == GanttJobsPredictionsVisu.moldable_id
+        )
+    }
+
+
 def test_db_metasched_ar_1(monkeypatch):
     # add one job
     now = get_date()
@@ -264,3 +373,136 @@ def test_db_metasched_ar_2(monkeypatch):
 
     # Restore the get date function
     monkeypatch.setattr(oar.lib.tools, "get_date", get_date)
+
+
+def test_db_metasched_array_slot_set(monkeypatch):
+    monkeypatch.setitem(config, "SCHEDULER_SLOT_SET", "array")
+
+    insert_job(
+        res=[(60, [("resource_id=4", "")])],
+        properties="",
+        state="Waiting",
+        reservation="toSchedule",
+        start_time=get_date() + 1000,
+        info_type="localhost:4242",
+    )
+    meta_schedule()
+
+    insert_job(res=[(2000, [("resource_id=1", "")])], properties="")
+    insert_job(res=[(2000, [("resource_id=2", "")])], properties="")
+    meta_schedule()
+
+    jobs = db["Job"].query.order_by(Job.id).all()
+    assert [j.state for j in jobs] == ["Waiting", "toLaunch", "Waiting"]
+    assert jobs[0].reservation == "Scheduled"
+
+
+def test_db_metasched_incremental_gantt(monkeypatch):
+    import oar.kao.meta_sched
+
+    config["SCHEDULER_INCREMENTAL_GANTT"] = "yes"
+    monkeypatch.setattr(oar.kao.meta_sched, "incremental_gantt", None)
+
+    now = get_date()
+    insert_job(
+        res=[(60, [("resource_id=4", "")])],
+        properties="",
+        state="Waiting",
+        reservation="toSchedule",
+        start_time=now + 1000,
+        info_type="localhost:4242",
+    )
+    meta_schedule()
+
+    # the reservation, kept in the gantt, prevents the last job to start now
+    insert_job(res=[(2000, [("resource_id=1", "")])], properties="")
+    insert_job(res=[(2000, [("resource_id=2", "")])], properties="")
+    meta_schedule()
+
+    config["SCHEDULER_INCREMENTAL_GANTT"] = "no"
+
+    assert oar.kao.meta_sched.incremental_gantt.nb_updates == 1
+    jobs = db["Job"].query.order_by(Job.id).all()
+    assert [j.state for j in jobs] == ["Waiting", "toLaunch", "Waiting"]
+    assert jobs[0].reservation == "Scheduled"
+
+
+def gantt_visu_values():
+    predictions = db.query(
+        GanttJobsPredictionsVisu.moldable_id, GanttJobsPredictionsVisu.start_time
+    ).order_by(GanttJobsPredictionsVisu.moldable_id)
+    resources = db.query(
+        GanttJobsResourcesVisu.moldable_id, GanttJobsResourcesVisu.resource_id
+    ).order_by(GanttJobsResourcesVisu.moldable_id, GanttJobsResourcesVisu.resource_id)
+    return ([tuple(p) for p in predictions], [tuple(r) for r in resources])
+
+
+def test_db_metasched_update_gantt_visualization(monkeypatch):
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_RESOURCES", "rows")
+    db.session.execute(
+        GanttJobsPrediction.__table__.insert(),
+        [{"moldable_job_id": i, "start_time": 10 * i} for i in (1, 2, 3)],
+    )
+    db.session.execute(
+        GanttJobsResource.__table__.insert(),
+        [{"moldable_job_id": i, "resource_id": r} for i in (1, 2, 3) for r in (1, 2)],
+    )
+    db.commit()
+    update_gantt_visualization()
+    assert gantt_visu_values() == (
+        [(1, 10), (2, 20), (3, 30)],
+        [(1, 1), (1, 2), (2, 1), (2, 2), (3, 1), (3, 2)],
+    )
+
+    # remove job 1, move job 2, change resources of job 3 and add job 4
+    db.query(GanttJobsPrediction).filter(GanttJobsPrediction.moldable_id == 1).delete(
+        synchronize_session=False
+    )
+    db.query(GanttJobsResource).filter(GanttJobsResource.moldable_id == 1).delete(
+        synchronize_session=False
+    )
+    db.query(GanttJobsPrediction).filter(GanttJobsPrediction.moldable_id == 2).update(
+        {GanttJobsPrediction.start_time: 25}, synchronize_session=False
+    )
+    db.query(GanttJobsResource).filter(
+        GanttJobsResource.moldable_id == 3, GanttJobsResource.resource_id == 2
+    ).delete(synchronize_session=False)
+    db.session.execute(
+        GanttJobsResource.__table__.insert(),
+        [
+            {"moldable_job_id": 3, "resource_id": 4},
+            {"moldable_job_id": 4, "resource_id": 5},
+        ],
+    )
+    db.session.execute(
+        GanttJobsPrediction.__table__.insert(),
+        [{"moldable_job_id": 4, "start_time": 40}],
+    )
+    db.commit()
+    update_gantt_visualization()
+    assert gantt_visu_values() == (
+        [(2, 25), (3, 30), (4, 40)],
+        [(2, 1), (2, 2), (3, 1), (3, 4), (4, 5)],
+    )
+
+
+def test_db_metasched_gantt_resources_intervals(monkeypatch):
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_RESOURCES", "intervals")
+    insert_job(res=[(60, [("resource_id=3", "")])], properties="")
+    insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+
+    meta_schedule()
+
+    # one range of resource ids per job instead of one row per resource
+    ranges = db.query(GanttJobsResourcesItvs).all()
+    assert sorted(r.resource_id_end - r.resource_id_begin + 1 for r in ranges) == [3, 4]
+    assert db.query(GanttJobsResource).count() == 0
+
+    resource_set = ResourceSet()
+    jobs = get_scheduled_jobs(resource_set, 0, get_date())
+    assert sorted(len(job.res_set) for job in jobs) == [3, 4]
+
+    _, visu_resources = gantt_visu_values()
+    assert sorted(resource_set.rid_i2o[r_id] for _, r_id in visu_resources) == sorted(
+        roid for job in jobs for roid in job.res_set
+    )
@@ -4,9 +4,10 @@ from tempfile import mkstemp
 import pytest
 
 from oar.kao.kamelot import schedule_cycle
+from oar.kao.multifactor_priority import PriorityConf, evaluate_jobs_priority
 from oar.kao.platform import Platform
 from oar.lib import config, db
-from oar.lib.job_handling import insert_job
+from oar.lib.job_handling import JobPseudo, insert_job
 
 from .test_db_fairshare import generate_accountings
 
@@ -80,3 +81,37 @@ def test_db_multifactor_fairshare():
             break
 
     assert flag
+
+
+class KarmaPlatform(Platform):
+    def get_sum_accounting(self, queues, window_start, window_stop):
+        return ((100.0, 100.0), ({}, {}), ({"toto": 50.0}, {"toto": 20.0}))
+
+
+def test_evaluate_jobs_priority(monkeypatch, tmpdir):
+    priority_file_name = str(tmpdir.join("priority.yaml"))
+    monkeypatch.setitem(config, "PRIORITY_CONF_FILE", priority_file_name)
+    with open(priority_file_name, "w") as priority_fd:
+        priority_fd.write(
+            '{"age_weight": 2.0, "age_coef": 0.01, "queue_weight": 3.0,'
+            ' "queue_coefs": {"default": 0.5}, "karma_weight": 1.0}'
+        )
+
+    jobs = {
+        1: JobPseudo(id=1, user="toto", submission_time=0, queue_name="default"),
+        2: JobPseudo(id=2, user="titi", submission_time=900, queue_name="admin"),
+    }
+    evaluate_jobs_priority(["default"], 1000, [1, 2], jobs, KarmaPlatform())
+
+    assert jobs[2].karma == 0.0
+    assert jobs[1].karma > 0.0
+    assert jobs[1].priority == 2.0 * 10.0 + 3.0 * 0.5 + 1.0 / (1.0 + jobs[1].karma)
+    assert jobs[2].priority == 2.0 * 1.0 + 1.0
+
+    # parsed once until the file changes
+    conf = PriorityConf.get()
+    assert PriorityConf.get() is conf
+    with open(priority_file_name, "w") as priority_fd:
+        priority_fd.write('{"karma_weight": 2.0}')
+    assert PriorityConf.get()["karma_weight"] == 2.0
+    assert PriorityConf.get()["age_weight"] == 0
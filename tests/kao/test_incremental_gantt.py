@@ -0,0 +1,155 @@
+# coding: utf-8
+import random
+
+import pytest
+from procset import ProcSet
+
+from oar.kao.incremental_gantt import IncrementalGantt
+from oar.kao.scheduling import init_slot_sets
+from oar.lib import config
+from oar.lib.job_handling import JobPseudo
+
+
+@pytest.fixture(scope="function", params=["dict", "array"], autouse=True)
+def slot_set_backend(request, monkeypatch):
+    monkeypatch.setitem(config, "SCHEDULER_SLOT_SET", request.param)
+
+
+class FakeResourceSet(object):
+    def __init__(self, nb_resources, available_upto={}):
+        self.nb_resources_all = nb_resources
+        self.roid_itvs = ProcSet((1, nb_resources))
+        self.rid_o2i = list(range(nb_resources + 1))
+        self.available_upto = available_upto
+
+
+def new_job(moldable_id, start_time, walltime, res_set, types={}):
+    return JobPseudo(
+        id=moldable_id,
+        moldable_id=moldable_id,
+        start_time=start_time,
+        walltime=walltime,
+        res_set=res_set,
+        types=types,
+        ts=False,
+        ph=0,
+    )
+
+
+def availability(slot_set, t):
+    """Return the available resources at time t."""
+    sid = 1
+    while sid:
+        slot = slot_set.slots[sid]
+        if slot.b <= t <= slot.e:
+            return slot.itvs
+        sid = slot.next
+    return None
+
+
+def assert_same_gantt(slot_set, slot_set_ref):
+    times = set()
+    for ss in (slot_set, slot_set_ref):
+        for slot in ss.slots.values():
+            times.update((slot.b, slot.e))
+    for t in sorted(times):
+        if t >= slot_set_ref.begin:
+            assert availability(slot_set, t) == availability(slot_set_ref, t)
+
+
+def test_incremental_gantt_first_round():
+    resource_set = FakeResourceSet(32)
+    jobs = [new_job(1, 0, 100, ProcSet((1, 8))), new_job(2, 50, 100, ProcSet(9))]
+
+    gantt = IncrementalGantt()
+    all_slot_sets = gantt.slot_sets(resource_set, jobs, 0, 10)
+    ref_slot_sets = init_slot_sets(resource_set, jobs, 0, 10)
+
+    assert gantt.nb_updates == 0
+    assert_same_gantt(all_slot_sets["default"], ref_slot_sets["default"])
+
+
+def test_incremental_gantt_update():
+    resource_set = FakeResourceSet(32)
+    j1 = new_job(1, 0, 100, ProcSet((1, 8)))
+    j2 = new_job(2, 50, 100, ProcSet(9))
+    j3 = new_job(3, 60, 30, ProcSet((20, 24)))
+
+    gantt = IncrementalGantt()
+    all_slot_sets = gantt.slot_sets(resource_set, [j1, j2], 0, 10)
+    # schedulers split the returned slot set, the kept one must not be modified
+    all_slot_sets["default"].split_slots_jobs([j3])
+
+    # j1 ends early, j2 is moved and j3 is new
+    j1_bis = new_job(1, 0, 100, ProcSet((1, 8)))
+    j2_bis = new_job(2, 40, 100, ProcSet(9))
+    jobs = [j2_bis, j3]
+    all_slot_sets = gantt.slot_sets(resource_set, jobs, 0, 30)
+    ref_slot_sets = init_slot_sets(resource_set, jobs, 0, 30)
+
+    assert gantt.nb_updates == 1
+    assert all_slot_sets["default"].begin == 30
+    assert_same_gantt(all_slot_sets["default"], ref_slot_sets["default"])
+    assert j1_bis.moldable_id not in gantt.jobs
+
+
+def test_incremental_gantt_random_rounds():
+    random.seed(42)
+    # jobs use distinct resources, as they would do in a valid gantt
+    resource_set = FakeResourceSet(100, {500: ProcSet((95, 100))})
+    gantt = IncrementalGantt()
+
+    jobs = {}
+    now = 0
+    for round in range(30):
+        now += random.randint(0, 20)
+        # remove some jobs, change some other ones and add new jobs
+        for moldable_id in list(jobs.keys()):
+            r = random.random()
+            if r < 0.2:
+                del jobs[moldable_id]
+            elif r < 0.3:
+                job = jobs[moldable_id]
+                jobs[moldable_id] = new_job(
+                    moldable_id, job.start_time, job.walltime + 10, job.res_set
+                )
+        for i in range(random.randint(0, 3)):
+            moldable_id = round * 3 + i + 1
+            jobs[moldable_id] = new_job(
+                moldable_id,
+                now + random.randint(-10, 50),
+                random.randint(1, 100),
+                ProcSet(moldable_id),
+            )
+
+        scheduled_jobs = sorted(jobs.values(), key=lambda j: j.start_time)
+        all_slot_sets = gantt.slot_sets(resource_set, scheduled_jobs, 0, now)
+        ref_slot_sets = init_slot_sets(
+            resource_set,
+            [j for j in scheduled_jobs if j.start_time + j.walltime > now],
+            0,
+            now,
+        )
+        assert_same_gantt(all_slot_sets["default"], ref_slot_sets["default"])
+
+    assert gantt.nb_updates > 0
+
+
+def test_incremental_gantt_rebuild():
+    resource_set = FakeResourceSet(32)
+    jobs = [new_job(1, 0, 100, ProcSet((1, 8)))]
+
+    gantt = IncrementalGantt()
+    gantt.slot_sets(resource_set, jobs, 0, 10)
+    gantt.slot_sets(resource_set, jobs, 0, 20)
+    assert gantt.nb_updates == 1
+
+    # resources changed
+    gantt.slot_sets(FakeResourceSet(16), jobs, 0, 30)
+    assert gantt.nb_updates == 0
+
+    # container jobs cannot be handled incrementally
+    jobs.append(new_job(2, 40, 10, ProcSet(10), {"container": ""}))
+    all_slot_sets = gantt.slot_sets(FakeResourceSet(16), jobs, 0, 40)
+    assert gantt.slot_set is None
+    assert "2" in all_slot_sets
@@ -0,0 +1,45 @@
+# coding: utf-8
+import json
+
+from oar.kao.metrics import CycleMetrics
+from oar.lib import config, get_logger
+
+logger = get_logger("oar.test_metrics")
+
+
+def test_cycle_metrics_phases():
+    metrics = CycleMetrics()
+    for _ in range(2):
+        with metrics.phase("sorting", "default") as phase:
+            phase.jobs += 3
+    with metrics.phase("placement", "default") as phase:
+        phase.count_slots({"default": type("SlotSet", (), {"slots": {1: 0, 2: 0}})})
+
+    cycle = metrics.to_dict()
+    assert [(p["phase"], p["jobs"], p["slots"]) for p in cycle["phases"]] == [
+        ("sorting", 6, 0),
+        ("placement", 0, 2),
+    ]
+    assert cycle["phases"][0]["seconds"] >= 0
+
+    metrics.reset()
+    assert metrics.to_dict()["phases"] == []
+
+
+def test_cycle_metrics_emit(monkeypatch, tmpdir, caplog):
+    metrics_file = str(tmpdir.join("oar_scheduler.prom"))
+    monkeypatch.setitem(config, "SCHEDULER_METRICS_FILE", metrics_file)
+    metrics = CycleMetrics()
+    with metrics.phase("gantt_init") as phase:
+        phase.jobs = 2
+
+    metrics.emit(logger)
+
+    line = [r.message for r in caplog.records if "cycle metrics" in r.message][-1]
+    cycle = json.loads(line.split(": ", 1)[1])
+    assert cycle["phases"][0]["phase"] == "gantt_init"
+    with open(metrics_file) as f:
+        lines = f.read().splitlines()
+    assert "# TYPE oar_scheduler_phase_seconds gauge" in lines
+    assert 'oar_scheduler_phase_jobs{phase="gantt_init",queue=""} 2' in lines
+    assert any(line.startswith("oar_scheduler_cycle_seconds ") for line in lines)
@@ -1,11 +1,12 @@
 # coding: utf-8
+import random
 from codecs import open
 from tempfile import mkstemp
 
 import pytest
 from procset import ProcSet
 
-from oar.kao.quotas import Quotas
+from oar.kao.quotas import Quotas, QuotasRulesIndex
 from oar.kao.scheduling import schedule_id_jobs_ct, set_slots_with_prev_scheduled_jobs
 from oar.kao.slot import Slot, SlotSet
 from oar.lib import config, get_logger
@@ -344,3 +345,153 @@ def test_quotas_two_jobs_job_type_proc():
 
     assert j1.start_time == 0
     assert j2.start_time == 50
+
+
+def test_quotas_reload_rules_reset_caches():
+
+    _, quotas_file_name = mkstemp()
+    config["QUOTAS_CONF_FILE"] = quotas_file_name
+
+    with open(config["QUOTAS_CONF_FILE"], "w", encoding="utf-8") as quotas_fd:
+        quotas_fd.write('{"quotas": {"*,*,yop,*": [-1,1,-1]}, "job_types": ["yop"]}')
+
+    res = ProcSet(*[(1, 32)])
+    ResourceSet.default_itvs = res
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+
+    # as a long-lived scheduler does at each round
+    for _ in range(3):
+        Quotas.enable()
+
+        ss = SlotSet(Slot(1, 0, 0, res, 0, 100))
+        all_ss = {"default": ss}
+        j1 = JobPseudo(id=1, queue="default", user="toto", project="", types={"yop"})
+        j1.simple_req(("node", 1), 50, res)
+        j2 = JobPseudo(id=2, queue="default", user="toto", project="", types={"yop"})
+        j2.simple_req(("node", 1), 50, res)
+
+        schedule_id_jobs_ct(all_ss, {1: j1, 2: j2}, hy, [1, 2], 20)
+
+        assert j1.start_time == 0
+        assert j2.start_time == 50
+        assert Quotas.job_types == ["*", "yop"]
+        assert len(QuotasRulesIndex.indexes) == 1
+
+    nb_counters_keys = len(Quotas.counters_keys)
+    nb_job_positions = len(Quotas.job_positions)
+    Quotas.enable()
+    assert len(QuotasRulesIndex.indexes) == 0
+    assert Quotas.counters_keys == []
+    assert Quotas.job_positions == {}
+    assert nb_counters_keys > 0
+    assert nb_job_positions > 0
+
+
+def check_reference(quotas, job):
+    """Rules and counters matching of Quotas.check, by looping over both."""
+    for rl_fields, rl_quotas in quotas.rules.items():
+        rl_queue, rl_project, rl_job_type, rl_user = rl_fields
+        for fields, counters in quotas.counters_items():
+            queue, project, job_type, user = fields
+            if (
+                ((rl_queue == "*") and (queue == "*"))
+                or ((rl_queue == queue) and (job.queue_name == queue))
+                or (rl_queue == "/")
+            ) and (
+                ((rl_project == "*") and (project == "*"))
+                or ((rl_project == project) and (job.project == project))
+                or (rl_project == "/")
+            ):
+                if (((rl_job_type == "*") and (job_type == "*"))) or (
+                    (rl_job_type == job_type) and (job_type in job.types)
+                ):
+                    if (
+                        ((rl_user == "*") and (user == "*"))
+                        or ((rl_user == user) and (job.user == user))
+                        or (rl_user == "/")
+                    ):
+                        for i, msg in enumerate(
+                            ["nb resources", "nb jobs", "resources hours"]
+                        ):
+                            if (rl_quotas[i] > -1) and (rl_quotas[i] < counters[i]):
+                                return (
+                                    False,
+                                    msg + " quotas failed",
+                                    rl_fields,
+                                    rl_quotas[i],
+                                )
+    return (True, "quotas ok", "", 0)
+
+
+def test_quotas_check_rules_index():
+    random.seed(5)
+    Quotas.job_types = ["*", "besteffort", "deploy"]
+    ResourceSet.default_itvs = ProcSet((1, 100))
+
+    queues = ["*", "/", "default", "admin"]
+    projects = ["*", "/", "p1", "p2"]
+    types = ["*", "besteffort", "deploy", "other"]
+    users = ["*", "/", "u1", "u2", "u3"]
+
+    def random_job():
+        return JobPseudo(
+            queue_name=random.choice(queues[2:]),
+            project=random.choice(projects[2:]),
+            user=random.choice(users[2:]),
+            types={t: "" for t in random.sample(types[1:], random.randint(0, 2))},
+            res_set=ProcSet((1, random.randint(1, 20))),
+            walltime=random.randint(1, 100),
+        )
+
+    for i in range(20):
+        rules = {}
+        for j in range(random.randint(1, 30)):
+            fields = (
+                random.choice(queues),
+                random.choice(projects),
+                random.choice(types),
+                random.choice(users),
+            )
+            rules[fields] = [
+                random.choice([-1, random.randint(0, 60)]),
+                random.choice([-1, random.randint(0, 5)]),
+                random.choice([-1, random.randint(0, 3000)]),
+            ]
+
+        quotas = Quotas()
+        quotas.rules = rules
+        for j in range(random.randint(0, 6)):
+            quotas.update(random_job())
+
+        for j in range(20):
+            job = random_job()
+            job_quotas = Quotas()
+            job_quotas.rules = rules
+            job_quotas.combine(quotas)
+            job_quotas.update(job)
+            assert job_quotas.check(job) == check_reference(job_quotas, job)
+
+
+def test_quotas_combine():
+    Quotas.job_types = ["*"]
+    ResourceSet.default_itvs = ProcSet((1, 100))
+    j1 = JobPseudo(user="u1", res_set=ProcSet((1, 10)), walltime=10, types={})
+    j2 = JobPseudo(user="u2", res_set=ProcSet((1, 4)), walltime=5, types={})
+
+    q1 = Quotas()
+    q1.update(j1)
+    q2 = Quotas()
+    q2.update(j1)
+    q2.update(j2)
+    q1.combine(q2)
+
+    counters = dict(q1.counters_items())
+    assert counters["*", "*", "*", "*"] == [14, 2, 220]
+    assert counters["*", "*", "*", "u1"] == [10, 1, 200]
+    assert counters["*", "*", "*", "u2"] == [4, 1, 20]
+
+    q3 = Quotas()
+    q3.deepcopy_from(q1)
+    q3.update(j2)
+    assert dict(q3.counters_items())["*", "*", "*", "u2"] == [8, 2, 40]
+    assert dict(q1.counters_items())["*", "*", "*", "u2"] == [4, 1, 20]
@@ -1,12 +1,15 @@
 # coding: utf-8
+import pytest
 from procset import ProcSet
 
 from oar.kao.scheduling import (
+    TimeBudget,
     assign_resources_mld_job_split_slots,
+    find_first_suitable_contiguous_slots,
     schedule_id_jobs_ct,
     set_slots_with_prev_scheduled_jobs,
 )
-from oar.kao.slot import Slot, SlotSet
+from oar.kao.slot import ArraySlotSet, Slot, SlotSet
 from oar.lib import config
 from oar.lib.job_handling import JobPseudo
 
@@ -161,6 +164,145 @@ def test_schedule_id_jobs_ct_1():
     assert compare_slots_val_ref(ss.slots, v) is True
 
 
+def test_schedule_id_jobs_ct_time_budget():
+    res = ProcSet(*[(1, 32)])
+    ss = SlotSet(Slot(1, 0, 0, res, 0, 1000))
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    jobs = {
+        jid: JobPseudo(
+            id=jid,
+            start_time=-1,
+            types={},
+            deps=[],
+            key_cache={},
+            mld_res_rqts=[(jid, 60, [([("node", 4)], res)])],
+            ts=False,
+            ph=0,
+        )
+        for jid in [1, 2, 3]
+    }
+
+    # the first job is always placed
+    budget = TimeBudget(0)
+    assert schedule_id_jobs_ct({"default": ss}, jobs, hy, [3, 1, 2], 20, budget) == [
+        1,
+        2,
+    ]
+    assert jobs[3].start_time == 0
+    assert jobs[1].start_time == jobs[2].start_time == -1
+    assert schedule_id_jobs_ct({"default": ss}, jobs, hy, [1, 2], 20, budget) == [
+        1,
+        2,
+    ]
+
+    assert schedule_id_jobs_ct({"default": ss}, jobs, hy, [1, 2], 20) == []
+    assert (jobs[1].start_time, jobs[2].start_time) == (60, 120)
+
+
+@pytest.mark.parametrize("slot_set_class", [SlotSet, ArraySlotSet])
+def test_schedule_id_jobs_ct_gantt_horizon(monkeypatch, slot_set_class):
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_HORIZON", 150)
+    res = ProcSet(*[(1, 32)])
+    ss = slot_set_class(Slot(1, 0, 0, res, 0, 1000))
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    jobs = {
+        jid: JobPseudo(
+            id=jid,
+            types={},
+            deps=[],
+            key_cache={1: "4 nodes"},
+            mld_res_rqts=[(1, 100, [([("node", 4)], res)])],
+            ts=False,
+            ph=0,
+        )
+        for jid in [1, 2, 3, 4]
+    }
+
+    schedule_id_jobs_ct({"default": ss}, jobs, hy, [1, 2, 3, 4], 20)
+
+    assert [jobs[jid].start_time for jid in [1, 2, 3, 4]] == [0, 100, -1, -1]
+    assert [(slot.b, slot.e) for slot in ss.slots.values() if slot.itvs] == [
+        (200, 1000)
+    ]
+    # the jobs beyond the horizon start the search from there
+    assert ss.slots[ss.cache["4 nodes"]].b == 200
+
+
+@pytest.mark.parametrize("slot_set_class", [SlotSet, ArraySlotSet])
+@pytest.mark.parametrize(
+    "backfilling, hole_minimum_time, start_times",
+    [
+        ("conservative", 300, [0, 100, 200, 0, 250, 0]),
+        ("easy", 0, [0, 100, -1, 0, -1, 0]),
+        ("easy", 300, [0, 100, -1, -1, -1, -1]),
+    ],
+)
+def test_schedule_id_jobs_ct_backfilling(
+    monkeypatch, slot_set_class, backfilling, hole_minimum_time, start_times
+):
+    monkeypatch.setitem(config, "SCHEDULER_BACKFILLING", backfilling)
+    monkeypatch.setitem(config, "SCHEDULER_RESERVATION_DEPTH", 1)
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_HOLE_MINIMUM_TIME", hole_minimum_time)
+    res = ProcSet(*[(1, 32)])
+    ss = slot_set_class(Slot(1, 0, 0, res, 0, 10000))
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    # (nodes, walltime)
+    requests = [(2, 100), (4, 100), (4, 50), (1, 60), (2, 150), (1, 10)]
+    jobs = {
+        jid: JobPseudo(
+            id=jid,
+            types={},
+            deps=[],
+            key_cache={},
+            mld_res_rqts=[(jid, walltime, [([("node", nb_nodes)], res)])],
+            ts=False,
+            ph=0,
+        )
+        for jid, (nb_nodes, walltime) in enumerate(requests, 1)
+    }
+
+    schedule_id_jobs_ct({"default": ss}, jobs, hy, list(jobs), 20)
+
+    assert [job.start_time for job in jobs.values()] == start_times
+
+
+@pytest.mark.parametrize("slot_set_class", [SlotSet, ArraySlotSet])
+def test_schedule_id_jobs_ct_backfilling_cache(monkeypatch, slot_set_class):
+    monkeypatch.setitem(config, "SCHEDULER_RESERVATION_DEPTH", 0)
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_HOLE_MINIMUM_TIME", 300)
+    res = ProcSet(*[(1, 32)])
+    ss = slot_set_class(Slot(1, 0, 0, res, 0, 10000))
+    hy = {"node": [ProcSet(*x) for x in [[(1, 8)], [(9, 16)], [(17, 24)], [(25, 32)]]]}
+    # a 100s hole at the beginning
+    j0 = JobPseudo(
+        id=0, start_time=100, walltime=5901, res_set=res, types={}, ts=False, ph=0
+    )
+    ss.split_slots_jobs([j0])
+
+    def job(jid):
+        return JobPseudo(
+            id=jid,
+            types={},
+            deps=[],
+            key_cache={1: "1 node 60"},
+            mld_res_rqts=[(1, 60, [([("node", 1)], res)])],
+            ts=False,
+            ph=0,
+        )
+
+    # the hole is too short to backfill the job
+    monkeypatch.setitem(config, "SCHEDULER_BACKFILLING", "easy")
+    j1 = job(1)
+    schedule_id_jobs_ct({"default": ss}, {1: j1}, hy, [1], 20)
+    assert j1.start_time == -1
+
+    # the same request fits in the hole
+    monkeypatch.setitem(config, "SCHEDULER_BACKFILLING", "conservative")
+    j2 = job(2)
+    schedule_id_jobs_ct({"default": ss}, {2: j2}, hy, [2], 20)
+    assert j2.start_time == 0
+
+
 def test_schedule_error_1():
     # Be careful you need a deepcopy for resources constraint when declare
     res = ProcSet(*[(1, 32)])
@@ -799,3 +941,93 @@ def test_schedule_timesharing1():
     print("j1.start_time:", j1.start_time, " j2.start_time:", j2.start_time)
 
     assert j1.start_time == j2.start_time
+
+
+def test_find_first_suitable_contiguous_slots_window():
+    res = ProcSet(*[(1, 32)])
+    ss = SlotSet((res, 0))
+    # resource i is busy in [10 * i, 10 * i + 49]
+    jobs = [
+        JobPseudo(
+            id=i, start_time=10 * i, walltime=50, res_set=ProcSet(i), ts=False, ph=0
+        )
+        for i in range(1, 33)
+    ]
+    ss.split_slots_jobs(jobs)
+    hy = {"resource_id": [ProcSet(i) for i in range(1, 33)]}
+
+    j1 = JobPseudo(
+        id=1,
+        types={},
+        deps=[],
+        key_cache={},
+        mld_res_rqts=[(1, 100, [([("resource_id", 28)], res)])],
+        ts=False,
+        ph=0,
+    )
+
+    itvs, sid_left, sid_right = find_first_suitable_contiguous_slots(
+        ss, j1, j1.mld_res_rqts[0], hy, -1
+    )
+
+    # first window found by walking the slots and intersecting each window
+    sid = 1
+    while True:
+        slot = ss.slots[sid]
+        sid_r = ss.slot_id_at(slot.b + 99)
+        if len(ss.intersec_itvs_slots(sid, sid_r)) >= 28:
+            break
+        sid = slot.next
+
+    assert (sid_left, sid_right) == (sid, sid_r)
+    assert len(itvs) == 28
+    assert itvs <= ss.intersec_itvs_slots(sid, sid_r)
+
+
+@pytest.mark.parametrize("slot_set_class", [SlotSet, ArraySlotSet])
+def test_schedule_id_jobs_ct_array_bulk(slot_set_class):
+    res = ProcSet(*[(1, 32)])
+    hy = {
+        "node": [ProcSet((i, i + 3)) for i in range(1, 33, 4)],
+        "resource_id": [ProcSet(i) for i in range(1, 33)],
+    }
+
+    def schedule(array_id):
+        ss = slot_set_class((res, 0))
+        busy = JobPseudo(
+            id=100, start_time=0, walltime=30, res_set=ProcSet((1, 12)), ts=False, ph=0
+        )
+        ss.split_slots_jobs([busy])
+        jobs = {}
+        for jid in range(1, 21):
+            # the request of the 5th subjob differs
+            nb_nodes = 2 if jid == 5 else 1
+            mld_res_rqts = [(jid, 60, [([("node", nb_nodes)], res)])]
+            jobs[jid] = JobPseudo(
+                id=jid,
+                array_id=array_id,
+                types={},
+                deps=[],
+                key_cache={jid: str(60) + str(mld_res_rqts[0][2])},
+                mld_res_rqts=mld_res_rqts,
+                ts=False,
+                ph=0,
+            )
+        schedule_id_jobs_ct({"default": ss}, jobs, hy, list(jobs), 20)
+        return ss, jobs
+
+    ss_ref, jobs_ref = schedule(0)
+    ss, jobs = schedule(1)
+
+    assert [(j.start_time, j.res_set) for j in jobs.values()] == [
+        (j.start_time, j.res_set) for j in jobs_ref.values()
+    ]
+    assert {j.start_time for j in jobs.values()} == {0, 30, 60, 90, 120}
+
+    slots = []
+    sid = 1
+    while sid:
+        slot = ss.slots[sid]
+        slots.append((slot.b, slot.e, slot.itvs))
+        sid = slot.next
+    assert compare_slots_val_ref(ss_ref.slots, slots)
@@ -1,7 +1,17 @@
 # coding: utf-8
+import random
+
+import pytest
 from procset import ProcSet
 
-from oar.kao.slot import MAX_TIME, Slot, SlotSet, intersec_itvs_slots
+from oar.kao.slot import (
+    MAX_TIME,
+    ArraySlotSet,
+    IntersectionWindow,
+    Slot,
+    SlotSet,
+    intersec_itvs_slots,
+)
 from oar.lib.job_handling import JobPseudo
 
 
@@ -197,3 +207,135 @@ def test_add_split_slots_jobs_2_jobs_2():
     ss.split_slots_jobs([j2, j1], False)
 
     assert compare_slots_val_ref(ss.slots, v)
+
+
+def test_split_slots_jobs_overlapping_jobs():
+    v = [
+        (10, 19, ProcSet(*[(1, 32)])),
+        (20, 29, ProcSet(*[(1, 9), (21, 32)])),
+        (30, 49, ProcSet(*[(1, 4), (8, 9), (21, 32)])),
+        (50, 119, ProcSet(*[(1, 9), (21, 32)])),
+        (120, MAX_TIME, ProcSet(*[(1, 32)])),
+    ]
+
+    ss = SlotSet((ProcSet(*[(1, 32)]), 10))
+
+    j1 = JobPseudo(
+        id=1, start_time=20, walltime=100, res_set=ProcSet(*[(10, 20)]), ts=False, ph=0
+    )
+    j2 = JobPseudo(
+        id=2, start_time=30, walltime=20, res_set=ProcSet(*[(5, 7)]), ts=False, ph=0
+    )
+
+    ss.split_slots_jobs([j1, j2])
+
+    assert compare_slots_val_ref(ss.slots, v)
+
+
+def test_slot_set_copy():
+    ss = SlotSet((ProcSet(*[(1, 32)]), 10))
+    j1 = JobPseudo(
+        id=1, start_time=20, walltime=100, res_set=ProcSet(*[(10, 20)]), ts=False, ph=0
+    )
+    ss.split_slots_jobs([j1])
+
+    ss_copy = ss.copy()
+    j2 = JobPseudo(
+        id=2, start_time=30, walltime=20, res_set=ProcSet(*[(5, 7)]), ts=False, ph=0
+    )
+    ss_copy.split_slots_jobs([j2])
+
+    v = [
+        (10, 19, ProcSet(*[(1, 32)])),
+        (20, 119, ProcSet(*[(1, 9), (21, 32)])),
+        (120, MAX_TIME, ProcSet(*[(1, 32)])),
+    ]
+    assert compare_slots_val_ref(ss.slots, v)
+    assert len(ss_copy.slots) == 5
+    assert not set(ss.slots.keys()) ^ {1, 2, 3}
+
+
+def test_slot_set_drop_slots_before():
+    ss = SlotSet((ProcSet(*[(1, 32)]), 10))
+    j1 = JobPseudo(
+        id=1, start_time=20, walltime=100, res_set=ProcSet(*[(10, 20)]), ts=False, ph=0
+    )
+    ss.split_slots_jobs([j1])
+
+    ss.drop_slots_before(50)
+
+    v = [(50, 119, ProcSet(*[(1, 9), (21, 32)])), (120, MAX_TIME, ProcSet(*[(1, 32)]))]
+    assert ss.begin == 50
+    assert ss.slots[1].prev == 0
+    assert len(ss.slots) == 2
+    assert compare_slots_val_ref(ss.slots, v)
+
+
+@pytest.mark.parametrize("slot_set_class", [SlotSet, ArraySlotSet])
+def test_slot_set_time_index(slot_set_class):
+    random.seed(3)
+    ss = slot_set_class((ProcSet(*[(1, 64)]), 10))
+    for i in range(100):
+        j = JobPseudo(
+            id=i,
+            start_time=random.randint(10, 2000),
+            walltime=random.randint(1, 100),
+            res_set=ProcSet(i % 64 + 1),
+            ts=False,
+            ph=0,
+        )
+        # one job at a time, not sorted by start_time
+        ss.split_slots_jobs([j])
+
+    # index is ordered as the linked slots
+    sids = []
+    sid = 1
+    while sid:
+        sids.append(sid)
+        sid = ss.slots[sid].next
+    assert ss.index_sid == sids
+    assert ss.index_b == [ss.slots[sid].b for sid in sids]
+
+    for t in (10, 11, 500, 1999, 2100):
+        slot = ss.slots[ss.slot_id_at(t)]
+        assert slot.b <= t <= slot.e
+        sid = ss.slot_id_from(t)
+        i = sids.index(sid) if sid else len(sids)
+        assert all(ss.slots[s].b < t for s in sids[:i])
+        assert all(ss.slots[s].b >= t for s in sids[i:])
+
+    assert ss.slot_id_at(0) == 1
+    assert ss.slot_id_from(MAX_TIME + 1) == 0
+    sid_left, sid_right = ss.get_encompassing_slots(500, 700)
+    assert ss.slots[sid_left].b <= 500 <= ss.slots[sid_left].e
+    assert ss.slots[sid_right].b <= 700 <= ss.slots[sid_right].e
+
+
+def test_intersection_window():
+    random.seed(5)
+    itvs_lst = []
+    for i in range(200):
+        first = random.randint(1, 50)
+        itvs_lst.append(ProcSet((first, first + random.randint(0, 40))))
+
+    window = IntersectionWindow()
+    left = 0
+    right = 0
+    while left < len(itvs_lst):
+        # extend the window on the right then shrink it on the left
+        for i in range(random.randint(0, 3)):
+            if right < len(itvs_lst):
+                window.push(itvs_lst[right])
+                right += 1
+        if right == left:
+            window.push(itvs_lst[right])
+            right += 1
+
+        expected = itvs_lst[left]
+        for itvs in itvs_lst[left + 1 : right]:
+            expected = expected & itvs
+        assert len(window) == right - left
+        assert window.intersection() == expected
+
+        window.pop()
+        left += 1
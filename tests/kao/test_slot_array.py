@@ -0,0 +1,148 @@
+# coding: utf-8
+import random
+
+import pytest
+from procset import ProcSet
+
+from oar.kao.slot import (
+    MAX_TIME,
+    ArraySlotSet,
+    Slot,
+    SlotSet,
+    new_slot_set,
+)
+from oar.lib import config
+from oar.lib.job_handling import ALLOW, PLACEHOLDER, JobPseudo
+
+
+def slots_values(slot_set):
+    values = []
+    sid = 1
+    while sid:
+        slot = slot_set.slots[sid]
+        values.append((slot.b, slot.e, slot.itvs, slot.ts_itvs, slot.ph_itvs))
+        sid = slot.next
+    return values
+
+
+def new_job(start_time, walltime, res_set, **kwargs):
+    return JobPseudo(
+        id=1,
+        start_time=start_time,
+        walltime=walltime,
+        res_set=res_set,
+        ts=kwargs.pop("ts", False),
+        ph=kwargs.pop("ph", 0),
+        **kwargs
+    )
+
+
+def test_array_slot_set_init():
+    ss = ArraySlotSet((ProcSet((1, 32)), 10))
+    assert ss.begin == 10
+    assert slots_values(ss) == [(10, MAX_TIME, ProcSet((1, 32)), {}, {})]
+
+    slots = {
+        1: Slot(1, 0, 3, ProcSet((1, 32)), 1, 20),
+        3: Slot(3, 1, 0, ProcSet((1, 16)), 21, 25),
+    }
+    ss = ArraySlotSet(slots)
+    assert list(ss.slots.keys()) == [1, 2]
+    assert ss.slots[2].itvs == ProcSet((1, 16))
+    assert len(ss.slots) == 2
+
+
+def test_array_slot_set_split_slots():
+    ss = ArraySlotSet(Slot(1, 0, 0, ProcSet((1, 32)), 1, 20))
+    ss.split_slots(1, 1, new_job(5, 10, ProcSet((10, 20))))
+    assert slots_values(ss) == [
+        (1, 4, ProcSet((1, 32)), {}, {}),
+        (5, 14, ProcSet((1, 9), (21, 32)), {}, {}),
+        (15, 20, ProcSet((1, 32)), {}, {}),
+    ]
+    assert ss.slots[1].next == 2
+    assert ss.slots[3].prev == 2
+    # the parts of a split slot share the same resources
+    assert ss.itvs[1] is ss.itvs[3]
+
+
+def test_array_slot_set_same_as_slot_set():
+    random.seed(7)
+    res = ProcSet((1, 64))
+    ss = SlotSet((res, 0))
+    ass = ArraySlotSet((res, 0))
+
+    jobs = []
+    for i in range(200):
+        first = random.randint(1, 60)
+        jobs.append(
+            new_job(
+                random.randint(0, 1000),
+                random.randint(1, 200),
+                ProcSet((first, first + random.randint(0, 4))),
+            )
+        )
+    jobs.sort(key=lambda j: j.start_time)
+
+    ss.split_slots_jobs(jobs)
+    ass.split_slots_jobs(jobs)
+    assert slots_values(ss) == slots_values(ass)
+
+    j = new_job(500, 100, ProcSet((30, 40)))
+    sid_left, sid_right = ass.get_encompassing_slots(500, 599)
+    assert ass.slots[sid_left].b <= 500 <= ass.slots[sid_left].e
+    assert ass.slots[sid_right].b <= 599 <= ass.slots[sid_right].e
+    assert ass.intersec_itvs_slots(sid_left, sid_right) == ss.intersec_itvs_slots(
+        *ss.get_encompassing_slots(500, 599)
+    )
+
+    ss.split_slots_jobs([j], False)
+    ass.split_slots_jobs([j], False)
+    assert slots_values(ss) == slots_values(ass)
+
+
+def test_array_slot_set_timesharing_placeholder():
+    ass = ArraySlotSet((ProcSet((1, 32)), 0))
+    j1 = new_job(10, 20, ProcSet((1, 8)), ts=True, ts_user="*", ts_name="*")
+    j2 = new_job(
+        40, 20, ProcSet((9, 16)), ph=PLACEHOLDER, ph_name="ph", ts_user="", ts_name=""
+    )
+    ass.split_slots_jobs([j1, j2])
+
+    slots = ass.slots
+    assert slots[2].ts_itvs == {"*": {"*": ProcSet((1, 8))}}
+    assert slots[2].itvs == ProcSet((9, 32))
+    assert slots[1].ts_itvs == {}
+
+    sid_left, sid_right = ass.get_encompassing_slots(45, 45)
+    assert slots[sid_left].ph_itvs == {"ph": ProcSet((9, 16))}
+
+    j3 = new_job(45, 5, ProcSet((9, 10)), ph=ALLOW, ph_name="ph")
+    ass.split_slots(sid_left, sid_right, j3)
+    sid_left, sid_right = ass.get_encompassing_slots(45, 45)
+    assert slots[sid_left].ph_itvs == {"ph": ProcSet((11, 16))}
+
+
+def test_array_slot_set_copy_drop_slots_before():
+    ass = ArraySlotSet((ProcSet((1, 32)), 10))
+    ass.split_slots_jobs([new_job(20, 100, ProcSet((10, 20)))])
+
+    ass_copy = ass.copy()
+    ass_copy.split_slots_jobs([new_job(30, 20, ProcSet((5, 7)))])
+    assert ass_copy.itvs[1] is ass.itvs[1]
+    assert len(ass.slots) == 3
+    assert len(ass_copy.slots) == 5
+
+    ass.drop_slots_before(50)
+    assert ass.begin == 50
+    assert slots_values(ass) == [
+        (50, 119, ProcSet((1, 9), (21, 32)), {}, {}),
+        (120, MAX_TIME, ProcSet((1, 32)), {}, {}),
+    ]
+    assert ass.slots[ass.slots[1].next].prev == 1
+
+
+@pytest.mark.parametrize("backend, cls", [("dict", SlotSet), ("array", ArraySlotSet)])
+def test_new_slot_set(monkeypatch, backend, cls):
+    monkeypatch.setitem(config, "SCHEDULER_SLOT_SET", backend)
+    assert type(new_slot_set((ProcSet((1, 32)), 0))) == cls
@@ -1,17 +1,30 @@
 # coding: utf-8
+import random
+
 import pytest
+from sqlalchemy import func
 
-from oar.lib import Accounting, db
+from oar.kao.karma import (
+    get_sum_accounting_by_project,
+    get_sum_accounting_by_user,
+    get_sum_accounting_window,
+)
+from oar.lib import Accounting, AccountingKarma, AccountingRollup, Job, config, db
 from oar.lib.accounting import (
+    check_accounting_update,
     delete_accounting_windows_before,
     delete_all_from_accounting,
     get_accounting_summary,
     get_accounting_summary_byproject,
+    get_karma_sums,
     get_last_project_karma,
+    rebuild_accounting_rollups,
+    sum_accounting_windows,
+    update_accounting,
 )
 from oar.lib.job_handling import insert_job
 
-from ..helpers import insert_terminated_jobs
+from ..helpers import insert_running_jobs, insert_terminated_jobs
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -65,6 +78,37 @@ def test_check_accounting_update():
     assert accounting[7].consumption == 864000
 
 
+def test_check_accounting_update_accounted_jobs():
+    running_job_ids = insert_running_jobs(nb_jobs=2)
+    job_ids = insert_terminated_jobs(nb_jobs=3)
+
+    accounted = dict(db.query(Job.id, Job.accounted))
+    assert {accounted[job_id] for job_id in job_ids} == {"YES"}
+    assert {accounted[job_id] for job_id in running_job_ids} == {"NO"}
+
+    consumptions = dict(
+        db.query(Accounting.consumption_type, func.sum(Accounting.consumption))
+        .group_by(Accounting.consumption_type)
+        .all()
+    )
+    # 3 jobs on 2 resources, running 10 days with a walltime of 12 days
+    assert consumptions == {"USED": 3 * 2 * 10 * 86400, "ASKED": 3 * 2 * 12 * 86400}
+
+    # already accounted jobs are not added again
+    check_accounting_update(86400)
+    assert db.query(func.sum(Accounting.consumption)).scalar() == 3 * 2 * 22 * 86400
+
+
+def test_update_accounting_existing_rows():
+    update_accounting(50, 250, 100, "toto", "proj1", "default", "USED", 2)
+    update_accounting(150, 160, 100, "toto", "proj1", "default", "USED", 1)
+    accounting = [
+        (a.window_start, a.window_stop, a.consumption)
+        for a in db.query(Accounting).order_by(Accounting.window_start)
+    ]
+    assert accounting == [(0, 99, 100), (100, 199, 210), (200, 299, 100)]
+
+
 @pytest.mark.skipif(
     "os.environ.get('DB_TYPE', '') != 'postgresql'", reason="need postgresql database"
 )
@@ -133,3 +177,119 @@ def test_get_accounting_summary_byproject():
     assert result1["yopa"]["USED"]["zozo"] == 8640000
     assert result2 == {}
     assert True
+
+
+def add_random_accountings(rng, nb, window_size=100):
+    for _ in range(nb):
+        start_time = rng.randrange(0, 4000)
+        update_accounting(
+            start_time,
+            start_time + rng.randrange(1, 500),
+            window_size,
+            rng.choice(["toto", "titi", "tutu"]),
+            rng.choice(["proj1", "proj2"]),
+            rng.choice(["default", "besteffort", "admin"]),
+            rng.choice(["ASKED", "USED"]),
+            rng.randrange(1, 10),
+        )
+
+
+def test_get_karma_sums(monkeypatch):
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_INCREMENTAL", "yes")
+    rng = random.Random(0)
+    queues = ["default", "besteffort"]
+    add_random_accountings(rng, 100)
+
+    def assert_karma_sums(window_start, window_stop):
+        assert get_karma_sums(queues, window_start, window_stop) == (
+            get_sum_accounting_window(queues, window_start, window_stop),
+            get_sum_accounting_by_project(queues, window_start, window_stop),
+            get_sum_accounting_by_user(queues, window_start, window_stop),
+        )
+
+    assert_karma_sums(500, 2000)
+    # accounting added in and after the summed windows
+    add_random_accountings(rng, 50)
+    assert_karma_sums(500, 2000)
+    assert_karma_sums(750, 2599)
+    assert_karma_sums(1500, 4000)
+    # back in time
+    assert_karma_sums(100, 3000)
+    delete_accounting_windows_before(1999)
+    assert db.query(AccountingKarma).count() == 0
+    assert_karma_sums(100, 3000)
+
+
+def test_karma_sums_not_incremental(monkeypatch):
+    rng = random.Random(0)
+    queues = ["default", "besteffort"]
+    add_random_accountings(rng, 100)
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_INCREMENTAL", "yes")
+    get_karma_sums(queues, 500, 2000)
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_INCREMENTAL", "no")
+    add_random_accountings(rng, 50)
+    assert db.query(AccountingKarma).count() == 0
+
+    # set back to "yes", accounting added meanwhile is summed
+    monkeypatch.setitem(config, "SCHEDULER_FAIRSHARING_INCREMENTAL", "yes")
+    for window_start, window_stop in [(500, 2000), (750, 2599)]:
+        assert get_karma_sums(queues, window_start, window_stop) == (
+            get_sum_accounting_window(queues, window_start, window_stop),
+            get_sum_accounting_by_project(queues, window_start, window_stop),
+            get_sum_accounting_by_user(queues, window_start, window_stop),
+        )
+
+
+def raw_accounting_windows(keys, start_time, stop_time, user=""):
+    query = db.query(
+        *[getattr(Accounting, key) for key in keys],
+        func.sum(Accounting.consumption),
+        func.min(Accounting.window_start),
+        func.max(Accounting.window_stop),
+    ).filter(Accounting.window_stop > start_time, Accounting.window_start < stop_time)
+    if user:
+        query = query.filter(Accounting.user == user)
+    return {
+        tuple(row[:-3]): [int(row[-3]), row[-2], row[-1]]
+        for row in query.group_by(*[getattr(Accounting, key) for key in keys])
+    }
+
+
+def test_sum_accounting_windows():
+    rng = random.Random(7)
+    for _ in range(300):
+        start_time = rng.randrange(0, 120 * 86400)
+        update_accounting(
+            start_time,
+            start_time + rng.randrange(1, 5 * 86400),
+            rng.choice([3600, 6 * 3600, 86400, 2 * 86400]),
+            rng.choice(["toto", "titi", "tutu"]),
+            rng.choice(["proj1", "proj2"]),
+            rng.choice(["default", "besteffort"]),
+            rng.choice(["ASKED", "USED"]),
+            rng.randrange(1, 10),
+        )
+    periods = [
+        (rng.randrange(0, 130 * 86400), rng.randrange(0, 90 * 86400)) for _ in range(20)
+    ] + [(0, 130 * 86400), (31 * 86400, 28 * 86400), (86400 + 1, 3600)]
+
+    def check_sums():
+        for start_time, duration in periods:
+            for keys, user in [
+                (("user", "consumption_type"), ""),
+                (("user", "consumption_type", "project"), "titi"),
+            ]:
+                assert sum_accounting_windows(
+                    keys, start_time, start_time + duration, user
+                ) == raw_accounting_windows(
+                    keys, start_time, start_time + duration, user
+                )
+
+    assert db.query(AccountingRollup).filter(AccountingRollup.period == "month").count()
+    check_sums()
+    delete_accounting_windows_before(40 * 86400 + 5000)
+    check_sums()
+    nb_rollups = db.query(AccountingRollup).count()
+    rebuild_accounting_rollups()
+    assert db.query(AccountingRollup).count() == nb_rollups
+    check_sums()
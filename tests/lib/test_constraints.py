@@ -0,0 +1,101 @@
+# coding: utf-8
+import pytest
+
+from oar.lib import Resource, config, db
+from oar.lib.constraints import (
+    NotSimpleConstraint,
+    ResourceColumns,
+    compile_constraint,
+)
+from oar.lib.resource import ResourceSet, ResourceSetCache, get_resource_set
+from oar.lib.resource_handling import set_resources_property
+
+
+@pytest.fixture(scope="function", autouse=True)
+def minimal_db_initialization(request):
+    ResourceSetCache.clear()
+    with db.session(ephemeral=True):
+        for i in range(8):
+            db["Resource"].create(
+                network_address="localhost" + str(i // 2),
+                host="localhost" + str(i // 2),
+                cpu=i // 2,
+                core=i if i < 6 else None,
+            )
+        db["Resource"].create(network_address="localhost9", state="Dead", cpu=1)
+        yield
+    ResourceSetCache.clear()
+
+
+def columns():
+    return ResourceColumns(
+        [0, 1, 2, 3],
+        {"host": ["a", "a", "b", None], "cpu": [1, 2, 3, 4]},
+        {"host": str, "cpu": int},
+    )
+
+
+@pytest.mark.parametrize(
+    "sql, roids",
+    [
+        ("host='a'", [0, 1]),
+        ("HOST = 'a' AND cpu > 1", [1]),
+        ("host='b' or cpu <= 1", [0, 2]),
+        ("NOT (host = 'a')", [2]),
+        ("host != 'a'", [2]),
+        ("host IN ('a', 'b') AND NOT cpu IN (1)", [1, 2]),
+        ("host NOT IN ('b')", [0, 1]),
+        ("cpu = '4'", [3]),
+        ("cpu = 2.0", [1]),
+        ("cpu = 2.5", None),
+        ("cpu >= 2.5", None),
+        ("(host='a' OR host IS_NOT_SQL)", None),
+        ("host LIKE 'a%'", None),
+        ("cpu = 'x'", None),
+        ("host = 1", None),
+        ("gpu = 'YES'", None),
+        ("host = 'a' AND", None),
+        ("host < 'b'", None),
+        ("host >= 'b' OR cpu = 1", None),
+    ],
+)
+def test_compile_constraint(sql, roids):
+    resource_columns = columns()
+    if roids is None:
+        with pytest.raises(NotSimpleConstraint):
+            compile_constraint(sql, resource_columns)
+    else:
+        predicate = compile_constraint(sql, resource_columns)
+        assert list(resource_columns.select(predicate)) == roids
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "host = 'localhost1'",
+        "cpu >= 1 AND cpu < 3",
+        "core IN (1, 2, 7) OR network_address = 'localhost3'",
+        "NOT core = 2",
+        "cpu = 1",
+        "cpu = 1.5",
+        "cpu >= 1.5",
+        "network_address LIKE 'localhost%'",
+        "host < 'localhost2'",
+    ],
+)
+def test_constraints_itvs_memory_as_sql(monkeypatch, sql):
+    expected = ResourceSet().constraints_itvs(sql)
+    monkeypatch.setitem(config, "SCHEDULER_CONSTRAINTS_EVALUATION", "memory")
+    assert ResourceSet().constraints_itvs(sql) == expected
+
+
+def test_constraints_itvs_cache(monkeypatch):
+    monkeypatch.setitem(config, "RESOURCE_SET_CACHE", "yes")
+    monkeypatch.setitem(config, "SCHEDULER_CONSTRAINTS_EVALUATION", "memory")
+    itvs = get_resource_set().constraints_itvs("host = 'localhost1'")
+    assert len(itvs) == 2
+    assert get_resource_set().constraints_itvs("host = 'localhost1'") is itvs
+
+    r_id = db.query(Resource.id).order_by(Resource.id).first()[0]
+    set_resources_property([r_id], None, "host", "localhost1")
+    assert len(get_resource_set().constraints_itvs("host = 'localhost1'")) == 3
@@ -0,0 +1,98 @@
+# coding: utf-8
+import json
+
+import pytest
+
+from oar.kao.kamelot import schedule_cycle
+from oar.kao.platform import Platform
+from oar.lib import (
+    AssignedResource,
+    GanttJobsPrediction,
+    Job,
+    JobDependencie,
+    MoldableJobDescription,
+    Resource,
+    config,
+    db,
+)
+from oar.lib.generator import generate_platform, generate_quotas, generate_workload
+from oar.lib.job_handling import get_job_types
+
+
+@pytest.fixture(scope="function", autouse=True)
+def minimal_db_initialization(request, monkeypatch):
+    monkeypatch.setitem(
+        config, "HIERARCHY_LABELS", "resource_id,network_address,host,cpu,core"
+    )
+    with db.session(ephemeral=True):
+        yield
+
+
+def test_generate_platform():
+    nb_resources = generate_platform(
+        nb_clusters=2, nb_switches=2, nb_hosts=3, nb_cpus=2, nb_cores=4
+    )
+    assert nb_resources == 96
+    resources = db.query(Resource).order_by(Resource.id).all()
+    assert len(resources) == 96
+    assert len({r.network_address for r in resources}) == 12
+    assert len({r.cpu for r in resources}) == 24
+    assert [r.core for r in resources] == list(range(1, 97))
+    last = resources[-1]
+    assert (last.network_address, last.host, last.cpu) == ("node12", "node12", 24)
+
+
+def test_generate_platform_seed():
+    generate_platform(nb_clusters=3, nb_hosts=2, seed=7)
+    mems = [r.mem for r in db.query(Resource).order_by(Resource.id).all()]
+    db.query(Resource).delete()
+    generate_platform(nb_clusters=3, nb_hosts=2, seed=7)
+    assert [r.mem for r in db.query(Resource).order_by(Resource.id).all()] == mems
+
+
+def test_generate_workload():
+    generate_platform(nb_clusters=1, nb_switches=2, nb_hosts=4, nb_cpus=1, nb_cores=2)
+    waiting, running = generate_workload(
+        nb_waiting=30,
+        nb_running=3,
+        moldable_ratio=0.5,
+        dependency_ratio=0.5,
+        nb_containers=2,
+        inner_ratio=0.3,
+        start_time=10000,
+        seed=1,
+    )
+    assert len(waiting) == 30
+    assert len(running) == 3
+    assert {j.state for j in db.query(Job).filter(Job.id.in_(running))} == {"Running"}
+    assert db.query(AssignedResource).count() > 0
+    assert db.query(JobDependencie).count() > 0
+    assert db.query(MoldableJobDescription).count() > 33
+    assert get_job_types(waiting[0]) == {"container": True}
+
+    schedule_cycle(Platform(), 10000, ["default"])
+    assert db.query(GanttJobsPrediction).count() > 0
+
+
+def test_generate_workload_seed():
+    generate_platform(nb_hosts=2)
+    generate_workload(nb_waiting=10, seed=3)
+    requests = [j.initial_request for j in db.query(Job).order_by(Job.id)]
+    walltimes = [m.walltime for m in db.query(MoldableJobDescription)]
+    db.query(Job).delete()
+    db.query(MoldableJobDescription).delete()
+    generate_workload(nb_waiting=10, seed=3)
+    assert [m.walltime for m in db.query(MoldableJobDescription)] == walltimes
+    assert [j.initial_request for j in db.query(Job).order_by(Job.id)] == requests
+
+
+def test_generate_quotas(tmpdir):
+    quotas_file = str(tmpdir.join("quotas.json"))
+    generate_quotas(quotas_file, 100, nb_projects=2)
+    with open(quotas_file) as f:
+        quotas = json.load(f)["quotas"]
+    assert quotas == {
+        "*,*,*,/": [25, -1, -1],
+        "*,project1,*,*": [50, -1, -1],
+        "*,project2,*,*": [50, -1, -1],
+    }
@@ -1,7 +1,11 @@
 # coding: utf-8
+import random
+
 from procset import ProcSet
 
 from oar.lib.hierarchy import (
+    Hierarchy,
+    HierarchyLevel,
     extract_n_scattered_block_itv,
     find_resource_hierarchies_scattered,
     keep_no_empty_scat_bks,
@@ -167,3 +171,77 @@ def test_find_resource_hierarchies_scattere6_fail():
         ProcSet(*[(1, 32)]), [h0, h1, h2], [1, 2, 1]
     )
     assert x == ProcSet(*[(1, 4), (9, 12)])
+
+
+def random_hierarchy(nb_roids):
+    """Return levels of blocks: nested ones, scattered ones and overlapping ones."""
+    roids = list(range(1, nb_roids + 1))
+    levels = {}
+    for name, size in (("switch", 32), ("node", 8), ("cpu", 4), ("core", 1)):
+        levels[name] = [ProcSet(*roids[i : i + size]) for i in range(0, nb_roids, size)]
+    # blocks made of resources spread over several nodes
+    random.shuffle(roids)
+    levels["scattered"] = [ProcSet(*roids[i : i + 4]) for i in range(0, nb_roids, 4)]
+    levels["overlap"] = [ProcSet((i, i + 7)) for i in range(1, nb_roids - 7, 4)]
+    return levels
+
+
+def test_find_resource_hierarchies_indexed():
+    random.seed(3)
+    hy = random_hierarchy(128)
+    hy_indexed = Hierarchy(hy=hy).hy
+    assert all(isinstance(level, HierarchyLevel) for level in hy_indexed.values())
+
+    requests = [
+        (["switch"], [2]),
+        (["node"], [5]),
+        (["switch", "node"], [2, 2]),
+        (["switch", "node", "core"], [2, 2, 3]),
+        (["switch", "cpu", "core"], [1, 3, 4]),
+        (["switch", "node", "cpu", "core"], [2, 1, 2, 1]),
+        (["node", "switch"], [1, 1]),
+        (["switch", "scattered"], [2, 1]),
+        (["switch", "scattered", "core"], [1, 1, 1]),
+        (["scattered", "node"], [3, 1]),
+        (["switch", "overlap"], [2, 1]),
+        (["switch", "node", "core"], [0, 1, 1]),
+        (["switch", "node", "core"], [1, 0, 1]),
+    ]
+    for i in range(50):
+        itvs = ProcSet(*random.sample(range(1, 129), random.randint(0, 128)))
+        if random.random() < 0.5:
+            itvs = itvs | ProcSet((random.randint(1, 64), random.randint(64, 128)))
+        for (labels, rqts) in requests:
+            expected = find_resource_hierarchies_scattered(
+                itvs, [hy[label] for label in labels], rqts
+            )
+            x = find_resource_hierarchies_scattered(
+                itvs, [hy_indexed[label] for label in labels], rqts
+            )
+            assert x == expected
+
+    assert hy_indexed["switch"].block_of is not None
+    assert hy_indexed["scattered"].block_of is not None
+    assert hy_indexed["overlap"].block_of is None
+
+
+def test_hierarchy_tree():
+    hy = Hierarchy(
+        hy={
+            "switch": [ProcSet((1, 16)), ProcSet((17, 32))],
+            "node": [ProcSet((1, 8)), ProcSet((9, 20)), ProcSet((21, 32))],
+        }
+    ).hy
+    tree = hy["switch"].tree(hy["node"])
+    assert tree is hy["switch"].tree(hy["node"])
+
+    assert tree.children == [[0], [2]]
+    assert tree.parts == [
+        [(ProcSet((1, 8)), ((1, 8),), 8), (ProcSet((9, 16)), ((9, 16),), 8)],
+        [(ProcSet((17, 20)), ((17, 20),), 4), (ProcSet((21, 32)), ((21, 32),), 12)],
+    ]
+    # the part of an included sub-block is the sub-block itself
+    assert tree.parts[0][0][0] is hy["node"][0]
+
+    # no sub-block is included in a node
+    assert hy["node"].tree(hy["switch"]).children == [[], [], []]
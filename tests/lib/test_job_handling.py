@@ -1,10 +1,27 @@
 # coding: utf-8
 import pytest
+from procset import ProcSet
 
 import oar.lib.tools  # for monkeypatching
 from oar.kao.platform import Platform
-from oar.lib import EventLog, config, db
-from oar.lib.job_handling import check_end_of_job, get_data_jobs, insert_job
+from oar.lib import (
+    EventLog,
+    GanttJobsPrediction,
+    GanttJobsResource,
+    GanttJobsResourcesItvs,
+    Job,
+    MoldableJobDescription,
+    config,
+    db,
+)
+from oar.lib.job_handling import (
+    JobPseudo,
+    SchedulingJob,
+    check_end_of_job,
+    get_data_jobs,
+    insert_job,
+    save_assigns,
+)
 
 
 @pytest.fixture(scope="function", autouse=True)
@@ -92,3 +109,73 @@ def test_get_data_jobs_moldable(monkeypatch):
         test_nb_mold = job_and_nb_moldable[1]
         # Assert that the jobs has two moldable
         assert len(jobs[0][test_job_id].mld_res_rqts) == test_nb_mold
+
+
+def test_get_waiting_jobs_scheduling_job():
+    assert set(SchedulingJob.job_attributes) == {
+        p.key for p in db.inspect(Job).column_attrs
+    }
+
+    job_id = insert_job(res=[(60, [("resource_id=2", "")])], user="toto")
+    jobs, jids, nb_jobs = Platform().get_waiting_jobs("default")
+    assert (jids, nb_jobs) == ([job_id], 1)
+
+    job = jobs[job_id]
+    assert isinstance(job, SchedulingJob)
+    assert job.to_dict() == Job.query.get(job_id).to_dict()
+    assert (job.user, job.deps, job.ts) == ("toto", [], False)
+
+    # scheduling state is not flushed to the jobs table
+    job.start_time = 1234
+    db.commit()
+    assert Job.query.get(job_id).start_time == 0
+
+
+@pytest.mark.parametrize("save_mode", ["default", "bulk"])
+@pytest.mark.parametrize("storage", ["rows", "intervals"])
+def test_save_assigns(monkeypatch, save_mode, storage):
+    monkeypatch.setitem(config, "SCHEDULER_SAVE_ASSIGNS", save_mode)
+    monkeypatch.setitem(config, "SCHEDULER_GANTT_RESOURCES", storage)
+
+    class ResourceSet(object):
+        # resource order to resource id
+        rid_o2i = [0] + [100 + i for i in range(1, 64)]
+
+    jobs = {}
+    for i, (start_time, res_set) in enumerate(
+        [(10, ProcSet((1, 8))), (20, ProcSet(3, (40, 50))), (-1, ProcSet())]
+    ):
+        job_id = insert_job(res=[(60, [("resource_id=4", "")])], properties="")
+        moldable_id = (
+            db.query(MoldableJobDescription.id)
+            .filter(MoldableJobDescription.job_id == job_id)
+            .one()[0]
+        )
+        jobs[job_id] = JobPseudo(
+            id=job_id,
+            moldable_id=moldable_id,
+            start_time=start_time,
+            walltime=60,
+            res_set=res_set,
+            type="PASSIVE",
+        )
+
+    save_assigns(jobs, ResourceSet())
+
+    predictions = db.query(GanttJobsPrediction).all()
+    assert sorted((p.moldable_id, p.start_time) for p in predictions) == sorted(
+        (j.moldable_id, j.start_time) for j in jobs.values() if j.start_time > -1
+    )
+    mld_ids = [j.moldable_id for j in jobs.values()]
+    if storage == "intervals":
+        resources = db.query(GanttJobsResourcesItvs).all()
+        assert sorted(
+            (r.moldable_id, r.resource_id_begin, r.resource_id_end) for r in resources
+        ) == [(mld_ids[0], 101, 108), (mld_ids[1], 103, 103), (mld_ids[1], 140, 150)]
+    else:
+        resources = db.query(GanttJobsResource).all()
+        assert sorted((r.moldable_id, r.resource_id) for r in resources) == sorted(
+            (j.moldable_id, 100 + roid) for j in jobs.values() for roid in j.res_set
+        )
+    messages = [job.message for job in db.query(Job).order_by(Job.id).all()]
+    assert messages[:2] == ["R=8,W=60,J=P,Q=default", "R=12,W=60,J=P,Q=default"]
@@ -8,6 +8,9 @@ def test_all_module_api():
 
     all_modules = [
         "Accounting",
+        "AccountingKarma",
+        "AccountingKarmaWindow",
+        "AccountingRollup",
         "AdmissionRule",
         "AssignedResource",
         "Challenge",
@@ -24,6 +27,7 @@ def test_all_module_api():
         "GanttJobsPredictionsLog",
         "GanttJobsPredictionsVisu",
         "GanttJobsResource",
+        "GanttJobsResourcesItvs",
         "GanttJobsResourcesLog",
         "GanttJobsResourcesVisu",
         "InvalidConfiguration",
@@ -22,6 +22,9 @@ def minimal_db_initialization(request):
 def test_simple_models():
     expected_models = [
         "Accounting",
+        "AccountingKarma",
+        "AccountingKarmaWindow",
+        "AccountingRollup",
         "AdmissionRule",
         "AssignedResource",
         "Challenge",
@@ -33,6 +36,7 @@ def test_simple_models():
         "GanttJobsPredictionsLog",
         "GanttJobsPredictionsVisu",
         "GanttJobsResource",
+        "GanttJobsResourcesItvs",
         "GanttJobsResourcesLog",
         "GanttJobsResourcesVisu",
         "Job",
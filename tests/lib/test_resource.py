@@ -0,0 +1,80 @@
+# coding: utf-8
+import pytest
+
+from oar.kao.platform import Platform
+from oar.lib import Resource, config, db
+from oar.lib.resource import ResourceSet, ResourceSetCache, get_resource_set
+from oar.lib.resource_handling import (
+    add_resource,
+    remove_resource,
+    set_resource_state,
+    set_resources_property,
+)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def minimal_db_initialization(request, monkeypatch):
+    monkeypatch.setitem(config, "RESOURCE_SET_CACHE", "yes")
+    ResourceSetCache.clear()
+    with db.session(ephemeral=True):
+        for i in range(4):
+            db["Resource"].create(network_address="localhost" + str(i // 2))
+        yield
+    ResourceSetCache.clear()
+
+
+def test_resource_set_cache_shared():
+    plt = Platform()
+    resource_set = plt.resource_set()
+    assert resource_set.roid_itvs == ResourceSet().roid_itvs
+    assert plt.resource_set() is resource_set
+    assert get_resource_set() is resource_set
+
+
+def test_resource_set_cache_disabled(monkeypatch):
+    monkeypatch.setitem(config, "RESOURCE_SET_CACHE", "no")
+    assert get_resource_set() is not get_resource_set()
+
+
+def first_resource_id():
+    return db.query(Resource.id).order_by(Resource.id).first()[0]
+
+
+def test_resource_set_cache_resource_state():
+    r_id = first_resource_id()
+    resource_set = get_resource_set()
+    set_resource_state(r_id, "Absent", "NO")
+    assert get_resource_set() is not resource_set
+
+    resource_set = get_resource_set()
+    set_resource_state(r_id, "Dead", "NO")
+    db.commit()
+    assert get_resource_set().nb_resources_not_dead == 3
+
+
+def test_resource_set_cache_resource_property():
+    resource_set = get_resource_set()
+    set_resources_property(
+        [first_resource_id() + 1], None, "network_address", "localhost9"
+    )
+    resource_set = get_resource_set()
+    assert resource_set.roid_2_network_address[1] == "localhost9"
+    assert len(resource_set.hierarchy["network_address"]) == 3
+
+
+def test_resource_set_cache_resource_creation_deletion(monkeypatch):
+    monkeypatch.setenv("USER", "oar")
+    resource_set = get_resource_set()
+    r_id = add_resource("localhost4", "Alive")
+    resource_set = get_resource_set()
+    assert resource_set.nb_resources_all == 5
+
+    set_resource_state(r_id, "Dead", "NO")
+    remove_resource(r_id)
+    assert get_resource_set().nb_resources_all == 4
+
+
+def test_resource_set_cache_config(monkeypatch):
+    resource_set = get_resource_set()
+    monkeypatch.setitem(config, "SCHEDULER_RESOURCE_ORDER", "resource_id DESC")
+    assert get_resource_set() is not resource_set
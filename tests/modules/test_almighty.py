@@ -6,8 +6,9 @@ import pytest
 import zmq
 
 import oar.lib.tools
+import oar.modules.almighty
 from oar.lib import config
-from oar.modules.almighty import Almighty, signal_handler
+from oar.modules.almighty import Almighty, KaoClient, signal_handler
 
 from ..faketools import FakePopen, fake_call, fake_get_date, fake_popen, set_fake_date
 from ..fakezmq import FakeZmq
@@ -19,6 +20,7 @@ FINAUD = "/usr/local/lib/oar/oar-finaud"
 SARKO = "/usr/local/lib/oar/oar-sarko"
 LEON = "/usr/local/lib/oar/oar-leon"
 NODE_CHANGE_STATE = "/usr/local/lib/oar/oar-node-change-state"
+KAO_SERVER = "/usr/local/lib/oar/oar-kao-server"
 
 
 @pytest.fixture(scope="module", autouse=True)
@@ -125,6 +127,71 @@ def test_almighty_state_called_command_with_exit_value(
     set_fake_date(0)
 
 
+@pytest.mark.parametrize(
+    "answers, state_out",
+    [
+        ([{"exit_code": 0}], "Time update"),
+        ([{"exit_code": 1}], "Scheduler"),
+        ([{"exit_code": 2}], "Leon"),
+    ],
+)
+def test_almighty_state_kao_server(answers, state_out, monkeypatch):
+    set_fake_date(1000)
+    config["METASCHEDULER_DAEMON"] = "yes"
+    # socket 0: appendice, socket 1: kao client
+    fakezmq.recv_msgs[1] = answers
+    almighty = Almighty()
+    assert fake_popen["cmd"] == KAO_SERVER
+    almighty.state = "Scheduler"
+    almighty.run(False)
+    config["METASCHEDULER_DAEMON"] = "no"
+    # Round is requested to the server, nodeChangeState is the last command launched
+    assert fakezmq.sent_msgs[1] == [{"cmd": "SCHEDULE"}]
+    assert fake_popen["cmd"] == NODE_CHANGE_STATE
+    assert almighty.state == state_out
+    set_fake_date(0)
+
+
+def test_almighty_kao_server_died(monkeypatch):
+    set_fake_date(1000)
+    config["METASCHEDULER_DAEMON"] = "yes"
+    fakezmq.recv_msgs[1] = [{"exit_code": 0}]
+    almighty = Almighty()
+    kao_server = almighty.kao_server
+    # exited, not reaped yet
+    fake_popen["poll_return_code"] = 1
+    almighty.state = "Scheduler"
+    almighty.run(False)
+    fake_popen["poll_return_code"] = None
+    config["METASCHEDULER_DAEMON"] = "no"
+    assert almighty.kao_server is not kao_server
+    assert fakezmq.sent_msgs[1] == [{"cmd": "SCHEDULE"}]
+    assert almighty.state == "Time update"
+    set_fake_date(0)
+
+
+def test_almighty_stop_kao_server(monkeypatch):
+    config["METASCHEDULER_DAEMON"] = "yes"
+    monkeypatch.setattr(oar.modules.almighty, "finishTag", True)
+    almighty = Almighty()
+    fake_popen["terminated"] = []
+    exit_code = almighty.run(False)
+    config["METASCHEDULER_DAEMON"] = "no"
+    assert exit_code == 10
+    assert fake_popen["terminated"] == [KAO_SERVER]
+
+
+def test_almighty_kao_client_no_answer(monkeypatch):
+    def recv_json_timeout():
+        raise zmq.error.Again()
+
+    kao_client = KaoClient(FakeZmq())
+    monkeypatch.setattr(kao_client.socket, "recv_json", recv_json_timeout)
+    assert kao_client.schedule() is None
+    # A new socket is created to send the next requests
+    assert fakezmq.num_socket == 2
+
+
 def test_almighty_no_dup_command():
     almighty = Almighty()
     almighty.command_queue = ["foo_cmd"]